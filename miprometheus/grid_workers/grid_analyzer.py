@@ -20,6 +20,7 @@ grid_analyzer.py:
 
     - This script post-processes the output of the ``GridTrainers`` and ``GridTesters``. \
     It gathers the test results into one `.csv` file.
+    - The experiments are analyzed in parallel, by a pool of processes.
 
 
 """
@@ -27,10 +28,12 @@ __author__ = "Tomasz Kornuta & Vincent Marois"
 
 import os
 import csv
+import json
 import yaml
 import torch
 import logging
 from datetime import datetime
+from multiprocessing import Pool
 
 from miprometheus.grid_workers.grid_worker import GridWorker
 
@@ -61,6 +64,32 @@ class GridAnalyzer(GridWorker):
         # call base constructor
         super(GridAnalyzer, self).__init__(name=name, use_gpu=False)
 
+    def __getstate__(self):
+        """
+        Returns the state of the analyzer that will be sent to the processes of the pool.
+
+        .. note::
+
+            The parser and the logger cannot be pickled, thus they are not sent. The logger is recreated \
+            in :py:func:`__setstate__`.
+
+        """
+        state = self.__dict__.copy()
+        del state['parser']
+        del state['logger']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state of the analyzer in a process of the pool.
+
+        :param state: State returned by :py:func:`__getstate__`.
+        :type state: dict
+
+        """
+        self.__dict__.update(state)
+        self.logger = logging.getLogger(name=self.name)
+
     @staticmethod
     def check_if_file_exists(dir_, filename_):
         """
@@ -77,10 +106,15 @@ class GridAnalyzer(GridWorker):
         """
         return os.path.isfile(os.path.join(dir_, filename_))
 
-    def check_file_content(self, dir_, filename_):
+    @staticmethod
+    def check_file_content(dir_, filename_):
         """
         Checks if the number of lines in the file is > 1.
 
+        .. note::
+
+            Reads at most the two first lines of the file.
+
         :param dir_: Path to file.
         :type dir_: str
 
@@ -90,7 +124,10 @@ class GridAnalyzer(GridWorker):
         :return: True if the number of lines in the file is strictly greater than one.
 
         """
-        return self.get_lines_number(os.path.join(dir_, filename_)) > 1
+        with open(os.path.join(dir_, filename_)) as f:
+            # Skip the header and check whether there is (at least) one more line.
+            f.readline()
+            return f.readline() != ''
 
     @staticmethod
     def get_lines_number(filename_):
@@ -136,6 +173,37 @@ class GridAnalyzer(GridWorker):
 
         return experiments_tests
 
+    def load_checkpoint_metadata(self, experiment_path_):
+        """
+        Loads the status and statistics of the best model saved in a given experiment folder.
+
+        Reads the lightweight `models/model_best.json` metadata file exported along with the checkpoint \
+        (see :py:func:`miprometheus.models.Model.save_checkpoint_metadata`). If it is not present \
+        (checkpoint created by a former version), falls back to loading the whole `models/model_best.pt` checkpoint.
+
+        :param experiment_path_: Path to experiment (training) folder.
+        :type experiment_path_: str
+
+        :return: Dictionary containing the checkpoint metadata (with timestamps formatted as `%Y%m%d_%H%M%S`).
+
+        """
+        metadata_file = os.path.join(experiment_path_, 'models/model_best.json')
+        if os.path.isfile(metadata_file):
+            with open(metadata_file, 'r') as f:
+                return json.load(f)
+
+        self.logger.info('  - Metadata file not found, loading the whole checkpoint')
+        # Load checkpoint from model file.
+        chkpt = torch.load(os.path.join(experiment_path_, 'models/model_best.pt'),
+                           map_location=lambda storage, loc: storage)
+
+        # Drop the model parameters and format the timestamps.
+        del chkpt['state_dict']
+        chkpt['model_timestamp'] = '{0:%Y%m%d_%H%M%S}'.format(chkpt['model_timestamp'])
+        chkpt['status_timestamp'] = '{0:%Y%m%d_%H%M%S}'.format(chkpt['status_timestamp'])
+
+        return chkpt
+
     def setup_grid_experiment(self):
         """
         Setups the overall experiment:
@@ -235,19 +303,18 @@ class GridAnalyzer(GridWorker):
 
         # Load yaml file, to get model name, problem name and random seeds.
         with open(os.path.join(experiment_path, 'training_configuration.yaml'), 'r') as yaml_file:
-            params = yaml.load(yaml_file)
+            params = yaml.safe_load(yaml_file)
 
         # Get problem and model names - from config.
         status_dict['problem'] = params['testing']['problem']['name']
         status_dict['model'] = params['model']['name']
 
-        # Load checkpoint from model file.
-        chkpt = torch.load(os.path.join(experiment_path, 'models/model_best.pt'),
-                           map_location=lambda storage, loc: storage)
+        # Load checkpoint metadata (status and statistics).
+        chkpt = self.load_checkpoint_metadata(experiment_path)
 
-        status_dict['model_save_timestamp'] = '{0:%Y%m%d_%H%M%S}'.format(chkpt['model_timestamp']) 
+        status_dict['model_save_timestamp'] = chkpt['model_timestamp']
         status_dict['training_terminal_status'] = chkpt['status']
-        status_dict['training_terminal_status_timestamp'] = '{0:%Y%m%d_%H%M%S}'.format(chkpt['status_timestamp'])
+        status_dict['training_terminal_status_timestamp'] = chkpt['status_timestamp']
 
 
         # Create "empty" equivalent.
@@ -295,7 +362,7 @@ class GridAnalyzer(GridWorker):
 
                 # Load yaml file and get random seeds.
                 with open(os.path.join(experiment_test_path, 'testing_configuration.yaml'), 'r') as yaml_file:
-                    test_params = yaml.load(yaml_file)  
+                    test_params = yaml.safe_load(yaml_file)
                     # Get seeds.             
                     test_dict['test_seed_torch'] = test_params['testing']['seed_torch']
                     test_dict['test_seed_numpy'] = test_params['testing']['seed_numpy']                    
@@ -356,18 +423,26 @@ class GridAnalyzer(GridWorker):
         """
         Collects four list of dicts from each experiment path contained in ``self.experiments_lists``.
 
+        The experiments are analyzed in parallel, using as many processes as there are CPUs available \
+        (in the limit of the number of experiments).
+
         Merges all them together and saves result to a single csv file.
 
         """
         try:
-            # Go through the experiments one by one and collect data.
             list_statuses = []
             list_trains = []
             list_valids = []
             list_tests = []
 
-            for exp in self.experiments_list:
-                statuses, trains, valids, tests = self.run_experiment(exp)
+            # Analyze the experiments in parallel.
+            max_processes = min(self.get_available_cpus(), len(self.experiments_list))
+            self.logger.info('Analyzing experiments using {} process(es)'.format(max_processes))
+            with Pool(processes=max_processes) as pool:
+                results = pool.map(self.run_experiment, self.experiments_list)
+
+            # Collect data - in the order of the experiments list.
+            for statuses, trains, valids, tests in results:
                 list_statuses.extend(statuses)
                 list_trains.extend(trains)
                 list_valids.extend(valids)
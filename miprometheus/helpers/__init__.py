@@ -1,5 +1,6 @@
 # Helpers.
+from .cell_benchmark import CellBenchmark
 from .index_splitter import IndexSplitter
 from .problem_initializer import ProblemInitializer
 
-__all__ = ['IndexSplitter', 'ProblemInitializer']
+__all__ = ['CellBenchmark', 'IndexSplitter', 'ProblemInitializer']
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+cell_benchmark.py:
+
+    - Contains the definition of a ``Helper`` class, called :py:class:`CellBenchmark`.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import copy
+import time
+import torch
+
+from miprometheus.workers import Worker
+from miprometheus.utils.data_dict import DataDict
+from miprometheus.utils.param_interface import ParamInterface
+from miprometheus.models.model_factory import ModelFactory
+
+
+class CellBenchmark(Worker):
+    """
+    Defines the :py:class:`CellBenchmark` class.
+
+    This class measures the speed (time steps per second) of the memory-augmented recurrent models \
+    (NTM, EncoderSolverNTM, MAES, DNC, DWM and ThalNet) on CPU, with the original and compiled \
+    (see :py:func:`miprometheus.models.Model.compile_cell`) recurrent cells.
+
+    .. note::
+
+        General usage:
+
+            -- The user might select the models to be benchmarked (`--models`, DEFAULT: all)
+
+            -- The user might set the batch size (`--batch_size`), sequence length (`--seq_length`) \
+            and number of measured episodes (`--episodes`)
+
+        Additionally, the user might include the backward pass in the measurements (`--backward`).
+
+    """
+    # Parameters of the benchmarked models (as in the default configurations of the serial recall task).
+    model_params = {
+        'NTM': {'name': 'NTM',
+                'controller': {'name': 'RNNController', 'hidden_state_size': 20, 'num_layers': 1,
+                               'non_linearity': 'sigmoid'},
+                'interface': {'num_read_heads': 1, 'shift_size': 3},
+                'memory': {'num_content_bits': 15, 'num_addresses': -1}},
+        'EncoderSolverNTM': {'name': 'EncoderSolverNTM',
+                             'controller': {'name': 'RNNController', 'hidden_state_size': 20, 'num_layers': 1,
+                                            'non_linearity': 'sigmoid'},
+                             'interface': {'num_read_heads': 1, 'shift_size': 3},
+                             'memory': {'num_content_bits': 15, 'num_addresses': -1}},
+        'MAES': {'name': 'MAES',
+                 'controller': {'name': 'RNNController', 'hidden_state_size': 20, 'num_layers': 1,
+                                'non_linearity': 'sigmoid'},
+                 'mae_interface': {'shift_size': 3},
+                 'mas_interface': {'shift_size': 3},
+                 'memory': {'num_content_bits': 15, 'num_addresses': -1}},
+        'DNC': {'name': 'DNC', 'hidden_state_size': 20, 'memory_content_size': 15, 'memory_addresses_size': -1,
+                'num_writes': 1, 'num_reads': 1, 'shift_size': 3, 'controller_type': 'LSTMController',
+                'use_ntm_write': False, 'use_ntm_read': False, 'use_ntm_order': False,
+                'use_extra_write_gate': False, 'non_linearity': 'sigmoid'},
+        'DWM': {'name': 'DWM', 'hidden_state_size': 5, 'memory_content_size': 10, 'memory_addresses_size': -1,
+                'num_heads': 1, 'use_content_addressing': False, 'shift_size': 3},
+        'ThalNetModel': {'name': 'ThalNetModel', 'context_input_size': 32, 'center_size_per_module': 32,
+                         'num_modules': 4}
+    }
+
+    def __init__(self, name="CellBenchmark"):
+        """
+        Set parser arguments.
+
+        :param name: Name of the worker (Default: "CellBenchmark").
+        :type name: str
+
+        """
+        # Call base constructor to set up app state, registry and add default params.
+        super(CellBenchmark, self).__init__(name=name, add_default_parser_args=False)
+
+        self.parser.add_argument('--models',
+                                 dest='models',
+                                 type=str,
+                                 default=','.join(self.model_params.keys()),
+                                 help='Comma-separated list of models to be benchmarked. (DEFAULT: all)')
+
+        self.parser.add_argument('--batch_size',
+                                 dest='batch_size',
+                                 type=int,
+                                 default=64,
+                                 help='Batch size. (DEFAULT: 64)')
+
+        self.parser.add_argument('--seq_length',
+                                 dest='seq_length',
+                                 type=int,
+                                 default=20,
+                                 help='Length of the input sequences. (DEFAULT: 20)')
+
+        self.parser.add_argument('--episodes',
+                                 dest='episodes',
+                                 type=int,
+                                 default=20,
+                                 help='Number of measured episodes (after 3 warm-up episodes). (DEFAULT: 20)')
+
+        self.parser.add_argument('--backward',
+                                 dest='backward',
+                                 default=False,
+                                 action='store_true',
+                                 help='Include the backward pass in the measurements. (DEFAULT: False)')
+
+    def create_batch(self, input_size, output_size):
+        """
+        Creates a batch of random (serial recall-like) sequences, with the store bit set in the first item \
+        and the recall bit set in the middle of the sequence.
+
+        :param input_size: Size of the input items.
+        :param output_size: Size of the output items.
+
+        :return: ``DataDict`` containing `sequences` and `targets`.
+
+        """
+        batch_size, seq_length = self.flags.batch_size, self.flags.seq_length
+
+        inputs = torch.bernoulli(0.5 * torch.ones(batch_size, seq_length, input_size))
+        # Control bits: store (0) and recall (1).
+        inputs[:, :, 0:2] = 0
+        inputs[:, 0, 0] = 1
+        inputs[:, seq_length // 2, 1] = 1
+
+        targets = torch.bernoulli(0.5 * torch.ones(batch_size, seq_length, output_size))
+
+        return DataDict({'sequences': inputs, 'targets': targets})
+
+    def measure(self, model, data_dict):
+        """
+        Measures the number of time steps per second processed by the model.
+
+        :param model: Model to be measured.
+        :param data_dict: Batch of data.
+
+        :return: Time steps per second.
+
+        """
+        def run_episode():
+            if self.flags.backward:
+                model.zero_grad()
+                model(data_dict).sum().backward()
+            else:
+                with torch.no_grad():
+                    model(data_dict)
+
+        # Warm up (includes the compilation).
+        for _ in range(3):
+            run_episode()
+
+        start = time.perf_counter()
+        for _ in range(self.flags.episodes):
+            run_episode()
+        elapsed = time.perf_counter() - start
+
+        return self.flags.episodes * self.flags.seq_length / elapsed
+
+    def run(self):
+        """
+        Runs the benchmark.
+
+            - Parses command line arguments.
+
+            - For every model: builds it with the original and compiled cells (sharing the same weights) \
+            and measures their speed on the same batch.
+
+            - Logs the summary.
+
+        """
+        # Parse arguments.
+        self.flags, self.unparsed = self.parser.parse_known_args()
+
+        # Display results of parsing.
+        self.display_parsing_results()
+
+        input_size, output_size = 11, 8
+        problem_default_values = {'input_item_size': input_size, 'output_item_size': output_size,
+                                  'store_bit': 0, 'recall_bit': 1}
+        data_dict = self.create_batch(input_size, output_size)
+
+        results = []
+        for name in self.flags.models.split(','):
+            if name not in self.model_params:
+                self.logger.error("Unknown model '{}', available models: {}".format(
+                    name, ', '.join(self.model_params.keys())))
+                exit(-1)
+
+            steps_per_second = []
+            state_dict = None
+            for mode in ['none', 'compile']:
+                params = ParamInterface()
+                params.add_default_params(copy.deepcopy(self.model_params[name]))
+                # ThalNet reads the sizes directly from its parameters.
+                params.add_default_params({'input_size': input_size, 'output_size': output_size})
+                # Config (not default) value, so it is not overwritten by the default of the model.
+                params.add_config_params({'compile_cell': mode})
+                model = ModelFactory.build(params, problem_default_values)
+
+                # The compiled forward replaces the method of the cell instance.
+                compiled = any('forward' in module.__dict__ for module in model.modules())
+                if compiled != (mode == 'compile'):
+                    self.logger.error("The cell of {} was {}compiled in the '{}' mode, cannot compare the "
+                                      "speeds".format(name, '' if compiled else 'not ', mode))
+                    exit(-2)
+
+                # Use the same weights in both modes.
+                if state_dict is None:
+                    state_dict = model.state_dict()
+                else:
+                    model.load_state_dict(state_dict)
+
+                steps_per_second.append(self.measure(model, data_dict))
+                self.logger.info("{} ({}): {:.1f} steps/s".format(name, mode, steps_per_second[-1]))
+
+            results.append((name, steps_per_second[0], steps_per_second[1]))
+
+        # Log the summary.
+        summary = '\n' + '=' * 80 + '\n'
+        summary += '{:<20} {:>15} {:>15} {:>10}\n'.format('Model', 'Original [1/s]', 'Compiled [1/s]', 'Speedup')
+        summary += '=' * 80 + '\n'
+        for name, original, compiled in results:
+            summary += '{:<20} {:>15.1f} {:>15.1f} {:>9.2f}x\n'.format(name, original, compiled, compiled / original)
+        summary += '=' * 80
+        self.logger.info(summary)
+
+
+def main():
+    """
+    Entry point function for the :py:class:`CellBenchmark`.
+
+    """
+    worker = CellBenchmark()
+    # parse args and run the benchmark.
+    worker.run()
+
+
+if __name__ == '__main__':
+
+    main()
@@ -24,6 +24,7 @@ index_splitter.py:
 __author__ = "Tomasz Kornuta"
 
 import os
+import numpy as np
 from miprometheus.utils.split_indices import split_indices
 from miprometheus.workers import Worker
 from miprometheus.problems.problem_factory import ProblemFactory
@@ -34,7 +35,8 @@ class IndexSplitter(Worker):
     Defines the :py:class:`IndexSplitter` class.
 
     This class allows to split the list of indices indexing a dataset into 2, non-overlapping, sub-lists of \
-    variable lengths. These 2 lists are then saved to file (named `split_a.txt` & `split_b.txt`).
+    variable lengths. These 2 lists are then saved to file (named `split_a.npy` & `split_b.npy`, or \
+    `split_a.txt` & `split_b.txt` when using the text format).
 
     This can be useful to split a training set into a training set & a validation set.
 
@@ -59,6 +61,18 @@ class IndexSplitter(Worker):
 
             -- when off, both files will contain ranges, i.e. `[0, s-1]` and `[s, l-1]` respectively.
 
+        The user might also request a stratified split (`--stratified`, requires `--p`), in which every label \
+        (e.g. target class) of the problem is distributed proportionally between the two splits.
+
+        The files are written in the binary ``.npy`` format by default (`--format npy`), which \
+        :py:class:`miprometheus.utils.SamplerFactory` memory-maps. The comma-separated text format \
+        (`--format txt`) is still available.
+
+        .. note::
+
+            The ``.npy`` files always contain all indices - the two-element ranges are only written in the \
+            text format.
+
  
     """
     def __init__(self, name="IndexSplitter"):
@@ -114,6 +128,21 @@ class IndexSplitter(Worker):
                                       'When off, both files will contain ranges, i.e. [0, split-1] and '
                                       '[split, length-1] respectively')
 
+        self.parser.add_argument('--stratified',
+                                 dest='stratified',
+                                 default=False,
+                                 action='store_true',
+                                 help='When on, every label (e.g. target class) of the problem is distributed '
+                                      'proportionally between the two splits. (WARNING: requires --p)')
+
+        self.parser.add_argument('--format',
+                                 dest='format',
+                                 type=str,
+                                 choices=['npy', 'txt'],
+                                 default='npy',
+                                 help='Format of the files: binary (npy) or comma-separated text (txt). '
+                                      '(DEFAULT: npy)')
+
     def run(self):
         """
         Creates two files with splits.
@@ -155,11 +184,24 @@ class IndexSplitter(Worker):
             exit(-3)
         split = self.flags.split
 
+        # Check if stratified split can be done.
+        if self.flags.stratified and self.flags.problem_name == '':
+            self.logger.error('Stratified split requires the labels of the samples, please set problem (--p).')
+            exit(-5)
+
         # Build the problem.
+        labels = None
         if self.flags.problem_name != '':
             self.params.add_default_params({'name': self.flags.problem_name})
             problem = ProblemFactory.build(self.params)
             length = len(problem)
+
+            if self.flags.stratified:
+                labels = problem.get_sample_labels()
+                if labels is None:
+                    self.logger.error("Problem '{}' does not provide the labels of its samples required by "
+                                      "the stratified split.".format(self.flags.problem_name))
+                    exit(-6)
         else:
             length = self.flags.length
 
@@ -172,15 +214,31 @@ class IndexSplitter(Worker):
         self.logger.info("Splitting dataset of length {} into splits of size {} and {}.".format(length, split, length - split))
 
         # Split the indices.
-        split_a, split_b = split_indices(length, split, self.logger, self.flags.random_sampling_off == False)
+        split_a, split_b = split_indices(length, split, self.logger, self.flags.random_sampling_off == False,
+                                         labels)
 
-        # Write splits to files.
-        name_a = os.path.expanduser(self.flags.outdir)+'split_a.txt'
-        split_a.tofile(name_a, sep=",", format="%s")
+        if self.flags.format == 'npy':
+            # Expand the ranges - no two-element ranges in the binary files.
+            if self.flags.random_sampling_off and labels is None:
+                split_a, split_b = np.arange(*split_a), np.arange(*split_b)
+
+            # Use the smallest sufficient type.
+            dtype = np.int32 if length <= np.iinfo(np.int32).max else np.int64
+
+            # Write splits to files.
+            name_a = os.path.expanduser(self.flags.outdir)+'split_a.npy'
+            np.save(name_a, split_a.astype(dtype))
+
+            name_b = os.path.expanduser(self.flags.outdir)+'split_b.npy'
+            np.save(name_b, split_b.astype(dtype))
+        else:
+            # Write splits to files.
+            name_a = os.path.expanduser(self.flags.outdir)+'split_a.txt'
+            split_a.tofile(name_a, sep=",", format="%s")
 
-        # Write splits to files.
-        name_b = os.path.expanduser(self.flags.outdir)+'split_b.txt'
-        split_b.tofile(name_b, sep=",", format="%s")
+            # Write splits to files.
+            name_b = os.path.expanduser(self.flags.outdir)+'split_b.txt'
+            split_b.tofile(name_b, sep=",", format="%s")
 
         self.logger.info("Splits written to {} ({} indices) and {} ({} indices).".format(name_a, len(split_a), name_b, len(split_b)))
         # Finished.
@@ -99,9 +99,6 @@ class VWMCell(Module):
         self.dim = dim
         self.dropout = dropout
 
-        #Visualization container
-        self.cell_state_history = []
-
 
 
     def forward(self, context, question, features_maps, control, summary_output, visual_working_memory, Wt_sequential,state_history, step):
@@ -137,8 +134,8 @@ class VWMCell(Module):
         :return summary_output, shape [batch_size x dim]
         :type summary_output: torch.tensor
             
-        :return self.cell_state_history
-        :type self.cell_state_history: list
+        :return state_history
+        :type state_history: ``CellStateHistory``
         
         :return: control: shape [batch_size x dim]
         :type  control: torch.tensor
@@ -185,7 +182,8 @@ class VWMCell(Module):
 
         # store attention weights for visualization
         if app_state.visualize:
-            state_history.append(
-                (va.detach(), control_attention.detach(), visual_working_memory.detach(), ma.detach(),gvt.detach().numpy(),gmt.detach().numpy(), Wt_sequential.unsqueeze(1).detach().numpy(), context_weighting_vector_T.unsqueeze(1).detach().numpy()))
+            # (only the selected sample is recorded, see CellStateHistory).
+            state_history.record(
+                (va, control_attention, visual_working_memory, ma, gvt.detach().cpu().numpy(), gmt.detach().cpu().numpy(), Wt_sequential.unsqueeze(1).detach().cpu().numpy(), context_weighting_vector_T.unsqueeze(1).detach().cpu().numpy()))
 
         return summary_output, control,  state_history, va, visual_working_memory, Wt_sequential
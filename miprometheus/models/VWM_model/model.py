@@ -50,6 +50,7 @@ import nltk
 # needed for nltk.word.tokenize - do it once!
 nltk.download('punkt')
 
+import time
 import torch
 import numpy as np
 import matplotlib.pylab
@@ -102,6 +103,11 @@ class MACNetworkSequential(Model):
         self.nwords = params['nwords']
         self.trainable_init = params ['trainable_init']
 
+        # Optional breakdown of the forward pass time (encoder, cells, output).
+        params.add_default_params({'timing_statistics': False})
+        self.timing_statistics = params['timing_statistics']
+        self.timings = {'encoder_time': 0.0, 'cells_time': 0.0, 'output_time': 0.0}
+
         # Maximum number of embeddable words.
         self.vocabulary_size = problem_default_values_['embed_vocab_size']
 
@@ -156,10 +162,6 @@ class MACNetworkSequential(Model):
         :return: Predictions of the model.
         """
 
-        # reset cell state history for visualization
-        if self.app_state.visualize:
-            self.VWM_cell.cell_state_history = []
-
         # Change the order of image dimensions, so we will loop over dimension 0: sequence elements.
         images = data_dict['images']
         images= images.permute(1, 0, 2, 3, 4)
@@ -177,8 +179,7 @@ class MACNetworkSequential(Model):
         # Convert questions length into a tensor
         questions_length = torch.from_numpy(numpy.array(questions_length))
 
-        # Create placeholders for logits.
-        logits_answer = torch.zeros( (batch_size, seq_len, self.nb_classes), requires_grad=False).type(self.dtype)
+        # Create placeholder for pointing logits.
         logits_pointing = torch.zeros( (batch_size, seq_len,self.nb_classes_pointing), requires_grad=False).type(self.dtype)
 
         # expand the hidden states to whole batch for mac cell control states and memory states
@@ -200,21 +201,37 @@ class MACNetworkSequential(Model):
 
         self.cell_states=[]
 
+        start_time = self.get_time()
+
         # question encoder
         contextual_word_encoding, question_encoding = self.question_encoder(questions, questions_length)
 
+        # image encoder: it does not depend on the state, so process all frames at once, \
+        # merging the sequence and batch dimensions: [seq_len x batch_size, C, H, W] -> [seq_len, batch_size, HW, dim].
+        all_feature_maps = self.image_encoder(images.contiguous().view(seq_len * batch_size, *images.shape[2:]))
+        all_feature_maps = all_feature_maps.view(seq_len, batch_size, *all_feature_maps.shape[1:])
+
+        encoder_time = self.get_time()
+        cells_time = 0.0
+        output_time = 0.0
+
+        # Logits of the consecutive frames, stacked at the end.
+        logits_answer = []
+
         # Loop over all elements along the SEQUENCE dimension.
-        for f in range(images.size(0)):
+        for f in range(seq_len):
 
             #RESET OF CONTROL and SUMMARY OBJECT
             new_summary_object = summary_object
             new_control_state = control
 
-            # image encoder
-            feature_maps= self.image_encoder(images[f])
+            # image encoding of the current frame
+            feature_maps = all_feature_maps[f]
 
             #state history fo vizualisation
-            state_history=[]
+            state_history = self.create_cell_state_history()
+
+            cells_start = self.get_time()
 
             # recurrent VWM cells
             for i in range(self.max_step):
@@ -224,19 +241,96 @@ class MACNetworkSequential(Model):
                                     feature_maps, new_control_state, new_summary_object,
                                     visual_working_memory, wt_sequential, state_history, step=i)
 
-
-
-
             # save state history
             self.cell_states.append(state_history)
 
+            output_start = self.get_time()
+            cells_time += output_start - cells_start
 
             # output unit
-            logits_answer[:, f, :] = self.output_unit_answer(last_visual_attention, question_encoding, new_summary_object)
+            logits_answer.append(self.output_unit_answer(last_visual_attention, question_encoding, new_summary_object))
+
+            output_time += self.get_time() - output_start
 
+        # [batch_size, seq_len, nb_classes]
+        logits_answer = torch.stack(logits_answer, dim=1)
+
+        # Store the timings (in ms).
+        self.timings['encoder_time'] = 1000 * (encoder_time - start_time)
+        self.timings['cells_time'] = 1000 * cells_time
+        self.timings['output_time'] = 1000 * output_time
 
         return logits_answer, logits_pointing
 
+    def get_time(self):
+        """
+        Returns the current time, used in the timing breakdown of the forward pass.
+
+        .. note::
+
+            When the timing statistics are enabled and CUDA is used, waits for all queued kernels to complete, \
+            so the measured times are not the times of the asynchronous kernel launches.
+
+        :return: Time (in seconds) or 0 if the timing statistics are disabled.
+
+        """
+        if not self.timing_statistics:
+            return 0.0
+        if self.app_state.use_CUDA:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def add_statistics(self, stat_col):
+        """
+        Adds the timing breakdown of the forward pass (if enabled) to ``StatisticsCollector``.
+
+        :param stat_col: ``StatisticsCollector``.
+
+        """
+        if self.timing_statistics:
+            for key in self.timings.keys():
+                stat_col.add_statistic(key, '{:.3f}')
+
+    def collect_statistics(self, stat_col, data_dict, logits):
+        """
+        Collects the timing breakdown (in ms) of the last forward pass (if enabled).
+
+        :param stat_col: ``StatisticsCollector``.
+
+        :param data_dict: ``DataDict`` containing inputs and targets.
+        :type data_dict: DataDict
+
+        :param logits: Predictions being output of the model.
+
+        """
+        if self.timing_statistics:
+            for key, value in self.timings.items():
+                stat_col[key] = value
+
+    def add_aggregators(self, stat_agg):
+        """
+        Adds aggregators of the timing breakdown (if enabled) to ``StatisticsAggregator``.
+
+        :param stat_agg: ``StatisticsAggregator``.
+
+        """
+        if self.timing_statistics:
+            for key in self.timings.keys():
+                stat_agg.add_aggregator(key, '{:.3f}')
+
+    def aggregate_statistics(self, stat_col, stat_agg):
+        """
+        Aggregates the timing breakdown (mean over the episodes), if enabled.
+
+        :param stat_col: ``StatisticsCollector``.
+
+        :param stat_agg: ``StatisticsAggregator``.
+
+        """
+        if self.timing_statistics:
+            for key in self.timings.keys():
+                stat_agg[key] = float(np.mean(stat_col[key]))
+
     @staticmethod
     def generate_figure_layout():
         """
@@ -364,7 +458,7 @@ class MACNetworkSequential(Model):
         return fig
 
 
-    def plot(self, data_dict, logits, sample=0):
+    def plot(self, data_dict, logits, sample=None):
         """
         Visualize the attention weights (``ControlUnit`` & ``ReadUnit``) on the \
         question & feature maps. Dynamic visualization throughout the reasoning \
@@ -374,7 +468,7 @@ class MACNetworkSequential(Model):
         :type data_dict: utils.DataDict
         :param logits: Prediction of the model.
         :type logits: torch.tensor
-        :param sample: Index of sample in batch (Default: 0)
+        :param sample: Index of sample in batch (Default: None, i.e. the sample recorded in the forward pass)
         :type sample: int
         """
 
@@ -382,6 +476,9 @@ class MACNetworkSequential(Model):
         if not self.app_state.visualize:
             return False
 
+        # Show the sample whose states were recorded.
+        sample = self.get_recorded_sample(sample)
+
         # Initialize timePlot window - if required.
         if self.plotWindow is None:
             from miprometheus.utils.time_plot import TimePlot
@@ -444,7 +541,7 @@ class MACNetworkSequential(Model):
 
                 #loop over the k reasoning steps
                 for step, (attention_mask, attention_question, history, W, gmem, gkb, Wt_seq , context) in zip(
-                        range(self.max_step), self.cell_states[i]):
+                        self.cell_states[i].steps, self.cell_states[i]):
 
                     # preprocess attention image, reshape
                     attention_size = int(np.sqrt(attention_mask.size(-1)))
@@ -456,10 +553,10 @@ class MACNetworkSequential(Model):
                     m = torch.nn.Upsample(
                         size=[width, height], mode='bilinear', align_corners=True)
                     up_sample_attention_mask = m(attention_mask)
-                    attention_mask = up_sample_attention_mask[sample, 0]
+                    attention_mask = up_sample_attention_mask[0, 0]
 
-                    # preprocess question, pick one sample number
-                    attention_question = attention_question[sample]
+                    # preprocess question, pick the recorded sample
+                    attention_question = attention_question[0]
 
                     norm = matplotlib.pylab.Normalize(0, 1)
                     #norm2 = matplotlib.pylab.Normalize(0, 4)
@@ -512,7 +609,7 @@ class MACNetworkSequential(Model):
 
                     # Time context.
                     artists.append(ax_context.imshow(
-                        context[sample], interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
+                        context[0], interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
     
                     ######################################################################
                     # Bottom left: Image section.
@@ -532,24 +629,24 @@ class MACNetworkSequential(Model):
                     
                     # Image gate.
                     artists.append(ax_image_gate.imshow(
-                        [[ gkb[sample] ]], interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
+                        [[ gkb[0] ]], interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
                     
                     # Memory gate.
                     artists.append(ax_memory_gate.imshow(
-                        [[ gmem[sample] ]], interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
+                        [[ gmem[0] ]], interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
 
                     ######################################################################
                     # Bottom Right: Memory section.
 
                     artists.append(ax_history.imshow(
-                        history[sample], interpolation='nearest', aspect='auto', cmap=color, norm=norm ))
+                        history[0], interpolation='nearest', aspect='auto', cmap=color, norm=norm ))
                     #    history[sample], interpolation='nearest', aspect='auto', cmap=color, norm=norm2  )) WHY DIFFERENT NORMALIZATION??
 
                     artists.append(ax_attention_history.imshow(
-                        W[sample].unsqueeze(1), interpolation='nearest',cmap=color, norm=norm , aspect='auto'))
+                        W[0].unsqueeze(1), interpolation='nearest',cmap=color, norm=norm , aspect='auto'))
 
                     artists.append(ax_wt.imshow(
-                        Wt_seq[sample].transpose(1,0), interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
+                        Wt_seq[0].transpose(1,0), interpolation='nearest', cmap=color, norm=norm, aspect='auto'))
 
                     # Add "frames" to artist list
                     frames.append(artists)
@@ -587,7 +684,7 @@ class MACNetworkSequential(Model):
 
                 # loop over the k reasoning steps
                 for step, (attention_mask, attention_question) in zip(
-                        range(self.max_step), self.cell_states[i]):
+                        self.cell_states[i].steps, self.cell_states[i]):
 
 
 
@@ -598,8 +695,8 @@ class MACNetworkSequential(Model):
                     up_sample_preds_pointing = mm(preds_pointing)
                     up_sample_preds_pointing = up_sample_preds_pointing[sample][i]
 
-                    # preprocess question, pick one sample number
-                    attention_question = attention_question[sample]
+                    # preprocess question, pick the recorded sample
+                    attention_question = attention_question[0]
 
                     # Create "Artists" drawing data on "ImageAxes".
                     num_artists = len(fig.axes) + 1
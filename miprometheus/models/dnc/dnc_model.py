@@ -67,7 +67,7 @@ class DNC(SequentialModel):
         self._num_writes = params["num_writes"]
 
         # Create the DNC components
-        self.DNCCell = DNCCell(self.output_units, params)
+        self.DNCCell = self.compile_cell(DNCCell(self.output_units, params))
 
     def forward(self, data_dict):
         """
@@ -89,8 +89,6 @@ class DNC(SequentialModel):
         batch_size = inputs.size(0)
         seq_length = inputs.size(1)
 
-        output = None
-
         if self.app_state.visualize:
             self.cell_state_history = []
 
@@ -105,22 +103,11 @@ class DNC(SequentialModel):
         # init state
         cell_state = self.DNCCell.init_state(memory_addresses_size, batch_size)
 
-        #cell_state = self.init_state(memory_addresses_size)
-        for j in range(seq_length):
-            output_cell, cell_state = self.DNCCell(
-                inputs[..., j, :], cell_state)
-
-            if output_cell is None:
-                continue
-
-            output_cell = output_cell[..., None, :]
-            if output is None:
-                output = output_cell
-            else:
-                output = torch.cat([output, output_cell], dim=-2)
+        def step(input_t, cell_state):
+            output_cell, cell_state = self.DNCCell(input_t, cell_state)
 
             # This is for the time plot
-            if self.app_state.visualize:
+            if output_cell is not None and self.app_state.visualize:
                 self.cell_state_history.append(
                     (cell_state.memory_state.detach().cpu().numpy(),
                      cell_state.int_init_state.usage.detach().cpu().numpy(),
@@ -128,8 +115,10 @@ class DNC(SequentialModel):
                      cell_state.int_init_state.read_weights.detach().cpu().numpy(),
                      cell_state.int_init_state.write_weights.detach().cpu().numpy()))
 
-            # if self.plot_active:
-            #    self.plot_memory_attention(output, cell_state)
+            return output_cell, cell_state
+
+        # Process the sequence item by item, concatenating outputs along the time axis.
+        output, _ = self.unroll(step, inputs, cell_state)
 
         return output
 
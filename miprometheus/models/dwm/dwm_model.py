@@ -71,17 +71,17 @@ class DWM(SequentialModel):
         self.memory_addresses_size = params["memory_addresses_size"]
 
         # This is for the time plot
-        self.cell_state_history = None
+        self.cell_state_history = self.create_cell_state_history()
 
         # Create the DWM components
-        self.DWMCell = DWMCell(
+        self.DWMCell = self.compile_cell(DWMCell(
             self.in_dim,
             self.output_units,
             self.state_units,
             self.num_heads,
             self.is_cam,
             self.num_shift,
-            self.M)
+            self.M))
 
     def forward(self, data_dict):
         """
@@ -112,9 +112,8 @@ class DWM(SequentialModel):
         seq_length = inputs.size(-2)
 
         if self.app_state.visualize:
-            self.cell_state_history = []
+            self.cell_state_history.reset()
 
-        output = None
         # TODO
         if len(inputs.size()) == 4:
             inputs = inputs[:, 0, :, :]
@@ -134,28 +133,20 @@ class DWM(SequentialModel):
         # Init state
         cell_state = self.DWMCell.init_state(memory_addresses_size, batch_size)
 
-        # loop over the different sequences
-        for j in range(seq_length):
-            output_cell, cell_state = self.DWMCell(
-                inputs[..., j, :], cell_state)
+        def step(input_t, cell_state):
+            output_cell, cell_state = self.DWMCell(input_t, cell_state)
 
-            if output_cell is None:
-                continue
+            # This is for the time plot
+            if output_cell is not None and self.app_state.visualize:
+                self.cell_state_history.record(
+                    (cell_state.memory_state,
+                     cell_state.interface_state.head_weight,
+                     cell_state.interface_state.snapshot_weight), to_numpy=True)
 
-            output_cell = output_cell[..., None, :]
-            if output is None:
-                output = output_cell
+            return output_cell, cell_state
 
-            # Concatenate output
-            else:
-                output = torch.cat([output, output_cell], dim=-2)
-
-            # This is for the time plot
-            if self.app_state.visualize:
-                self.cell_state_history.append(
-                    (cell_state.memory_state.detach().numpy(),
-                     cell_state.interface_state.head_weight.detach().numpy(),
-                     cell_state.interface_state.snapshot_weight.detach().numpy()))
+        # loop over the different sequences, concatenating outputs along the time axis.
+        output, _ = self.unroll(step, inputs, cell_state)
 
         return output
 
@@ -229,7 +220,7 @@ class DWM(SequentialModel):
 
         return fig
 
-    def plot(self, data_dict, predictions, sample_number=0):
+    def plot(self, data_dict, predictions, sample_number=None):
         """
         Interactive visualization, with a slider enabling to move forth and
         back along the time axis (iteration in a given episode).
@@ -240,13 +231,16 @@ class DWM(SequentialModel):
 
         :param predictions: Prediction sequence [BATCH_SIZE x SEQUENCE_LENGTH x OUTPUT_DATA_SIZE]
 
-        :param sample_number: Number of sample in batch (DEFAULT: 0)
+        :param sample_number: Number of sample in batch (DEFAULT: None, i.e. the sample recorded in the forward pass)
 
         """
         # Check if we are supposed to visualize at all.
         if not self.app_state.visualize:
             return False
 
+        # Show the sample whose states were recorded.
+        sample_number = self.get_recorded_sample(sample_number)
+
         # Initialize timePlot window - if required.
         if self.plotWindow is None:
             from miprometheus.utils.time_plot import TimePlot
@@ -256,7 +250,7 @@ class DWM(SequentialModel):
         # start_time = time.time()
         inputs_seq = data_dict["sequences"][sample_number].cpu().detach().numpy()
         targets_seq = data_dict["targets"][sample_number].cpu().detach().numpy()
-        predictions_seq = predictions[0].cpu().detach()
+        predictions_seq = predictions[sample_number].cpu().detach().numpy()
         #predictions_seq = torch.sigmoid(predictions_seq).numpy()
 
         # temporary for data with additional channel
@@ -290,18 +284,18 @@ class DWM(SequentialModel):
         # used to draw a given frame.
         frames = []
 
-        for i, (input_element, target_element, prediction_element, (memory, wt, wt_d)) in enumerate(
-                zip(inputs_seq, targets_seq, predictions_seq, self.cell_state_history)):
+        # Iterate over the recorded steps (the history might be downsampled).
+        for i, (memory, wt, wt_d) in zip(self.cell_state_history.steps, self.cell_state_history):
             # Display information every 10% of figures.
             if (inputs_seq.shape[0] > 10) and (i %
                                                (inputs_seq.shape[0] // 10) == 0):
                 logger.info(
                     "Generating figure {}/{}".format(i, inputs_seq.shape[0]))
 
-            # Update displayed values on adequate positions.
-            inputs_displayed[:, i] = input_element
-            targets_displayed[:, i] = target_element
-            predictions_displayed[:, i] = prediction_element
+            # Update displayed values on adequate positions (including the skipped steps).
+            inputs_displayed[:, :i + 1] = np.transpose(inputs_seq[:i + 1])
+            targets_displayed[:, :i + 1] = np.transpose(targets_seq[:i + 1])
+            predictions_displayed[:, :i + 1] = np.transpose(predictions_seq[:i + 1])
 
             memory_displayed = np.clip(memory[0], -3.0, 3.0)
             head_attention_displayed[:, i] = wt[0, 0, :]
@@ -23,12 +23,20 @@ import torch
 from torch import nn
 
 from miprometheus.models.sequential_model import SequentialModel
+from miprometheus.models.lstm.lstm_model import convert_lstm_state_dict
 
 
 class EncoderSolverLSTM(SequentialModel):
     """
     Class representing the Encoder-Solver architecture using LSTM cells as both
     encoder and solver modules.
+
+    .. note::
+
+        By default (`use_fused_lstm: True`) the encoder and solver are ``torch.nn.LSTM`` modules, processing \
+        whole segments of the sequence (between the encoding/solving markers) at once, with the output layer \
+        applied to all items at once. Setting `use_fused_lstm: False` switches to ``torch.nn.LSTMCell`` modules \
+        processing the sequence item by item. Both modes use the same parameters.
     """
 
     def __init__(self, params, problem_default_values_={}):
@@ -63,17 +71,82 @@ class EncoderSolverLSTM(SequentialModel):
 
         self.hidden_state_size = params["hidden_state_size"]
 
-        # Create the Encoder.
-        self.encoder = nn.LSTMCell(self.input_item_size, self.hidden_state_size)
+        self.params.add_default_params({'use_fused_lstm': True})
+        self.use_fused_lstm = params['use_fused_lstm']
+
+        if self.use_fused_lstm:
+            # Create the Encoder.
+            self.encoder = nn.LSTM(self.input_item_size, self.hidden_state_size, batch_first=True)
 
-        # Create the Decoder/Solver.
-        self.solver = nn.LSTMCell(self.input_item_size, self.hidden_state_size)
+            # Create the Decoder/Solver.
+            self.solver = nn.LSTM(self.input_item_size, self.hidden_state_size, batch_first=True)
+        else:
+            # Create the Encoder.
+            self.encoder = nn.LSTMCell(self.input_item_size, self.hidden_state_size)
+
+            # Create the Decoder/Solver.
+            self.solver = nn.LSTMCell(self.input_item_size, self.hidden_state_size)
 
         # Output linear layer.
         self.output = nn.Linear(self.hidden_state_size, self.output_item_size)
 
         self.modes = Enum('Modes', ['Encode', 'Solve'])
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Renames the encoder/solver parameters, so checkpoints can be loaded regardless of the value \
+        of `use_fused_lstm` they were saved with.
+
+        """
+        convert_lstm_state_dict(state_dict,
+                                [(prefix + 'encoder.', prefix + 'encoder.', 0),
+                                 (prefix + 'solver.', prefix + 'solver.', 0)],
+                                self.use_fused_lstm)
+
+        super(EncoderSolverLSTM, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+    def get_segments(self, inputs_BxSxI):
+        """
+        Splits the sequence into segments processed in the same mode (encoding or solving).
+
+        .. note::
+
+            As in the item by item processing, the mode is switched by the control bits of the first \
+            sample in the batch and kept till the opposite marker is hit.
+
+        :param inputs_BxSxI: a tensor of input data of size [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE]
+
+        :returns: List of tuples (mode, first item, last item + 1).
+
+        """
+        encoding_bits = inputs_BxSxI[0, :, self.encoding_bit].tolist()
+        solving_bits = inputs_BxSxI[0, :, self.solving_bit].tolist()
+
+        segments = []
+        mode = None
+        for i, (encoding, solving) in enumerate(zip(encoding_bits, solving_bits)):
+            if solving and not encoding:
+                new_mode = self.modes.Solve
+            elif encoding and not solving:
+                new_mode = self.modes.Encode
+            elif encoding and solving:
+                print('Error: both encoding and decoding bits were true')
+                exit(-1)
+            else:
+                new_mode = mode
+
+            if new_mode is None:
+                print('Error: the first item must contain the encoding or decoding bit')
+                exit(-1)
+
+            if new_mode != mode:
+                segments.append([new_mode, i, i + 1])
+                mode = new_mode
+            else:
+                segments[-1][2] = i + 1
+
+        return segments
+
     def init_state(self, batch_size):
         """
         Returns 'zero' (initial) state.
@@ -117,6 +190,19 @@ class EncoderSolverLSTM(SequentialModel):
         # Initialize state variables.
         (h, c) = self.init_state(batch_size)
 
+        if self.use_fused_lstm:
+            # LSTM states have an additional (layer) dimension.
+            state = (h.unsqueeze(0), c.unsqueeze(0))
+            hidden = []
+            # Process segments one-by-one, passing the state between the encoder and solver.
+            for mode, start, end in self.get_segments(inputs_BxSxI):
+                module = self.solver if mode == self.modes.Solve else self.encoder
+                hidden_BxSxH, state = module(inputs_BxSxI[:, start:end].contiguous(), state)
+                hidden += [hidden_BxSxH]
+
+            # Apply the output layer to all items.
+            return self.output(torch.cat(hidden, dim=1))
+
         # Logits container.
         logits = []
 
@@ -69,10 +69,10 @@ class EncoderSolverNTM(SequentialModel):
         self.num_memory_content_bits = params['memory']['num_content_bits']
 
         # Create the Encoder cell.
-        self.encoder = NTMCell(params)
+        self.encoder = self.compile_cell(NTMCell(params))
 
         # Create the Decoder/Solver.
-        self.solver = NTMCell(params)
+        self.solver = self.compile_cell(NTMCell(params))
 
         # Operation modes.
         self.modes = Enum('Modes', ['Encode', 'Solve'])
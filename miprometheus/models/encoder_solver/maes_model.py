@@ -91,9 +91,10 @@ class MAES(SequentialModel):
             self.encoder.load(self.load_encoder)
         if self.freeze_encoder:
             self.encoder.freeze()
+        self.encoder = self.compile_cell(self.encoder)
 
         # Create the Decoder/Solver.
-        self.solver = MASCell(params)
+        self.solver = self.compile_cell(MASCell(params))
 
         # Operation modes.
         self.modes = Enum('Modes', ['Encode', 'Solve'])
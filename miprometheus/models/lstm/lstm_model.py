@@ -23,10 +23,44 @@ import torch
 from miprometheus.models.sequential_model import SequentialModel
 
 
+def convert_lstm_state_dict(state_dict, key_pairs, to_fused):
+    """
+    Converts (in place) the parameters of ``torch.nn.LSTMCell`` modules into the parameters of \
+    (layers of) a ``torch.nn.LSTM`` module, or the other way round.
+
+    Both modules use the same parameters (with the same gate ordering), so the conversion only renames the keys, \
+    e.g. `lstm_layers.1.weight_ih` <-> `lstm.weight_ih_l1`.
+
+    :param state_dict: State dict to be converted.
+    :type state_dict: dict
+
+    :param key_pairs: List of tuples (cell_prefix, lstm_prefix, layer), e.g. `('lstm_layers.1.', 'lstm.', 1)`.
+    :type key_pairs: list
+
+    :param to_fused: If True, converts the cell parameters into the LSTM parameters, otherwise the other way round.
+    :type to_fused: bool
+
+    """
+    for cell_prefix, lstm_prefix, layer in key_pairs:
+        for name in ['weight_ih', 'weight_hh', 'bias_ih', 'bias_hh']:
+            cell_key = cell_prefix + name
+            lstm_key = lstm_prefix + '{}_l{}'.format(name, layer)
+            src, dst = (cell_key, lstm_key) if to_fused else (lstm_key, cell_key)
+            if src in state_dict and dst not in state_dict:
+                state_dict[dst] = state_dict.pop(src)
+
+
 class LSTM(SequentialModel):
     """
     Class implementing the Long Short-Term Memory model.
 
+    .. note::
+
+        By default (`use_fused_lstm: True`) the whole sequence is processed by a single (multi-layer) \
+        ``torch.nn.LSTM``, with the output layer applied to all items at once. Setting `use_fused_lstm: False` \
+        switches to the stack of ``torch.nn.LSTMCell`` processing the sequence item by item. \
+        Both modes use the same parameters, so checkpoints saved in one mode can be loaded in the other.
+
     """
     def __init__(self, params, problem_default_values_={}):
         """
@@ -53,18 +87,39 @@ class LSTM(SequentialModel):
         self.num_layers = params["num_layers"]
         assert self.num_layers > 0, "Number of LSTM layers should be > 0"
 
-        # Create the stacked LSTM.
-        self.lstm_layers = torch.nn.ModuleList()
-        # First layer.
-        self.lstm_layers.append(torch.nn.LSTMCell(
-            self.input_item_size, self.hidden_state_size))
-        # Following, stacked layers.
-        self.lstm_layers.extend(
-            [torch.nn.LSTMCell(self.hidden_state_size, self.hidden_state_size)
-             for _ in range(1, self.num_layers)])
+        self.params.add_default_params({'use_fused_lstm': True})
+        self.use_fused_lstm = params['use_fused_lstm']
+
+        if self.use_fused_lstm:
+            # Create the multi-layer LSTM processing whole sequences.
+            self.lstm = torch.nn.LSTM(self.input_item_size, self.hidden_state_size,
+                                      num_layers=self.num_layers, batch_first=True)
+        else:
+            # Create the stacked LSTM.
+            self.lstm_layers = torch.nn.ModuleList()
+            # First layer.
+            self.lstm_layers.append(torch.nn.LSTMCell(
+                self.input_item_size, self.hidden_state_size))
+            # Following, stacked layers.
+            self.lstm_layers.extend(
+                [torch.nn.LSTMCell(self.hidden_state_size, self.hidden_state_size)
+                 for _ in range(1, self.num_layers)])
         # Output linear layer.
         self.linear = torch.nn.Linear(self.hidden_state_size, self.output_item_size)
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Renames the LSTM parameters, so checkpoints can be loaded regardless of the value of `use_fused_lstm` \
+        they were saved with.
+
+        """
+        convert_lstm_state_dict(state_dict,
+                                [(prefix + 'lstm_layers.{}.'.format(i), prefix + 'lstm.', i)
+                                 for i in range(self.num_layers)],
+                                self.use_fused_lstm)
+
+        super(LSTM, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def forward(self, data_dict):
         """
         Forward function requires that the data_dict will contain at least "sequences"
@@ -81,6 +136,12 @@ class LSTM(SequentialModel):
         # Unpack dict.
         inputs_BxSxI = data_dict['sequences']
 
+        if self.use_fused_lstm:
+            # Process the whole sequence at once (starting from zero states).
+            hidden_BxSxH, _ = self.lstm(inputs_BxSxI)
+            # Apply the output layer to all items.
+            return self.linear(hidden_BxSxH)
+
         # Get batch size.
         batch_size = inputs_BxSxI.size(0)
 
@@ -89,6 +89,10 @@ class MACNetwork(Model):
         self.memory_gate = params['memory_gate']
         self.dropout = params['dropout']
 
+        # Use the fused recurrence of the MAC cells (optional, default: True).
+        params.add_default_params({'fused_recurrence': True})
+        self.fused_recurrence = params['fused_recurrence']
+
         try:
             self.nb_classes = problem_default_values_['nb_classes']
         except KeyError:
@@ -105,7 +109,10 @@ class MACNetwork(Model):
             max_step=self.max_step,
             self_attention=self.self_attention,
             memory_gate=self.memory_gate,
-            dropout=self.dropout)
+            dropout=self.dropout,
+            fused=self.fused_recurrence)
+        # Recorder of the attention weights (of a single sample) - for visualization.
+        self.mac_unit.cell_state_history = self.create_cell_state_history()
 
         self.output_unit = OutputUnit(dim=self.dim, nb_classes=self.nb_classes)
 
@@ -135,7 +142,7 @@ class MACNetwork(Model):
 
         # reset cell state history for visualization
         if self.app_state.visualize:
-            self.mac_unit.cell_state_history = []
+            self.mac_unit.cell_state_history.reset()
 
         # unpack data_dict
         images = data_dict['images']
@@ -204,7 +211,7 @@ class MACNetwork(Model):
 
         return fig
 
-    def plot(self, data_dict, logits, sample=0):
+    def plot(self, data_dict, logits, sample=None):
         """
         Visualize the attention weights (``ControlUnit`` & ``ReadUnit``) on the \
         question & feature maps. Dynamic visualization throughout the reasoning \
@@ -217,7 +224,7 @@ class MACNetwork(Model):
         :param logits: Prediction of the model.
         :type logits: torch.tensor
 
-        :param sample: Index of sample in batch (Default: 0)
+        :param sample: Index of sample in batch (Default: None, i.e. the sample recorded in the forward pass)
         :type sample: int
 
         :return: True when the user closes the window, False if we do not need to visualize.
@@ -228,6 +235,9 @@ class MACNetwork(Model):
         if not self.app_state.visualize:
             return False
 
+        # Show the sample whose states were recorded.
+        sample = self.get_recorded_sample(sample)
+
         # Initialize timePlot window - if required.
         if self.plotWindow is None:
             from miprometheus.utils.time_plot import TimePlot
@@ -269,8 +279,9 @@ class MACNetwork(Model):
         height = image.size(1)
 
         frames = []
+        # The recorded history contains a single sample (the batch dimension is kept).
         for step, (attention_mask, attention_question) in zip(
-                range(self.max_step), self.mac_unit.cell_state_history):
+                self.mac_unit.cell_state_history.steps, self.mac_unit.cell_state_history):
             # preprocess attention image, reshape
             attention_size = int(np.sqrt(attention_mask.size(-1)))
             # attention mask has size [batch_size x 1 x(H*W)]
@@ -280,10 +291,10 @@ class MACNetwork(Model):
             m = torch.nn.Upsample(
                 size=[width, height], mode='bilinear', align_corners=True)
             up_sample_attention_mask = m(attention_mask)
-            attention_mask = up_sample_attention_mask[sample, 0]
+            attention_mask = up_sample_attention_mask[0, 0]
 
-            # preprocess question, pick one sample number
-            attention_question = attention_question[sample]
+            # preprocess question, pick the recorded sample
+            attention_question = attention_question[0]
 
             # Create "Artists" drawing data on "ImageAxes".
             num_artists = len(fig.axes) + 1
@@ -380,6 +391,8 @@ if __name__ == '__main__':
     # generate a batch
     for i_batch, sample in enumerate(problem):
         print('Sample # {} - {}'.format(i_batch, sample['images'].shape), type(sample))
+        # embed the questions
+        sample = clevr_dataset.prepare_batch(sample)
         logits = model(sample)
         clevr_dataset.plot_preprocessing(sample, logits)
         model.plot(sample, logits)
@@ -105,6 +105,57 @@ class Memory(nn.Module):
 		self.write_gate.bias.data.fill_(0.01)
 		self.write_sharpen.bias.data.fill_(1.00)
 
+	# Heads and the generators of each head, in the order used by :py:func:`fused_generators`.
+	heads = ['read', 'erase', 'write']
+	generators = ['keygen', 'subset_gen', 'mix_gen', 'location', 'gate', 'sharpen']
+
+	def generator_sizes(self):
+		"""
+		Returns the output sizes of the generators of a single head.
+
+		"""
+		return [self.object_size, self.object_size, 2, self.mem_slots, self.object_size, 1]
+
+	def fused_generators(self):
+		"""
+		Concatenates the weights and biases of the generators of all heads (read, erase and write), \
+		so that all of them can be computed with a single matrix multiplication.
+
+		.. note::
+
+			Should be called once per forward pass, as the parameters change between the passes.
+
+		:return: Tuple (weight, bias) to be used with ``torch.nn.functional.linear``. Outputs of \
+		the read generators come first, so ``weight[:size]``, with ``size = sum(generator_sizes())`` \
+		contains only the read generators.
+
+		"""
+		layers = [getattr(self, '{}_{}'.format(head, generator)) for head in self.heads for generator in self.generators]
+		weight = torch.cat([layer.weight for layer in layers], 0)
+		bias = torch.cat([layer.bias for layer in layers], 0)
+		return weight, bias
+
+	def address(self, generated):
+		"""
+		Computes the (sharpened) address and gate of a head from the outputs of its generators.
+
+		:param generated: Outputs of the generators of a single head, concatenated \
+		(in the order of :py:func:`generator_sizes`).
+		:type generated: torch.Tensor
+
+		:return: Tuple (address, gate).
+
+		"""
+		key, subset, mix, location, gate, sharpening = torch.split(generated, self.generator_sizes(), dim=-1)
+
+		content_address = self.subset_similarity(key, torch.sigmoid(subset))
+		location_address = torch.nn.functional.softmax(location, dim=-1)
+		address = torch.nn.functional.softmax(self.address_mix(content_address, location_address,
+															   torch.nn.functional.softmax(mix, dim=-1)), dim=-1)
+		address_sharp = torch.nn.functional.softmax(self.sharpen(address, sharpening), dim=-1)
+
+		return address_sharp, torch.sigmoid(gate)
+
 	def subset_similarity(self, key, subset_attention):
 		"""
 		Returns the similarity of a key to objects in memory.
@@ -129,6 +129,9 @@ class MentalModel(Model):
 		# Misc
 		self.sequence_length = 4
 
+		# Tags of the object candidates, indexed by the sequence length (see coordinate_tags()).
+		self.coordinate_tags_cache = {}
+
 
 
 
@@ -210,10 +213,52 @@ class MentalModel(Model):
 		self.relationalnet_point.bias.data.fill_(0.01)
 		
 
+	def coordinate_tags(self, seq_len):
+		"""
+		Returns the tags (normalized X, Y coordinates and time) of all object candidates, computed once \
+		for a given sequence length.
+
+		X and Y are normalized to [-1, 1], time to [0, 1] (with respect to ``self.sequence_length``).
+
+		:param seq_len: Length of the sequence.
+		:type seq_len: int
+
+		:return: Tensor [seq_len x features_shape^2 x 3], candidates in row-major order.
+
+		"""
+		if seq_len not in self.coordinate_tags_cache:
+			half = 0.5*(self.features_shape-1)
+			coords = (torch.arange(self.features_shape).type(self.dtype) - half) / half
+			times = torch.arange(seq_len).type(self.dtype) / (self.sequence_length-1)
+			num_candidates = self.features_shape*self.features_shape
+
+			tags = torch.stack((coords.view(1,-1,1).expand(seq_len,-1,self.features_shape),
+								coords.view(1,1,-1).expand(seq_len,self.features_shape,-1),
+								times.view(-1,1,1).expand(-1,self.features_shape,self.features_shape)),dim=-1)
+			self.coordinate_tags_cache[seq_len] = tags.contiguous().view(seq_len,num_candidates,3)
+
+		return self.coordinate_tags_cache[seq_len]
+
 	def forward(self,data_dict):
 		"""
 		Forward pass of the ``MentalModel``.
 
+		Everything that does not depend on the memory or controller state is computed at once: the question \
+		embedding, the CNN (over all images of the sequence), the object candidates with their tags, \
+		the contribution of the candidates to the controller input and the relational networks. \
+		The remaining loops are sequential due to the following dependencies:
+
+			- sequence members: the memory is carried over between the images,
+
+			- object candidates: each candidate is processed starting from the memory and controller state \
+			left by the previous one,
+
+			- pondering steps: each step attends to the question, reads from and modifies the memory based \
+			on the controller output of the previous step.
+
+		In every pondering step, all the memory generators (read, erase and write) are computed with \
+		a single matrix multiplication.
+
 		:param data_dict: dictionary of data with images, questions.
 
 		"""
@@ -221,136 +266,115 @@ class MentalModel(Model):
 		# Fetch images, make them sequence major, and normalize.
 		images = data_dict['images'].permute(1,0,2,3,4) / self.img_norm
 		questions = data_dict['questions']
+		seq_len, batch_size = images.size(0), images.size(1)
 
 		# Set memory to blank, with batch size retrieved from input
-		self.memory.reset(images.size(1))
-
-		# Create empty vector to hold embedded question vector
-		y = torch.zeros((questions.size(0),self.nwords,self.words_embed_length))
-		for i, sentence in enumerate(questions):
-			y[i,:,:] = self.embedding(sentence)
-		y, _ = self.lstm1(y,( self.lstm_hidden_init.expand(-1,images.size(1),-1).contiguous(),
-												  self.lstm_cell_init.expand(-1,images.size(1),-1).contiguous() ) )
-
-		
-		# Create empty outputs that will be filled one by one for each member in sequence
-		output_class = torch.zeros((images.size(1),images.size(0),self.output_classes_class),requires_grad=False).type(self.dtype)
-		output_point = torch.zeros((images.size(1),images.size(0),self.output_classes_point),requires_grad=False).type(self.dtype)
+		self.memory.reset(batch_size)
+
+		# Embed all questions at once.
+		y = self.embedding(questions)
+		y, _ = self.lstm1(y,( self.lstm_hidden_init.expand(-1,batch_size,-1).contiguous(),
+												  self.lstm_cell_init.expand(-1,batch_size,-1).contiguous() ) )
+
+		# Process all images of the sequence thru CNN at once.
+		x = self.conv1(images.contiguous().view(seq_len*batch_size,*images.shape[2:]))
+		x = nn.functional.relu(self.maxpool1(x))
+		x = self.conv2(x)
+		x = nn.functional.relu(self.maxpool2(x))
+		x = self.conv3(x)
+		x = nn.functional.relu(self.maxpool3(x))
+		x = self.conv4(x)
+		x = nn.functional.relu(self.maxpool4(x))
+
+		# Each location in the final feature maps is considered an 'object candidate'.
+		# Concatenate object candidates with normalized spatial location and time.
+		# objects is [sequence x batch x candidates x object size]
+		x = x.view(seq_len,batch_size,self.layer_channels[3],-1).permute(0,1,3,2)
+		tags = self.coordinate_tags(seq_len).unsqueeze(1).expand(-1,batch_size,-1,-1)
+		objects = torch.cat((x,tags),dim=-1)
+
+		# Weights of the controller (GRU), used directly so that the contribution of the object candidates \
+		# to the controller input can be computed for all candidates at once.
+		weight_ih, bias_ih = self.controller1.weight_ih_l0, self.controller1.bias_ih_l0
+		weight_hh, bias_hh = self.controller1.weight_hh_l0, self.controller1.bias_hh_l0
+		objects_ih = nn.functional.linear(objects,weight_ih[:,:self.object_size])
+		weight_ih = weight_ih[:,self.object_size:]
+
+		# Generators of all memory heads, fused.
+		generators_weight, generators_bias = self.memory.fused_generators()
+		head_size = sum(self.memory.generator_sizes())
+
+		# Reads from memory of the object-fetching network, collected for all members of sequence.
+		fetched_objects = []
 
 		# First loop, over the members of sequence.
-		for l, image in enumerate(images):
-			# Process image thru CNN
-			x = self.conv1(image)
-			x = nn.functional.relu(self.maxpool1(x))
-			x = self.conv2(x)
-			x = nn.functional.relu(self.maxpool2(x))
-			x = self.conv3(x)
-			x = nn.functional.relu(self.maxpool3(x))
-			x = self.conv4(x)
-			x = nn.functional.relu(self.maxpool4(x))
-			
+		for l in range(seq_len):
 			# Initial states of attention and controller hidden are trainable parameters.
-			controller_out = self.attention_init.expand(image.size(0),1,-1)
-			controller_hidden = self.controller_init.expand(1,image.size(0),-1)
-
-			# Each location in the final feature maps is considered an 'object candidate'. Loop over candidates.
-			for i in range(self.features_shape):
-				for j in range(self.features_shape):
-					# Concatenate object candidates with normalized spatial location and time.
-					obj = torch.cat((x[:,:,i,j], 
-													(torch.Tensor([[i-0.5*(self.features_shape-1),j-0.5*(self.features_shape-1),l]])/torch.Tensor([[0.5*(self.features_shape-1),0.5*(self.features_shape-1),self.sequence_length-1]])).expand(image.size(0),-1)),dim=-1)
-
-					# Create empty object. During reasoning steps the controller may fetch objects from memory to assign to it.
-					mem_obj = torch.zeros_like(obj)
-
-					# For each object candidate, have several reasoning steps. Each step, controller updates attention over question, and may perform read and write to and erase from memory.
-					for k in range(self.pondering):
-						# Semantic attention over the question
-						z = self.semantic_attn1(y,controller_out.squeeze())
-						# Controller takes as input concatenation of current object candidate, an object it fetched from memory, and the post-attention question
-						controller_in = torch.cat((obj,mem_obj,z),dim=-1)
-						controller_out, controller_hidden = self.controller1(controller_in.unsqueeze(1),controller_hidden)
-
-				
-						# Controller output generates read, write and erase keys for content based addressing.
-						# Then, it may choose a subset of that key to compare with, rather than measure similarity to entire key.
-						# A content based location is provided based on the similarity of memory addresses to the key for the subset.
-						# A separate location based address is also generated.
-						# These addresses are mixed and sharpened.
-						# Finally, memory is read from, erased, or written to subject to a final gate.
-						read_key = self.memory.read_keygen(controller_out.squeeze())
-						read_subset = torch.sigmoid(self.memory.read_subset_gen(controller_out.squeeze()))
-						read_content_address = self.memory.subset_similarity(read_key,read_subset)
-						read_location_address = torch.nn.functional.softmax(self.memory.read_location(controller_out.squeeze()),dim=-1)
-						read_address_mix = torch.nn.functional.softmax(self.memory.read_mix_gen(controller_out.squeeze()),dim=-1)
-						read_address = torch.nn.functional.softmax(self.memory.address_mix(read_content_address,read_location_address,read_address_mix),dim=-1)
-						read_sharpen = self.memory.read_sharpen(controller_out.squeeze())
-						read_address_sharp = torch.nn.functional.softmax(self.memory.sharpen(read_address,read_sharpen),dim=-1)
-						read_gate = torch.sigmoid(self.memory.read_gate(controller_out.squeeze()))
-						# This is the fetched memory object that is fed into the controller for the next reasoning step.
-						mem_obj = self.memory.read(read_address_sharp,read_gate)
-						
-						erase_key = self.memory.erase_keygen(controller_out.squeeze())
-						erase_subset = torch.sigmoid(self.memory.erase_subset_gen(controller_out.squeeze()))
-						erase_content_address = self.memory.subset_similarity(erase_key,erase_subset)
-						erase_location_address = torch.nn.functional.softmax(self.memory.erase_location(controller_out.squeeze()),dim=-1)
-						erase_address_mix = torch.nn.functional.softmax(self.memory.erase_mix_gen(controller_out.squeeze()),dim=-1)
-						erase_address = torch.nn.functional.softmax(self.memory.address_mix(erase_content_address,erase_location_address,erase_address_mix),dim=-1)
-						erase_sharpen = self.memory.erase_sharpen(controller_out.squeeze())
-						erase_address_sharp = torch.nn.functional.softmax(self.memory.sharpen(erase_address,erase_sharpen),dim=-1)
-						erase_gate = torch.sigmoid(self.memory.erase_gate(controller_out.squeeze()))
-						self.memory.erase(erase_address_sharp,erase_gate)
-
-						#print(self.memory.memory,k,'ERASE')
-						
-						write_key = self.memory.write_keygen(controller_out.squeeze())
-						write_subset = torch.sigmoid(self.memory.write_subset_gen(controller_out.squeeze()))
-						write_content_address = self.memory.subset_similarity(write_key,write_subset)
-						write_location_address = torch.nn.functional.softmax(self.memory.write_location(controller_out.squeeze()),dim=-1)
-						write_address_mix = torch.nn.functional.softmax(self.memory.write_mix_gen(controller_out.squeeze()),dim=-1)
-						write_address = torch.nn.functional.softmax(self.memory.address_mix(write_content_address,write_location_address,write_address_mix),dim=-1)
-						write_sharpen = self.memory.write_sharpen(controller_out.squeeze())
-						write_address_sharp = torch.nn.functional.softmax(self.memory.sharpen(write_address,write_sharpen),dim=-1)
-						write_gate = torch.sigmoid(self.memory.write_gate(controller_out.squeeze()))
-						self.memory.write(write_address_sharp,write_gate,obj)
-						#print(self.memory.memory,k,'write')
-						
+			controller_out = self.attention_init.view(1,-1).expand(batch_size,-1)
+			controller_hidden = self.controller_init.view(1,-1).expand(batch_size,-1)
+
+			# Loop over object candidates.
+			for c in range(objects.size(2)):
+				obj = objects[l,:,c]
+				obj_ih = objects_ih[l,:,c]
+
+				# Create empty object. During reasoning steps the controller may fetch objects from memory to assign to it.
+				mem_obj = torch.zeros_like(obj)
+
+				# For each object candidate, have several reasoning steps. Each step, controller updates attention over question, and may perform read and write to and erase from memory.
+				for k in range(self.pondering):
+					# Semantic attention over the question
+					z = self.semantic_attn1(y,controller_out)
+					# Controller takes as input concatenation of current object candidate, an object it fetched from memory, and the post-attention question
+					# (single GRU step, with the gates ordered as in nn.GRU: reset, update, new).
+					gi = obj_ih + nn.functional.linear(torch.cat((mem_obj,z),dim=-1),weight_ih,bias_ih)
+					gh = nn.functional.linear(controller_hidden,weight_hh,bias_hh)
+					i_r, i_z, i_n = gi.chunk(3,-1)
+					h_r, h_z, h_n = gh.chunk(3,-1)
+					reset_gate = torch.sigmoid(i_r + h_r)
+					update_gate = torch.sigmoid(i_z + h_z)
+					new_gate = torch.tanh(i_n + reset_gate * h_n)
+					controller_hidden = (1 - update_gate) * new_gate + update_gate * controller_hidden
+					controller_out = controller_hidden
+
+					# Controller output generates read, write and erase keys for content based addressing.
+					# Then, it may choose a subset of that key to compare with, rather than measure similarity to entire key.
+					# A content based location is provided based on the similarity of memory addresses to the key for the subset.
+					# A separate location based address is also generated.
+					# These addresses are mixed and sharpened.
+					# Finally, memory is read from, erased, or written to subject to a final gate.
+					generated = nn.functional.linear(controller_out,generators_weight,generators_bias)
+					read_generated, erase_generated, write_generated = torch.split(generated,head_size,dim=-1)
+
+					# This is the fetched memory object that is fed into the controller for the next reasoning step.
+					read_address, read_gate = self.memory.address(read_generated)
+					mem_obj = self.memory.read(read_address,read_gate)
+
+					erase_address, erase_gate = self.memory.address(erase_generated)
+					self.memory.erase(erase_address,erase_gate)
+
+					write_address, write_gate = self.memory.address(write_generated)
+					self.memory.write(write_address,write_gate,obj)
 
 			# Once all object candidates are processed, an object-fetching network grabs two objects from memory.
 			# It generates two read vectors, which are fed into the read head as above.
 			# This results in two gated reads from memory, which are fed into a Relational Net-ish network along with the final encoding of the question LSTM.
-			# Output is the answer of the network to the task.
-			concatenated_reads = self.objectfetch(torch.cat((controller_out.squeeze(),controller_hidden.squeeze(),y[:,-1,:]),dim=-1))
+			concatenated_reads = self.objectfetch(torch.cat((controller_out,controller_hidden,y[:,-1,:]),dim=-1))
 			read1, read2 = torch.split(concatenated_reads,(self.controller_hidden,self.controller_hidden),-1)
 
-			# Fetch object 1
-			read_key = self.memory.read_keygen(read1.squeeze())
-			read_subset = torch.sigmoid(self.memory.read_subset_gen(read1.squeeze()))
-			read_content_address = self.memory.subset_similarity(read_key,read_subset)
-			read_location_address = torch.nn.functional.softmax(self.memory.read_location(read1.squeeze()),dim=-1)
-			read_address_mix = torch.nn.functional.softmax(self.memory.read_mix_gen(read1.squeeze()),dim=-1)
-			read_address = torch.nn.functional.softmax(self.memory.address_mix(read_content_address,read_location_address,read_address_mix),dim=-1)
-			read_sharpen = self.memory.read_sharpen(read1.squeeze())
-			read_address_sharp = torch.nn.functional.softmax(self.memory.sharpen(read_address,read_sharpen),dim=-1)
-			read_gate = torch.sigmoid(self.memory.read_gate(read1.squeeze()))
-			mem_obj1 = self.memory.read(read_address_sharp,read_gate)
-
-			# Fetch object 2
-			read_key = self.memory.read_keygen(read2.squeeze())
-			read_subset = torch.sigmoid(self.memory.read_subset_gen(read2.squeeze()))
-			read_content_address = self.memory.subset_similarity(read_key,read_subset)
-			read_location_address = torch.nn.functional.softmax(self.memory.read_location(read2.squeeze()),dim=-1)
-			read_address_mix = torch.nn.functional.softmax(self.memory.read_mix_gen(read2.squeeze()),dim=-1)
-			read_address = torch.nn.functional.softmax(self.memory.address_mix(read_content_address,read_location_address,read_address_mix),dim=-1)
-			read_sharpen = self.memory.read_sharpen(read2.squeeze())
-			read_address_sharp = torch.nn.functional.softmax(self.memory.sharpen(read_address,read_sharpen),dim=-1)
-			read_gate = torch.sigmoid(self.memory.read_gate(read2.squeeze()))
-			mem_obj2 = self.memory.read(read_address_sharp,read_gate)	
-			
-			# Store the prediction for the current sequence element in the output tensors.
-			output_class[:,l,:] = self.relationalnet_class(torch.cat((mem_obj1,mem_obj2,y[:,-1,:]),dim=-1))
-			output_point[:,l,:] = self.relationalnet_point(torch.cat((mem_obj1,mem_obj2,y[:,-1,:]),dim=-1))
-		
+			# Fetch objects 1 and 2.
+			read_address, read_gate = self.memory.address(nn.functional.linear(read1,generators_weight[:head_size],generators_bias[:head_size]))
+			mem_obj1 = self.memory.read(read_address,read_gate)
+			read_address, read_gate = self.memory.address(nn.functional.linear(read2,generators_weight[:head_size],generators_bias[:head_size]))
+			mem_obj2 = self.memory.read(read_address,read_gate)
+
+			fetched_objects.append(torch.cat((mem_obj1,mem_obj2),dim=-1))
+
+		# Output is the answer of the network to the task, for all points in sequence at once.
+		relational_input = torch.cat((torch.stack(fetched_objects,dim=1),y[:,-1,:].unsqueeze(1).expand(-1,seq_len,-1)),dim=-1)
+		output_class = self.relationalnet_class(relational_input)
+		output_point = self.relationalnet_point(relational_input)
+
 		# Return output tensors that contain outputs for all points in sequence.
 		return output_class, output_point
 
@@ -364,27 +388,34 @@ class MentalModel(Model):
 					
 		
 if __name__ == '__main__':
-	# Simulate Cog for now.
+	# Benchmark of the forward and backward passes on the mm_cog.yaml setup (batch of 48 sequences of 4 images).
+	import time
 	from miprometheus.utils.param_interface import ParamInterface
+	from miprometheus.utils.data_dict import DataDict
 	params = ParamInterface()
-	mm = MentalModel(params)
+	mm = MentalModel(params, {'num_classes': 55, 'embed_vocab_size': 100})
 
-	# images = [sequence x batch x channels x width x height]
-	images = torch.rand((4,48,3,112,112))
+	# images = [batch x sequence x channels x width x height]
+	images = torch.rand((48,4,3,112,112)) * 255.0
 
 	# questions = [batch x sequence of ints]
-	questions = torch.randint(0,10,(48,16),dtype=torch.long)
-
-	output = mm(images,questions)
-	print(mm.memory.memory)
-	print(output)
-	
-
-	
-
-		
-
-
-
-
-		
+	questions = torch.randint(0,100,(48,24),dtype=torch.long)
+
+	data_dict = DataDict({'images': images, 'questions': questions})
+
+	for backward in [False, True]:
+		times = []
+		for episode in range(4):
+			start = time.perf_counter()
+			if backward:
+				mm.zero_grad()
+				output_class, output_point = mm(data_dict)
+				(output_class.sum() + output_point.sum()).backward()
+			else:
+				with torch.no_grad():
+					output_class, output_point = mm(data_dict)
+			times.append(time.perf_counter() - start)
+		# Skip the first (warm-up) episode.
+		print('{}: {:.3f} s per batch'.format('forward + backward' if backward else 'forward', np.mean(times[1:])))
+
+	print(output_class.size(), output_point.size())
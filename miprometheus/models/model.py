@@ -21,6 +21,8 @@ model.py: contains base abstract model class. All models should subclass it.
 """
 __author__ = "Tomasz Kornuta & Vincent Marois"
 
+import os
+import json
 import torch
 import logging
 import numpy as np
@@ -29,6 +31,8 @@ from datetime import datetime
 from abc import abstractmethod
 
 from miprometheus.utils.app_state import AppState
+from miprometheus.utils.checkpoint_manager import CheckpointManager
+from miprometheus.utils.cell_state_history import CellStateHistory
 
 
 class Model(Module):
@@ -103,6 +107,10 @@ class Model(Module):
 
             >>> self.best_loss = np.inf
 
+        - creates the manager writing the checkpoints to disk (in a background thread):
+
+            >>> self.checkpoint_manager = CheckpointManager(self.logger)
+
         """
         # Call base class constructor here.
         super(Model, self).__init__()
@@ -150,6 +158,92 @@ class Model(Module):
         self.best_loss = np.inf
         self.best_status = "Unknown"
 
+        # Manager writing the checkpoints in a background thread.
+        self.checkpoint_manager = CheckpointManager(self.logger)
+
+    def create_cell_state_history(self):
+        """
+        Creates the recorder of the cell states used for visualization, configured by the `cell_state_history` \
+        section of the model parameters:
+
+            - `sample`: index of the recorded (i.e. visualized) sample (DEFAULT: 0),
+            - `stride`: only every `stride`-th step is recorded (DEFAULT: 1),
+            - `max_length`: maximum number of recorded states (DEFAULT: -1, i.e. unlimited).
+
+        :return: ``CellStateHistory`` object.
+
+        """
+        self.params.add_default_params({'cell_state_history': {'sample': 0, 'stride': 1, 'max_length': -1}})
+        return CellStateHistory(**dict(self.params['cell_state_history']))
+
+    def get_recorded_sample(self, sample=None):
+        """
+        Returns the index of the sample recorded by the cell state history (see \
+        :py:func:`create_cell_state_history`), which the visualization must show, as only its states are \
+        available.
+
+        :param sample: Index of the sample requested by the caller of ``plot()`` (DEFAULT: None, i.e. the \
+        recorded one). A warning is logged if it differs from the recorded one.
+        :type sample: int
+
+        :return: Index of the recorded sample.
+
+        """
+        self.params.add_default_params({'cell_state_history': {'sample': 0}})
+        recorded = self.params['cell_state_history']['sample']
+
+        if sample is not None and sample != recorded:
+            self.logger.warning("Cannot visualize the sample {} as the states of the sample {} were recorded "
+                                "(see the 'cell_state_history' section), visualizing the latter".format(
+                                    sample, recorded))
+
+        return recorded
+
+    def compile_cell(self, cell):
+        """
+        Optionally compiles a recurrent cell, so that the Python overhead of launching many small operations \
+        in every time step is reduced. The mode is set by the `compile_cell` parameter of the model:
+
+            - `none` (default): the cell is returned unchanged,
+            - `compile`: the ``forward`` of the cell is compiled with ``torch.compile()`` (PyTorch 2.0+).
+
+        If the selected mode is not supported by the installed PyTorch version or the cell cannot be compiled, \
+        a warning is logged and the original cell is used.
+
+        .. note::
+
+            Only the ``forward`` method is replaced, so the parameters (and hence the checkpoints) as well as \
+            other methods of the cell (e.g. ``init_state()``) remain unchanged. Cell states (named tuples, \
+            possibly containing lists of tensors) are handled by ``torch.compile()`` as they are.
+
+        :param cell: Recurrent cell (i.e. module executed in every time step).
+        :type cell: ``torch.nn.Module``
+
+        :return: Compiled (or original) cell.
+
+        """
+        self.params.add_default_params({'compile_cell': 'none'})
+        mode = self.params['compile_cell']
+
+        if mode == 'none':
+            return cell
+
+        try:
+            if mode == 'compile' and hasattr(torch, 'compile'):
+                # Shapes (e.g. batch size, number of memory addresses) might change between episodes.
+                cell.forward = torch.compile(cell.forward, dynamic=True)
+            else:
+                self.logger.warning("Compilation mode '{}' is not supported by the installed PyTorch version, "
+                                    "using the original {}".format(mode, type(cell).__name__))
+                return cell
+        except Exception as e:
+            self.logger.warning("Could not compile {} in the '{}' mode, using the original cell: {}".format(
+                type(cell).__name__, mode, e))
+            return cell
+
+        self.logger.info("Compiled {} in the '{}' mode".format(type(cell).__name__, mode))
+        return cell
+
 
     def add_statistics(self, stat_col):
         """
@@ -261,6 +355,12 @@ class Model(Module):
         :type validation_stats: :py:class:`miprometheus.utils.StatisticsCollector` or \
         :py:class:`miprometheus.utils.StatisticsAggregator`
 
+        .. note::
+
+            The checkpoints are written asynchronously by the ``self.checkpoint_manager``. \
+            A change of the training status (without improvement of the loss) only updates the \
+            metadata file (`model_best.json`) associated with the best checkpoint.
+
         :return: True if this is currently the best model (until the current episode, considering the loss).
 
         """
@@ -275,9 +375,8 @@ class Model(Module):
             episode = validation_stats['episode']
             loss = validation_stats['loss']
 
-        # Checkpoint to be saved.
+        # Checkpoint to be saved - the model parameters will be added only if required.
         chkpt = {'name': self.name,
-                 'state_dict': self.state_dict(),
                  'model_timestamp': datetime.now(),
                  'episode': episode,
                  'loss': loss,
@@ -287,34 +386,33 @@ class Model(Module):
                  'validation_stats': validation_stats.export_to_checkpoint()
                 }
 
+        # Check whether this is the best model so far.
+        is_best_model = loss < self.best_loss
+
+        # Export the model parameters only when a checkpoint will actually be written.
+        if self.save_intermediate or is_best_model:
+            chkpt['state_dict'] = self.checkpoint_manager.snapshot_state_dict(self)
+
         # Save the intermediate checkpoint.
         if self.save_intermediate:
             filename = model_dir + 'model_episode_{:05d}.pt'.format(episode)
-            torch.save(chkpt, filename)
-            self.logger.info(
-                "Model and statistics exported to checkpoint {}".format(filename))
+            self.checkpoint_manager.save(chkpt, filename)
 
         # Save the best model.
-        # loss = loss.cpu()  # moving loss value to cpu type to allow (initial) comparison with numpy type
-        if loss < self.best_loss:
+        if is_best_model:
             # Save best loss and status.
             self.best_loss = loss
             self.best_status = training_status
             # Save checkpoint.
             filename = model_dir + 'model_best.pt'
-            torch.save(chkpt, filename)
-            self.logger.info("Model and statistics exported to checkpoint {}".format(filename))
+            self.checkpoint_manager.save(chkpt, filename)
             return True
         elif self.best_status != training_status:
+            self.best_status = training_status
+            # Update status and status time - in the metadata file only.
             filename = model_dir + 'model_best.pt'
-            # Load checkpoint.
-            chkpt_loaded = torch.load(filename, map_location=lambda storage, loc: storage)
-            # Update status and status time.
-            chkpt_loaded['status'] = training_status
-            chkpt_loaded['status_timestamp'] = datetime.now()
-            # Save updated checkpoint.
-            torch.save(chkpt_loaded, filename)
-            self.logger.info("Updated training status in checkpoint {}".format(filename))
+            if self.checkpoint_manager.update_status(filename, training_status, chkpt['status_timestamp']):
+                self.logger.info("Updated training status of checkpoint {}".format(filename))
         # Else: that was not the best model.
         return False
 
@@ -333,6 +431,12 @@ class Model(Module):
         # Load model.
         self.load_state_dict(chkpt['state_dict'])
 
+        # The current training status is stored in the metadata file (if present).
+        metadata_file = CheckpointManager.get_metadata_filename(checkpoint_file)
+        if os.path.isfile(metadata_file):
+            with open(metadata_file, 'r') as f:
+                chkpt['status'] = json.load(f)['status']
+
         # Print statistics.
         self.logger.info(
             "Imported {} parameters from checkpoint from {} (episode: {}, loss: {}, status: {})".format(
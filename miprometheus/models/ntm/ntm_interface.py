@@ -84,6 +84,9 @@ class NTMInterface(Module):
         self.use_content_based_addressing = params['interface'].get(
             'use_content_based_addressing', True)
 
+        # Check if all heads should be processed at once (fused) or one by one.
+        self.use_fused_heads = params['interface'].get('use_fused_heads', True)
+
         # -------------- READ HEADS -----------------#
 
         # Number/size of parameters of a single read head:
@@ -111,11 +114,18 @@ class NTMInterface(Module):
                 'shift': self.interface_shift_size, 'gamma': 1}, "Read")
             assert num_read_params == self.read_param_locations[-1], "Last location must be equal to number of read params."
 
-       # Forward linear layers that generate parameters of read heads.
-        self.hidden2read_list = torch.nn.ModuleList()
-        for _ in range(self.interface_num_read_heads):
-            self.hidden2read_list.append(torch.nn.Linear(
-                self.ctrl_hidden_state_size, num_read_params))
+        self.num_read_params = num_read_params
+
+        if self.use_fused_heads:
+            # Single forward linear layer that generates parameters of all read heads.
+            self.hidden2read_params = torch.nn.Linear(
+                self.ctrl_hidden_state_size, self.interface_num_read_heads * num_read_params)
+        else:
+            # Forward linear layers that generate parameters of read heads.
+            self.hidden2read_list = torch.nn.ModuleList()
+            for _ in range(self.interface_num_read_heads):
+                self.hidden2read_list.append(torch.nn.Linear(
+                    self.ctrl_hidden_state_size, num_read_params))
 
         # -------------- WRITE HEAD -----------------#
         # Number/size of wrrite parameters:
@@ -199,6 +209,28 @@ class NTMInterface(Module):
             read_state_tuples, write_state_tuple)
         return interface_state
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Converts the parameters of read heads between the fused and per-head layouts, so checkpoints \
+        can be loaded regardless of the value of `use_fused_heads` they were saved with.
+
+        """
+        for name in ['weight', 'bias']:
+            fused_key = prefix + 'hidden2read_params.' + name
+            head_keys = [prefix + 'hidden2read_list.{}.'.format(i) + name
+                         for i in range(self.interface_num_read_heads)]
+
+            if self.use_fused_heads and fused_key not in state_dict and head_keys[0] in state_dict:
+                # Stack parameters of the consecutive heads.
+                state_dict[fused_key] = torch.cat([state_dict.pop(key) for key in head_keys], dim=0)
+            elif not self.use_fused_heads and fused_key in state_dict and head_keys[0] not in state_dict:
+                # Split parameters into chunks - one per head.
+                for key, value in zip(head_keys, torch.chunk(state_dict.pop(fused_key),
+                                                             self.interface_num_read_heads, dim=0)):
+                    state_dict[key] = value
+
+        super(NTMInterface, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def forward(self, ctrl_hidden_state_BxH, prev_memory_BxAxC,
                 prev_interface_state_tuple):
         """
@@ -209,6 +241,173 @@ class NTMInterface(Module):
         :param prev_interface_state_tuple: Tuple containing previous read and write attention vectors.
         :returns: List of read vectors [BATCH_SIZE x CONTENT_SIZE], updated memory and state tuple (object of LSTMStateTuple class).
 
+        """
+        if self.use_fused_heads:
+            return self.forward_fused(ctrl_hidden_state_BxH, prev_memory_BxAxC, prev_interface_state_tuple)
+        else:
+            return self.forward_per_head(ctrl_hidden_state_BxH, prev_memory_BxAxC, prev_interface_state_tuple)
+
+    def forward_fused(self, ctrl_hidden_state_BxH, prev_memory_BxAxC,
+                      prev_interface_state_tuple):
+        """
+        Forward function processing all heads (read and write) at once.
+
+        Parameters of all read heads are generated by a single linear layer, memory is normalized once \
+        and the attentions of all heads are updated as a single [BATCH_SIZE x NUM_HEADS x MEMORY_ADDRESSES] tensor.
+
+        :param ctrl_hidden_state_BxH: a Tensor with controller hidden state of size [BATCH_SIZE  x HIDDEN_SIZE]
+        :param prev_memory_BxAxC: Previous state of the memory [BATCH_SIZE x  MEMORY_ADDRESSES x CONTENT_BITS]
+        :param prev_interface_state_tuple: Tuple containing previous read and write attention vectors.
+        :returns: List of read vectors [BATCH_SIZE x CONTENT_SIZE], updated memory and state tuple (object of LSTMStateTuple class).
+
+        """
+        batch_size = ctrl_hidden_state_BxH.size(0)
+        num_read_heads = self.interface_num_read_heads
+
+        # Unpack cell state.
+        (prev_read_state_tuples, prev_write_state_tuple) = prev_interface_state_tuple
+        (prev_write_attention_BxAx1, _, _, _) = prev_write_state_tuple
+        (prev_read_attentions_BxAx1_H, _, _, _) = zip(*prev_read_state_tuples)
+
+        # Previous attentions of all heads (write head is the last one) [BATCH_SIZE x NUM_HEADS x ADDRESSES].
+        prev_attentions_BxHxA = torch.cat(
+            list(prev_read_attentions_BxAx1_H) + [prev_write_attention_BxAx1], dim=2).transpose(1, 2)
+
+        # Parameters of all read heads [BATCH_SIZE x NUM_READ_HEADS x READ_PARAMS].
+        read_params_BxRxP = self.hidden2read_params(ctrl_hidden_state_BxH).view(
+            batch_size, num_read_heads, self.num_read_params)
+        # Parameters of the write head [BATCH_SIZE x 1 x WRITE_PARAMS].
+        write_params_Bx1xP = self.hidden2write_params(ctrl_hidden_state_BxH).unsqueeze(1)
+
+        # Split the parameters and concatenate the addressing ones (shared by read and write heads).
+        read_params = self.split_params(read_params_BxRxP, self.read_param_locations)
+        write_params = self.split_params(write_params_Bx1xP, self.write_param_locations)
+        num_addressing_params = len(read_params)
+        addressing_params = [torch.cat([read_param, write_param], dim=1)
+                             for read_param, write_param in zip(read_params, write_params)]
+        erase_vector_Bx1xC, add_vector_Bx1xC = write_params[num_addressing_params:]
+
+        if self.use_content_based_addressing:
+            query_vectors_BxHxC, betas_BxHx1, gates_BxHx1, shifts_BxHxS, gammas_BxHx1 = addressing_params
+        else:
+            shifts_BxHxS, gammas_BxHx1 = addressing_params
+
+        # Update the attentions of all heads [BATCH_SIZE x NUM_HEADS x ADDRESSES].
+        attentions_BxHxA, content_attentions_BxHxA, gates_BxHx1, shifts_BxHxS = self.update_attentions(
+            query_vectors_BxHxC if self.use_content_based_addressing else None,
+            betas_BxHx1 if self.use_content_based_addressing else None,
+            gates_BxHx1 if self.use_content_based_addressing else None,
+            shifts_BxHxS, gammas_BxHx1, prev_memory_BxAxC, prev_attentions_BxHxA)
+
+        # Read vectors from memory [BATCH_SIZE x NUM_READ_HEADS x CONTENT_BITS].
+        read_vectors_BxRxC = torch.matmul(attentions_BxHxA[:, :num_read_heads], prev_memory_BxAxC)
+        read_vectors_BxC_H = list(torch.unbind(read_vectors_BxRxC, dim=1))
+
+        # Create state tuples - one for every head.
+        # Attentions back to [BATCH_SIZE x ADDRESSES x 1], gates to [BATCH_SIZE x 1 x 1], shifts to [BATCH_SIZE x SHIFT_SIZE x 1].
+        head_state_tuples = [HeadStateTuple(
+            attentions_BxHxA[:, h].unsqueeze(2),
+            content_attentions_BxHxA[:, h].unsqueeze(2),
+            gates_BxHx1[:, h].unsqueeze(2),
+            shifts_BxHxS[:, h].unsqueeze(2)) for h in range(num_read_heads + 1)]
+
+        # Update the memory.
+        write_attention_BxAx1 = head_state_tuples[-1].attention
+        memory_BxAxC = self.update_memory(
+            write_attention_BxAx1,
+            torch.nn.functional.sigmoid(erase_vector_Bx1xC),
+            torch.nn.functional.sigmoid(add_vector_Bx1xC),
+            prev_memory_BxAxC)
+
+        # Pack current cell state.
+        interface_state_tuple = InterfaceStateTuple(
+            head_state_tuples[:num_read_heads], head_state_tuples[-1])
+
+        # Return read vector, new memory state and state tuple.
+        return read_vectors_BxC_H, memory_BxAxC, interface_state_tuple
+
+    def update_attentions(
+            self,
+            query_vectors_BxHxC,
+            betas_BxHx1,
+            gates_BxHx1,
+            shifts_BxHxS,
+            gammas_BxHx1,
+            prev_memory_BxAxC,
+            prev_attentions_BxHxA):
+        """
+        Updates the attention weights of several heads at once (batched version of :py:func:`update_attention`).
+
+        :param query_vectors_BxHxC: Queries used in content-based addressing [BATCH_SIZE x NUM_HEADS x CONTENT_BITS] (None if CBA is not used)
+        :param betas_BxHx1: Strength parameters used in content-based addressing (None if CBA is not used).
+        :param gates_BxHx1: Gating parameters (None if CBA is not used).
+        :param shifts_BxHxS: Shift parameters [BATCH_SIZE x NUM_HEADS x SHIFT_SIZE].
+        :param gammas_BxHx1: Sharpening parameters.
+        :param prev_memory_BxAxC: tensor containing memory before update [BATCH_SIZE x MEMORY_ADDRESSES x CONTENT_BITS]
+        :param prev_attentions_BxHxA: previous attention vectors [BATCH_SIZE x NUM_HEADS x MEMORY_ADDRESSES]
+        :returns: attentions, content-based attentions [BATCH_SIZE x NUM_HEADS x ADDRESS_SIZE], gates and shift kernels (after non-linearities).
+
+        """
+        # Produce location-addressing params.
+        shifts_BxHxS = torch.nn.functional.softmax(shifts_BxHxS, dim=2)
+        # Gamma - oneplus.
+        gammas_BxHx1 = torch.nn.functional.softplus(gammas_BxHx1) + 1
+
+        if self.use_content_based_addressing:
+            # Produce content-addressing params.
+            query_vectors_BxHxC = torch.nn.functional.sigmoid(query_vectors_BxHxC)
+            # Beta: oneplus
+            betas_BxHx1 = torch.nn.functional.softplus(betas_BxHx1) + 1
+            # Produce gating param.
+            gates_BxHx1 = torch.nn.functional.sigmoid(gates_BxHx1)
+
+            # Normalize queries and memory (once for all heads) - along content.
+            norm_query_vectors_BxHxC = torch.nn.functional.normalize(query_vectors_BxHxC, p=2, dim=2)
+            norm_memory_BxAxC = torch.nn.functional.normalize(prev_memory_BxAxC, p=2, dim=2)
+
+            # Calculate cosine similarity [BATCH_SIZE x NUM_HEADS x MEMORY_ADDRESSES].
+            similarity_BxHxA = torch.matmul(norm_query_vectors_BxHxC, torch.transpose(norm_memory_BxAxC, 1, 2))
+
+            # Calculate attention based on strengthened similarity along the "slot dimension".
+            content_attentions_BxHxA = torch.nn.functional.softmax(betas_BxHx1 * similarity_BxHxA, dim=2)
+
+            # Gating mechanism - choose beetween new attention from CBA or attention from previous iteration.
+            attentions_BxHxA = gates_BxHx1 * content_attentions_BxHxA + (1 - gates_BxHx1) * prev_attentions_BxHxA
+        else:
+            attentions_BxHxA = prev_attentions_BxHxA
+
+        # Location-based addressing: 1. Perform circular convolution.
+        # Extend the attentions in a circular manner, then slide the kernels along the addresses.
+        num_addr = attentions_BxHxA.size(2)
+        shift_size = self.interface_shift_size
+        ext_indices_tensor = torch.Tensor(
+            [shift % num_addr for shift in range(
+                -shift_size // 2 + 1, num_addr + shift_size // 2)]).type(AppState().LongTensor)
+        ext_attentions_BxHxEA = torch.index_select(attentions_BxHxA, dim=2, index=ext_indices_tensor)
+        # [BATCH_SIZE x NUM_HEADS x MEMORY_ADDRESSES x SHIFT_SIZE]
+        windows_BxHxAxS = ext_attentions_BxHxEA.unfold(2, shift_size, 1)
+        shifted_attentions_BxHxA = torch.matmul(windows_BxHxAxS, shifts_BxHxS.unsqueeze(3)).squeeze(3)
+
+        # 2. Perform Sharpening.
+        pow_attentions_BxHxA = torch.pow(shifted_attentions_BxHxA + 1e-12, gammas_BxHx1)
+        location_attentions_BxHxA = torch.nn.functional.normalize(pow_attentions_BxHxA, p=1, dim=2)
+
+        if not self.use_content_based_addressing:
+            content_attentions_BxHxA = torch.zeros_like(location_attentions_BxHxA)
+            gates_BxHx1 = torch.zeros_like(gammas_BxHx1)
+
+        return location_attentions_BxHxA, content_attentions_BxHxA, gates_BxHx1, shifts_BxHxS
+
+    def forward_per_head(self, ctrl_hidden_state_BxH, prev_memory_BxAxC,
+                         prev_interface_state_tuple):
+        """
+        Forward function processing the heads one by one.
+
+        :param ctrl_hidden_state_BxH: a Tensor with controller hidden state of size [BATCH_SIZE  x HIDDEN_SIZE]
+        :param prev_memory_BxAxC: Previous state of the memory [BATCH_SIZE x  MEMORY_ADDRESSES x CONTENT_BITS]
+        :param prev_interface_state_tuple: Tuple containing previous read and write attention vectors.
+        :returns: List of read vectors [BATCH_SIZE x CONTENT_SIZE], updated memory and state tuple (object of LSTMStateTuple class).
+
         """
         # Unpack previous cell  state - just to make sure that everything is ok...
         #(prev_read_attentions_BxAx1_H,  prev_write_attention_BxAx1) = prev_interface_state_tuple
@@ -578,3 +777,48 @@ class NTMInterface(Module):
         memory_BxAxC = prev_memory_BxAxC * preserve_content_BxAxC + add_content_BxAxC
 
         return memory_BxAxC
+
+
+if __name__ == "__main__":
+    # Check numerical equivalence of the fused and per-head implementations.
+    logging.basicConfig(level=logging.INFO)
+
+    from miprometheus.utils.param_interface import ParamInterface
+
+    for use_cba in [True, False]:
+        params = ParamInterface()
+        params.add_default_params({
+            'controller': {'hidden_state_size': 5},
+            'interface': {'num_read_heads': 4, 'shift_size': 3,
+                          'use_content_based_addressing': use_cba, 'use_fused_heads': False},
+            'memory': {'num_content_bits': 7}
+            })
+        per_head = NTMInterface(params)
+
+        params['interface'].add_config_params({'use_fused_heads': True})
+        fused = NTMInterface(params)
+        # Load the per-head parameters into the fused interface.
+        fused.load_state_dict(per_head.state_dict())
+
+        batch_size, num_addresses = 3, 6
+        hidden = torch.randn(batch_size, 5)
+        memory = torch.randn(batch_size, num_addresses, 7)
+        state_ph = per_head.init_state(batch_size, num_addresses)
+        state_f = fused.init_state(batch_size, num_addresses)
+
+        # Run several steps, so the previous attentions also differ between heads.
+        for step in range(5):
+            reads_ph, memory_ph, state_ph = per_head(hidden, memory, state_ph)
+            reads_f, memory_f, state_f = fused(hidden, memory, state_f)
+
+            max_diff = max((torch.stack(reads_ph) - torch.stack(reads_f)).abs().max().item(),
+                           (memory_ph - memory_f).abs().max().item(),
+                           (state_ph.write_head.attention - state_f.write_head.attention).abs().max().item())
+            for t_ph, t_f in zip(state_ph.read_heads, state_f.read_heads):
+                for a_ph, a_f in zip(t_ph, t_f):
+                    max_diff = max(max_diff, (a_ph - a_f).abs().max().item())
+
+            assert max_diff < 1e-5, "Fused and per-head outputs differ by {}".format(max_diff)
+            logger.info("CBA: {} step {}: max difference {:.2e}".format(use_cba, step, max_diff))
+            memory = memory_f
+            hidden = torch.randn(batch_size, 5)
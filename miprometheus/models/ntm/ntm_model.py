@@ -59,7 +59,10 @@ class NTM(SequentialModel):
         self.num_memory_content_bits = params['memory']['num_content_bits']
 
         # Initialize recurrent NTM cell.
-        self.ntm_cell = NTMCell(params)
+        self.ntm_cell = self.compile_cell(NTMCell(params))
+
+        # Recorder of the cell states - for the visualization purposes.
+        self.cell_state_history = self.create_cell_state_history()
 
         # Set different visualizations depending on the flags.
         try:
@@ -110,30 +113,24 @@ class NTM(SequentialModel):
         # Initialize 'zero' state.
         cell_state = self.ntm_cell.init_state(init_memory_BxAxC)
 
-        # List of output logits [BATCH_SIZE x OUTPUT_SIZE] of length SEQ_LENGTH
-        output_logits_BxO_S = []
-
         # Check if we want to collect cell history for the visualization
         # purposes.
         if self.app_state.visualize:
-            self.cell_state_history = []
-            self.cell_state_initial = cell_state
-
-        # Divide sequence into chunks of size [BATCH_SIZE x INPUT_SIZE] and
-        # process them one by one.
-        for input_t_Bx1xI in inputs_BxSxI.chunk(inputs_BxSxI.size(1), dim=1):
-            # Process one chunk.
-            output_BxO, cell_state = self.ntm_cell(
-                input_t_Bx1xI.squeeze(1), cell_state)
-            # Append to list of logits.
-            output_logits_BxO_S += [output_BxO]
+            self.cell_state_history.reset()
+            self.cell_state_initial = self.cell_state_history.select_sample(cell_state)
+
+        def step(input_t_BxI, cell_state):
+            # Process one item.
+            output_BxO, cell_state = self.ntm_cell(input_t_BxI, cell_state)
 
             # Collect cell history - for the visualization purposes.
             if self.app_state.visualize:
-                self.cell_state_history.append(cell_state)
+                self.cell_state_history.record(cell_state)
 
-        # Stack logits along time axis (1).
-        output_logits_BxSxO = torch.stack(output_logits_BxO_S, 1)
+            return output_BxO, cell_state
+
+        # Process the sequence item by item, stacking logits along time axis (1).
+        output_logits_BxSxO, _ = self.unroll(step, inputs_BxSxI, cell_state)
 
         return output_logits_BxSxO
 
@@ -196,7 +193,7 @@ class NTM(SequentialModel):
         return fig
 
     def plot_memory_attention_sequence(
-            self, data_dict, predictions, sample_number=0):
+            self, data_dict, predictions, sample_number=None):
         """
         Creates list of figures used in interactive visualization, with a
         slider enabling to move forth and back along the time axis (iteration
@@ -211,13 +208,16 @@ class NTM(SequentialModel):
 
         :param predictions: Prediction sequence [BATCH_SIZE x SEQUENCE_LENGTH x OUTPUT_DATA_SIZE]
 
-        :param sample_number: Number of sample in batch (DEFAULT: 0)
+        :param sample_number: Number of sample in batch (DEFAULT: None, i.e. the sample recorded in the forward pass)
 
         """
         # Check if we are supposed to visualize at all.
         if not self.app_state.visualize:
             return False
 
+        # Show the sample whose states were recorded.
+        sample_number = self.get_recorded_sample(sample_number)
+
         # Initialize timePlot window - if required.
         if self.plotWindow is None:
             from miprometheus.utils.time_plot import TimePlot
@@ -264,18 +264,18 @@ class NTM(SequentialModel):
         # used to draw a given frame.
         frames = []
 
-        for i, (input_element, target_element, prediction_element, cell_state) in enumerate(
-                zip(inputs_seq, targets_seq, predictions_seq, self.cell_state_history)):
+        # Iterate over the recorded steps (the history might be downsampled).
+        for i, cell_state in zip(self.cell_state_history.steps, self.cell_state_history):
             # Display information every 10% of figures.
             if (inputs_seq.shape[0] > 10) and (i %
                                                (inputs_seq.shape[0] // 10) == 0):
                 logger.info(
                     "Generating figure {}/{}".format(i, inputs_seq.shape[0]))
 
-            # Update displayed values on adequate positions.
-            inputs_displayed[:, i] = input_element
-            targets_displayed[:, i] = target_element
-            predictions_displayed[:, i] = prediction_element
+            # Update displayed values on adequate positions (including the skipped steps).
+            inputs_displayed[:, :i + 1] = np.transpose(inputs_seq[:i + 1])
+            targets_displayed[:, :i + 1] = np.transpose(targets_seq[:i + 1])
+            predictions_displayed[:, :i + 1] = np.transpose(predictions_seq[:i + 1])
 
             # Unpack cell state.
             (ctrl_state, interface_state, memory_state, read_vectors) = cell_state
@@ -407,7 +407,7 @@ class NTM(SequentialModel):
         return fig
 
     def plot_memory_all_model_params_sequence(
-            self, data_dict, predictions, sample_number=0):
+            self, data_dict, predictions, sample_number=None):
         """
         Creates list of figures used in interactive visualization, with a
         slider enabling to move forth and back along the time axis (iteration
@@ -422,13 +422,16 @@ class NTM(SequentialModel):
 
         :param predictions: Prediction sequence [BATCH_SIZE x SEQUENCE_LENGTH x OUTPUT_DATA_SIZE]
         
-        :param sample_number: Number of sample in batch (DEFAULT: 0)
+        :param sample_number: Number of sample in batch (DEFAULT: None, i.e. the sample recorded in the forward pass)
 
         """
         # Check if we are supposed to visualize at all.
         if not self.app_state.visualize:
             return False
 
+        # Show the sample whose states were recorded.
+        sample_number = self.get_recorded_sample(sample_number)
+
         # Initialize timePlot window - if required.
         if self.plotWindow is None:
             from miprometheus.utils.time_plot import TimePlot
@@ -503,18 +506,18 @@ class NTM(SequentialModel):
         # used to draw a given frame.
         frames = []
 
-        for i, (input_element, target_element, prediction_element, cell_state) in enumerate(
-                zip(inputs_seq, targets_seq, predictions_seq, self.cell_state_history)):
+        # Iterate over the recorded steps (the history might be downsampled).
+        for i, cell_state in zip(self.cell_state_history.steps, self.cell_state_history):
             # Display information every 10% of figures.
             if (inputs_seq.shape[0] > 10) and (i %
                                                (inputs_seq.shape[0] // 10) == 0):
                 logger.info(
                     "Generating figure {}/{}".format(i, inputs_seq.shape[0]))
 
-            # Update displayed values on adequate positions.
-            inputs_displayed[:, i] = input_element
-            targets_displayed[:, i] = target_element
-            predictions_displayed[:, i] = prediction_element
+            # Update displayed values on adequate positions (including the skipped steps).
+            inputs_displayed[:, :i + 1] = np.transpose(inputs_seq[:i + 1])
+            targets_displayed[:, :i + 1] = np.transpose(targets_seq[:i + 1])
+            predictions_displayed[:, :i + 1] = np.transpose(predictions_seq[:i + 1])
 
             # Unpack cell state.
             (ctrl_state, interface_state, memory_state, read_vectors) = cell_state
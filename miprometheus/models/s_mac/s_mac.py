@@ -378,6 +378,8 @@ if __name__ == '__main__':
     # generate a batch
     for i_batch, sample in enumerate(problem):
         print('Sample # {} - {}'.format(i_batch, sample['images'].shape), type(sample))
+        # embed the questions
+        sample = clevr_dataset.prepare_batch(sample)
         logits = model(sample)
         clevr_dataset.plot_preprocessing(sample, logits)
         model.plot(sample, logits)
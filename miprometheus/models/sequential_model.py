@@ -20,6 +20,7 @@ __author__ = "Tomasz Kornuta, Vincent Marois"
 
 import torch
 import numpy as np
+from torch.utils.checkpoint import checkpoint
 
 from miprometheus.models.model import Model
 from miprometheus.utils.data_dict import DataDict
@@ -59,6 +60,202 @@ class SequentialModel(Model):
                                  'targets': {'size': [-1, -1, -1], 'type': [torch.Tensor]}
                                  }
 
+        # Truncated BPTT and activation checkpointing - disabled by default (see :py:func:`set_bptt`).
+        self.truncation_window = 0
+        self.checkpoint_chunk_size = 0
+
+    def set_bptt(self, truncation_window=0, checkpoint_chunk_size=0):
+        """
+        Sets the parameters of the backpropagation through time, used by :py:func:`unroll`.
+
+        .. note::
+
+            The truncation only limits the number of time steps the gradients flow through. The loss is still \
+            computed (and backpropagated once) over the whole sequence, so the graphs of all windows are kept \
+            until the backward pass and the memory usage is not reduced. Only the checkpointing \
+            (``checkpoint_chunk_size``) reduces the memory used by the activations.
+
+        :param truncation_window: Number of time steps the gradients are propagated through, i.e. the cell state \
+        is detached from the graph every ``truncation_window`` steps (DEFAULT: 0, i.e. full BPTT).
+        :type truncation_window: int
+
+        :param checkpoint_chunk_size: Number of time steps forming a single checkpointed chunk: only the cell states \
+        between the chunks are kept in memory, activations inside a chunk are recomputed during the backward pass \
+        (DEFAULT: 0, i.e. checkpointing disabled).
+        :type checkpoint_chunk_size: int
+
+        """
+        self.truncation_window = truncation_window
+        self.checkpoint_chunk_size = checkpoint_chunk_size
+
+    @staticmethod
+    def flatten_state(state):
+        """
+        Flattens a (nested) cell state into a list of tensors and a specification of its structure.
+
+        :param state: Cell state: tensor or (nested) tuple/named tuple/list of tensors (other objects, \
+        e.g. None, are stored in the specification).
+
+        :return: Tuple (list of tensors, specification).
+
+        """
+        tensors = []
+
+        def _flatten(item):
+            if isinstance(item, torch.Tensor):
+                tensors.append(item)
+                return ('tensor', len(tensors) - 1)
+            if isinstance(item, (tuple, list)):
+                return (type(item), [_flatten(x) for x in item])
+            return ('object', item)
+
+        return tensors, _flatten(state)
+
+    @staticmethod
+    def unflatten_state(tensors, spec):
+        """
+        Recreates the (nested) cell state from a list of tensors and the specification of its structure.
+
+        :param tensors: List of tensors.
+
+        :param spec: Specification returned by :py:func:`flatten_state`.
+
+        :return: Cell state.
+
+        """
+        kind, content = spec
+        if kind == 'tensor':
+            return tensors[content]
+        if kind == 'object':
+            return content
+
+        items = [SequentialModel.unflatten_state(tensors, x) for x in content]
+        # Named tuples are created from positional arguments.
+        return kind(*items) if hasattr(kind, '_fields') else kind(items)
+
+    def detach_state(self, state):
+        """
+        Detaches all tensors of a (nested) cell state from the graph.
+
+        :param state: Cell state.
+
+        :return: Detached cell state.
+
+        """
+        tensors, spec = self.flatten_state(state)
+        return self.unflatten_state([t.detach() for t in tensors], spec)
+
+    @staticmethod
+    def run_steps(step, inputs_BxSxI, cell_state):
+        """
+        Processes a sequence item by item.
+
+        :param step: Function processing a single item, i.e. ``step(input_BxI, cell_state)`` returning \
+        a tuple (output or None, new cell state).
+
+        :param inputs_BxSxI: Input sequence [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+
+        :param cell_state: Initial cell state.
+
+        :return: Tuple (list of outputs, final cell state).
+
+        """
+        outputs = []
+        for t in range(inputs_BxSxI.size(1)):
+            output, cell_state = step(inputs_BxSxI[:, t], cell_state)
+            if output is not None:
+                outputs.append(output)
+        return outputs, cell_state
+
+    def checkpoint_steps(self, step, inputs_BxSxI, cell_state):
+        """
+        Processes a chunk of a sequence item by item, without storing the intermediate activations \
+        (they are recomputed during the backward pass).
+
+        :param step: Function processing a single item (see :py:func:`run_steps`).
+
+        :param inputs_BxSxI: Input sequence (chunk) [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+
+        :param cell_state: Initial cell state.
+
+        :return: Tuple (list of outputs, final cell state).
+
+        """
+        state_tensors, state_spec = self.flatten_state(cell_state)
+        # Structure of the results, filled during the forward pass.
+        results_spec = []
+
+        def run_chunk(dummy, inputs, *tensors):
+            outputs, state = self.run_steps(step, inputs, self.unflatten_state(list(tensors), state_spec))
+            out_tensors, spec = self.flatten_state(state)
+            del results_spec[:]
+            results_spec.extend([len(outputs), spec])
+            return tuple(outputs + out_tensors)
+
+        # The (reentrant) checkpoint requires at least one input requiring gradients, so the gradients \
+        # of the parameters will be computed.
+        dummy = torch.ones(1, requires_grad=True)
+        try:
+            results = checkpoint(run_chunk, dummy, inputs_BxSxI, *state_tensors, use_reentrant=False)
+        except TypeError:
+            # Older PyTorch versions.
+            results = checkpoint(run_chunk, dummy, inputs_BxSxI, *state_tensors)
+
+        num_outputs, spec = results_spec
+        return list(results[:num_outputs]), self.unflatten_state(list(results[num_outputs:]), spec)
+
+    def unroll(self, step, inputs_BxSxI, cell_state):
+        """
+        Processes a sequence item by item, applying the truncated BPTT and activation checkpointing \
+        (see :py:func:`set_bptt`).
+
+        .. note::
+
+            Checkpointing is used only when training (with gradients enabled) and without visualization, \
+            as the items are processed twice (i.e. ``step`` should not have any side effects).
+
+        :param step: Function processing a single item, i.e. ``step(input_BxI, cell_state)`` returning \
+        a tuple (output or None, new cell state).
+
+        :param inputs_BxSxI: Input sequence [BATCH_SIZE x LENGTH_SIZE x INPUT_SIZE].
+
+        :param cell_state: Initial cell state.
+
+        :return: Tuple (outputs stacked along the time axis [BATCH_SIZE x LENGTH_SIZE x OUTPUT_SIZE] \
+        or None if no outputs were produced, final cell state).
+
+        """
+        seq_length = inputs_BxSxI.size(1)
+
+        use_checkpointing = self.checkpoint_chunk_size > 0 and self.training and torch.is_grad_enabled() \
+            and not self.app_state.visualize
+
+        # Split the sequence into chunks ending at truncation and checkpointing boundaries.
+        boundaries = {0, seq_length}
+        if self.truncation_window > 0:
+            boundaries.update(range(0, seq_length, self.truncation_window))
+        if use_checkpointing:
+            boundaries.update(range(0, seq_length, self.checkpoint_chunk_size))
+        boundaries = sorted(boundaries)
+
+        outputs = []
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            # Truncate the gradients.
+            if self.truncation_window > 0 and start > 0 and start % self.truncation_window == 0:
+                cell_state = self.detach_state(cell_state)
+
+            if use_checkpointing:
+                chunk_outputs, cell_state = self.checkpoint_steps(step, inputs_BxSxI[:, start:end], cell_state)
+            else:
+                chunk_outputs, cell_state = self.run_steps(step, inputs_BxSxI[:, start:end], cell_state)
+            outputs.extend(chunk_outputs)
+
+        if len(outputs) == 0:
+            return None, cell_state
+
+        # Stack outputs along the time axis.
+        return torch.stack(outputs, dim=-2), cell_state
+
     def plot(self, data_dict, predictions, sample=0):
         """
         Creates a default interactive visualization, with a slider enabling to
@@ -22,7 +22,9 @@ __author__ = "Younes Bouhadjar & Vincent Marois"
 
 import torch
 from torch.nn import Module
+from miprometheus.utils.app_state import AppState
 from miprometheus.models.thalnet.thalnet_module import ThalnetModule
+from miprometheus.models.controllers.ffgru_controller import FFGRUStateTuple
 
 
 class ThalNetCell(Module):
@@ -31,14 +33,31 @@ class ThalNetCell(Module):
 
     It is constituted of several ``ThalNetModule``.
 
+    .. note::
+
+        All modules read the same (previous) center state, so they are independent within a time step. \
+        By default (`grouped=True`) the parameters of all modules are stacked into grouped tensors, \
+        so that a time step consists of a handful of batched matrix multiplications instead of \
+        `num_modules` separate module calls. The GRU states of the modules are zero-padded to the largest \
+        state size (the state of the last module also contains the output), the padded units are \
+        discarded after each step.
+
+        Setting `grouped=False` switches to the original ``ModuleList`` of ``ThalNetModule``. \
+        Both modes compute the same function and checkpoints saved in one mode can be loaded in the other.
+
     """
 
+    # Names of the grouped parameters.
+    grouped_parameter_names = ['context_weight_g', 'context_weight_v', 'context_bias', 'input_weight',
+                               'ff_weight', 'ff_bias', 'weight_ih', 'weight_hh', 'bias_ih', 'bias_hh']
+
     def __init__(self,
                  input_size: int,
                  output_size: int,
                  context_input_size: int,
                  center_size_per_module: int,
-                 num_modules: int):
+                 num_modules: int,
+                 grouped: bool = True):
         """
         Constructor of the ``ThalNetCell`` class.
 
@@ -57,6 +76,9 @@ class ThalNetCell(Module):
         :param num_modules: number of modules to constitute the cell.
         :type num_modules: int
 
+        :param grouped: Use the grouped parameters of all modules (DEFAULT: True).
+        :type grouped: bool
+
         """
         # Call base class inits here.
         super(ThalNetCell, self).__init__()
@@ -67,11 +89,12 @@ class ThalNetCell(Module):
         self.center_size = num_modules * center_size_per_module
         self.center_size_per_module = center_size_per_module
         self.num_modules = num_modules
+        self.grouped = grouped
 
         # init module-center cell
-        self.modules_thalnet = torch.nn.ModuleList()
+        modules_thalnet = torch.nn.ModuleList()
 
-        self.modules_thalnet.append(
+        modules_thalnet.append(
             ThalnetModule(
                 center_size=self.center_size,
                 context_size=self.context_input_size,
@@ -79,7 +102,7 @@ class ThalNetCell(Module):
                 input_size=self.input_size,
                 output_size=0))
 
-        self.modules_thalnet.extend(
+        modules_thalnet.extend(
             [
                 ThalnetModule(
                     center_size=self.center_size,
@@ -91,6 +114,118 @@ class ThalNetCell(Module):
                     1,
                     self.num_modules)])
 
+        # Sizes of the outputs and GRU states of the modules.
+        self.output_sizes = [module.output_size for module in modules_thalnet]
+        self.hidden_sizes = [module.controller_hidden_size for module in modules_thalnet]
+        self.max_hidden_size = max(self.hidden_sizes)
+
+        if not self.grouped:
+            self.modules_thalnet = modules_thalnet
+            return
+
+        # Initialize the grouped parameters with the parameters of the (freshly initialized) modules.
+        state_dict = modules_thalnet.state_dict(prefix='modules_thalnet.')
+        self.group_state_dict(state_dict, '')
+        for name in self.grouped_parameter_names:
+            if name in state_dict:
+                self.register_parameter(name, torch.nn.Parameter(state_dict[name].detach().clone()))
+        if 'input_weight' not in state_dict:
+            self.input_weight = None
+
+    def group_state_dict(self, state_dict, prefix):
+        """
+        Converts (in place) the parameters of the separate modules into the grouped parameters.
+
+        :param state_dict: State dict to be converted.
+        :type state_dict: dict
+
+        :param prefix: Prefix of the cell parameters.
+        :type prefix: str
+
+        """
+        M, H = self.num_modules, self.max_hidden_size
+        module_keys = [prefix + 'modules_thalnet.{}.'.format(m) for m in range(M)]
+
+        def pop(m, name):
+            return state_dict.pop(module_keys[m] + name)
+
+        # Reading mechanism.
+        for name, key in [('context_weight_g', 'fc_context.weight_g'), ('context_weight_v', 'fc_context.weight_v'),
+                          ('context_bias', 'fc_context.bias')]:
+            state_dict[prefix + name] = torch.stack([pop(m, key) for m in range(M)])
+
+        # Feed-forward layers of the controllers: only the first module gets the inputs, \
+        # concatenated before the context.
+        ff_weights = [pop(m, 'controller.ff.weight') for m in range(M)]
+        if self.input_size:
+            state_dict[prefix + 'input_weight'] = ff_weights[0][:, :self.input_size]
+            ff_weights[0] = ff_weights[0][:, self.input_size:]
+        state_dict[prefix + 'ff_weight'] = torch.stack(ff_weights)
+        state_dict[prefix + 'ff_bias'] = torch.stack([pop(m, 'controller.ff.bias') for m in range(M)])
+
+        # GRU cells, zero-padded to the largest state: [M, 3 (gates), H, ...].
+        for name in ['weight_ih', 'weight_hh', 'bias_ih', 'bias_hh']:
+            tensors = [pop(m, 'controller.gru.' + name) for m in range(M)]
+            grouped = tensors[0].new_zeros((M, 3, H) + ((H,) if name == 'weight_hh' else tensors[0].shape[1:]))
+            for m, tensor in enumerate(tensors):
+                Hm = self.hidden_sizes[m]
+                tensor = tensor.view((3, Hm) + tensor.shape[1:])
+                if name == 'weight_hh':
+                    grouped[m, :, :Hm, :Hm] = tensor
+                else:
+                    grouped[m, :, :Hm] = tensor
+            state_dict[prefix + name] = grouped
+
+    def ungroup_state_dict(self, state_dict, prefix):
+        """
+        Converts (in place) the grouped parameters into the parameters of the separate modules.
+
+        :param state_dict: State dict to be converted.
+        :type state_dict: dict
+
+        :param prefix: Prefix of the cell parameters.
+        :type prefix: str
+
+        """
+        M = self.num_modules
+        module_keys = [prefix + 'modules_thalnet.{}.'.format(m) for m in range(M)]
+        grouped = {name: state_dict.pop(prefix + name) for name in self.grouped_parameter_names
+                   if prefix + name in state_dict}
+
+        for m in range(M):
+            Hm = self.hidden_sizes[m]
+            state_dict[module_keys[m] + 'fc_context.weight_g'] = grouped['context_weight_g'][m]
+            state_dict[module_keys[m] + 'fc_context.weight_v'] = grouped['context_weight_v'][m]
+            state_dict[module_keys[m] + 'fc_context.bias'] = grouped['context_bias'][m]
+
+            ff_weight = grouped['ff_weight'][m]
+            if m == 0 and self.input_size:
+                ff_weight = torch.cat((grouped['input_weight'], ff_weight), dim=1)
+            state_dict[module_keys[m] + 'controller.ff.weight'] = ff_weight
+            state_dict[module_keys[m] + 'controller.ff.bias'] = grouped['ff_bias'][m]
+
+            state_dict[module_keys[m] + 'controller.gru.weight_ih'] = \
+                grouped['weight_ih'][m, :, :Hm].contiguous().view(3 * Hm, -1)
+            state_dict[module_keys[m] + 'controller.gru.weight_hh'] = \
+                grouped['weight_hh'][m, :, :Hm, :Hm].contiguous().view(3 * Hm, Hm)
+            state_dict[module_keys[m] + 'controller.gru.bias_ih'] = grouped['bias_ih'][m, :, :Hm].contiguous().view(-1)
+            state_dict[module_keys[m] + 'controller.gru.bias_hh'] = grouped['bias_hh'][m, :, :Hm].contiguous().view(-1)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Converts the parameters saved in the other (grouped/separate modules) mode before loading them.
+
+        """
+        grouped_saved = (prefix + 'context_weight_v') in state_dict
+        modules_saved = (prefix + 'modules_thalnet.0.fc_context.weight_v') in state_dict
+
+        if self.grouped and modules_saved and not grouped_saved:
+            self.group_state_dict(state_dict, prefix)
+        elif not self.grouped and grouped_saved and not modules_saved:
+            self.ungroup_state_dict(state_dict, prefix)
+
+        super(ThalNetCell, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def init_state(self, batch_size):
         """
         Initialize the state of ``ThalNet``.
@@ -101,10 +236,19 @@ class ThalNetCell(Module):
         :return: Initialized states of the ThalNet cell.
 
         """
+        if not self.grouped:
+            # module and center state initialisation
+            states = [self.modules_thalnet[i].init_state(
+                batch_size) for i in range(self.num_modules)]
+
+            return states
+
+        dtype = AppState().dtype
 
-        # module and center state initialisation
-        states = [self.modules_thalnet[i].init_state(
-            batch_size) for i in range(self.num_modules)]
+        # The same states as returned by the separate modules.
+        states = [(torch.randn((batch_size, self.center_size_per_module)).type(dtype),
+                   FFGRUStateTuple(torch.zeros((batch_size, hidden_size), requires_grad=False).type(dtype)))
+                  for hidden_size in self.hidden_sizes]
 
         return states
 
@@ -124,6 +268,9 @@ class ThalNetCell(Module):
             - prediction [batch_size, output_size]
 
         """
+        if self.grouped:
+            return self.forward_grouped(inputs, prev_state)
+
         prev_center_states = [prev_state[i][0]
                               for i in range(self.num_modules)]
         prev_controller_states = [prev_state[i][1]
@@ -141,3 +288,79 @@ class ThalNetCell(Module):
             states.append((center_feature, module_state))
 
         return output, states
+
+    def forward_grouped(self, inputs, prev_state):
+        """
+        forward run of the ``ThalNetCell``, processing all modules at once with the grouped parameters.
+
+        :param inputs: inputs at time t, [batch_size, input_size]
+        :type inputs: torch.tensor
+
+        :param prev_state: previous state (list of tuples (center state, GRU state tuple), one per module)
+
+        :return: prediction [batch_size, output_size] and states (as in :py:func:`forward`).
+
+        """
+        M, H = self.num_modules, self.max_hidden_size
+
+        if inputs is not None and len(inputs.size()) == 3:
+            # inputs_size : [batch_size, num_channel, input_size]
+            # select channel
+            inputs = inputs[:, 0, :]
+
+        # Concatenate all the centers: [batch_size, center_size].
+        prev_center_states = torch.cat([prev_state[i][0] for i in range(M)], dim=1)
+
+        # Stack the GRU states, padded to the largest size: [M, batch_size, H].
+        prev_hidden = torch.stack([torch.nn.functional.pad(prev_state[i][1].hidden_state, (0, H - self.hidden_sizes[i]))
+                                   for i in range(M)])
+
+        # Get the context inputs of all modules (weight normalization as in torch.nn.utils.weight_norm): [M, batch_size, context_size].
+        context_weight = self.context_weight_v * (self.context_weight_g / self.context_weight_v.norm(dim=2, keepdim=True))
+        context = torch.matmul(prev_center_states, context_weight.transpose(1, 2)) + self.context_bias.unsqueeze(1)
+
+        # Feed-forward layers of the controllers, the first one also gets the inputs.
+        ff = torch.baddbmm(self.ff_bias.unsqueeze(1), context, self.ff_weight.transpose(1, 2))
+        if self.input_weight is not None:
+            ff = torch.cat((ff[:1] + torch.nn.functional.linear(inputs, self.input_weight).unsqueeze(0), ff[1:]), dim=0)
+
+        # GRU cells (gates ordered as in torch.nn.GRUCell: reset, update, new).
+        gi = torch.baddbmm(self.bias_ih.view(M, 1, 3 * H), ff, self.weight_ih.view(M, 3 * H, -1).transpose(1, 2))
+        gh = torch.baddbmm(self.bias_hh.view(M, 1, 3 * H), prev_hidden, self.weight_hh.view(M, 3 * H, H).transpose(1, 2))
+        i_r, i_z, i_n = gi.chunk(3, dim=2)
+        h_r, h_z, h_n = gh.chunk(3, dim=2)
+        reset_gate = torch.sigmoid(i_r + h_r)
+        update_gate = torch.sigmoid(i_z + h_z)
+        new_gate = torch.tanh(i_n + reset_gate * h_n)
+        hidden = (1 - update_gate) * new_gate + update_gate * prev_hidden
+
+        # Unpack the states, discarding the padding.
+        output = None
+        states = []
+        for i in range(M):
+            module_state = hidden[i, :, :self.hidden_sizes[i]]
+            if self.output_sizes[i]:
+                output, center_feature = torch.split(
+                    module_state, [self.output_sizes[i], self.center_size_per_module], dim=1)
+            else:
+                output, center_feature = None, module_state
+            states.append((center_feature, FFGRUStateTuple(module_state)))
+
+        return output, states
+
+
+if __name__ == "__main__":
+    # Check that both modes compute the same function (sharing the parameters).
+    torch.manual_seed(0)
+    cells = [ThalNetCell(10, 8, 32, 32, 4, grouped) for grouped in [False, True]]
+    cells[1].load_state_dict(cells[0].state_dict())
+
+    inputs = torch.randn(5, 10)
+    state = cells[0].init_state(5)
+    for _ in range(3):
+        (output_modules, state_modules), (output_grouped, state_grouped) = [cell(inputs, state) for cell in cells]
+        print("Max output difference: ", (output_modules - output_grouped).abs().max().item())
+        state = state_modules
+
+    # Loading in the other direction.
+    cells[0].load_state_dict(cells[1].state_dict())
@@ -71,16 +71,21 @@ class ThalNetModel(SequentialModel):
         self.num_modules = params['num_modules']
         self.output_center_size = self.output_size + self.center_size_per_module
 
+        # Process all modules at once, with grouped parameters (optional, default: True).
+        self.params.add_default_params({'use_grouped_modules': True})
+        self.use_grouped_modules = params['use_grouped_modules']
+
         # This is for the time plot
         self.cell_state_history = None
 
         # Create the DWM components
-        self.ThalnetCell = ThalNetCell(
+        self.ThalnetCell = self.compile_cell(ThalNetCell(
             self.input_size,
             self.output_size,
             self.context_input_size,
             self.center_size_per_module,
-            self.num_modules)
+            self.num_modules,
+            self.use_grouped_modules))
 
         # model name
         self.name = 'ThalNetModel'
@@ -106,35 +111,26 @@ class ThalNetModel(SequentialModel):
         if self.app_state.visualize:
             self.cell_state_history = []
 
-        output = None
         batch_size = inputs.size(0)
-        seq_length = inputs.size(-2)
 
         # init state
         cell_state = self.ThalnetCell.init_state(batch_size)
-        for j in range(seq_length):
-            output_cell, cell_state = self.ThalnetCell(
-                inputs[..., j, :], cell_state)
-
-            if output_cell is None:
-                continue
-
-            output_cell = output_cell[..., None, :]
-            if output is None:
-                output = output_cell
-
-            # concatenate output
-            else:
-                output = torch.cat([output, output_cell], dim=-2)
+        def step(input_t, cell_state):
+            output_cell, cell_state = self.ThalnetCell(input_t, cell_state)
 
             # This is for the time plot
-            if self.app_state.visualize:
+            if output_cell is not None and self.app_state.visualize:
                 self.cell_state_history.append(
                     [cell_state[i][0].detach().numpy()
                      for i in range(self.num_modules)] +
                     [cell_state[i][1].hidden_state.detach().numpy()
                      for i in range(self.num_modules)])
 
+            return output_cell, cell_state
+
+        # Process the sequence item by item, concatenating outputs along the time axis.
+        output, _ = self.unroll(step, inputs, cell_state)
+
         return output
 
     def generate_figure_layout(self):
@@ -47,6 +47,7 @@ import numpy as np
 import torch.nn as nn
 
 from miprometheus.models.model import Model
+from miprometheus.models.lstm.lstm_model import convert_lstm_state_dict
 from miprometheus.models.vqa_baselines.stacked_attention_networks.stacked_attention_layer import StackedAttentionLayer
 
 
@@ -56,7 +57,14 @@ class MultiHopsStackedAttentionNetwork(Model):
     question words.
 
     The implementation details are very similar to the `StackedAttentionNetwork``, to the difference that \
-    it uses an LSTMCell instead of an LSTM.
+    the attention is applied to the hidden state of the LSTM after every question word.
+
+    .. note::
+
+        By default (`use_fused_lstm: True`) the question is encoded by a ``torch.nn.LSTM`` at once and the attention \
+        of all hops is computed as one batched operation over the hidden states. Setting `use_fused_lstm: False` \
+        switches to the ``torch.nn.LSTMCell`` processing the question word by word. \
+        Both modes use the same parameters, so checkpoints saved in one mode can be loaded in the other.
 
     .. warning::
 
@@ -115,9 +123,18 @@ class MultiHopsStackedAttentionNetwork(Model):
         # Instantiate LSTM for question encoding
         self.hidden_size = self.image_encoding_channels
 
-        self.lstm = nn.LSTMCell(input_size=self.question_encoding_size,
+        params.add_default_params({'use_fused_lstm': True})
+        self.use_fused_lstm = params['use_fused_lstm']
+
+        if self.use_fused_lstm:
+            self.lstm = nn.LSTM(input_size=self.question_encoding_size,
                                 hidden_size=self.hidden_size,
-                                bias=True)
+                                bias=True,
+                                batch_first=True)
+        else:
+            self.lstm = nn.LSTMCell(input_size=self.question_encoding_size,
+                                    hidden_size=self.hidden_size,
+                                    bias=True)
 
         # Retrieve attention layer parameters
         self.mid_features_attention = params['attention_layer']['nb_nodes']
@@ -139,6 +156,15 @@ class MultiHopsStackedAttentionNetwork(Model):
             'targets': {'size': [-1, self.nb_classes], 'type': [torch.Tensor]}
             }
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Renames the parameters of the question LSTM saved in the other (fused/cell) mode before loading them.
+
+        """
+        convert_lstm_state_dict(state_dict, [(prefix + 'lstm.', prefix + 'lstm.', 0)], self.use_fused_lstm)
+
+        super(MultiHopsStackedAttentionNetwork, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def init_hidden_states(self, batch_size):
         """
         Initialize the hidden and cell states of the LSTM to 0.
@@ -180,24 +206,27 @@ class MultiHopsStackedAttentionNetwork(Model):
         encoded_images = encoded_images.view(encoded_images.size(0), encoded_images.size(1), -1).transpose(1, 2)
 
         # 2. Encode the questions
-        v_features = None
-
         # initialize the LSTM states
         hx, cx = self.init_hidden_states(batch_size)
 
-        for i in range(questions.size(1)):
+        if self.use_fused_lstm:
+            # Hidden states after every word: [batch_size, num_words, hidden_size].
+            hidden_states, _ = self.lstm(questions, (hx.unsqueeze(0), cx.unsqueeze(0)))
+            hx = hidden_states[:, -1, :]
+
+        else:
+            # Buffer for the hidden states after every word.
+            hidden_states = encoded_images.new_empty((batch_size, questions.size(1), self.hidden_size))
 
-            hx, cx = self.lstm(questions[:, i, :], (hx, cx))
-            # 3. Go through the ``StackedAttentionLayer``.
-            v = self.apply_attention(encoded_images, hx.squeeze(1))
+            for i in range(questions.size(1)):
+                hx, cx = self.lstm(questions[:, i, :], (hx, cx))
+                hidden_states[:, i, :] = hx
 
-            if v_features is None:
-                v_features = v
-            else:
-                v_features = torch.cat((v_features, v), dim=-1)
+        # 3. Go through the ``StackedAttentionLayer``, for all hops at once: [batch_size, num_words, channels].
+        v_features = self.apply_attention(encoded_images, hidden_states)
 
-                # 4. Classify based on the result of the stacked attention layer
-        combined = torch.cat([v_features, hx], dim=1)
+        # 4. Classify based on the result of the stacked attention layer (hop outputs concatenated).
+        combined = torch.cat([v_features.view(batch_size, -1), hx], dim=1)
         x = torch.nn.functional.relu(self.fc1(combined))
         x = torch.nn.functional.relu(self.fc2(x))
         x = torch.nn.functional.dropout(x)  # p=0.5
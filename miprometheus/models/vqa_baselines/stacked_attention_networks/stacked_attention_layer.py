@@ -82,10 +82,11 @@ class StackedAttentionLayer(Module):
         [batch_size, width * height, num_channels_encoded_image]
         :type encoded_image: torch.tensor
 
-        :param encoded_question: Last hidden layer of the LSTM, of shape [batch_size, question_encoding_size]
+        :param encoded_question: Last hidden layer of the LSTM, of shape [batch_size, question_encoding_size], \
+        or hidden states of several hops (processed at once), of shape [batch_size, num_hops, question_encoding_size]
         :type encoded_question: torch.tensor
 
-        :return: u: attention [batch_size, num_channels_encoded_image]
+        :return: u: attention [batch_size, num_channels_encoded_image] (or [batch_size, num_hops, num_channels_encoded_image])
 
         """
 
@@ -142,13 +143,14 @@ class AttentionLayer(Module):
         [batch_size, width * height, num_channels_encoded_image]
         :type encoded_image: torch.tensor
 
-        :param encoded_question: Last hidden layer of the LSTM, of shape [batch_size, question_encoding_size]
+        :param encoded_question: Last hidden layer of the LSTM, of shape [batch_size, question_encoding_size], \
+        or hidden states of several hops, of shape [batch_size, num_hops, question_encoding_size]
         :type encoded_question: torch.tensor
 
         :returns:
             - "Refined query vector" (weighted sum of the image vectors, combine with the question vector), \
-            of shape [batch_size, num_channels_encoded_image]
-            - Attention weights, todo: shape?
+            of shape [batch_size, num_channels_encoded_image] (or [batch_size, num_hops, num_channels_encoded_image])
+            - Attention weights, of shape [batch_size, width * height, 1] (or [batch_size, num_hops, width * height, 1])
 
         """
 
@@ -156,14 +158,21 @@ class AttentionLayer(Module):
         key = self.ff_image(encoded_image)
 
         # Get the query, unsqueeze to be able to add the query to all channel
-        query = self.ff_ques(encoded_question).unsqueeze(dim=1)
+        query = self.ff_ques(encoded_question).unsqueeze(dim=-2)
+
+        if encoded_question.dim() == 3:
+            # Several hops: the key and image are shared by all hops.
+            key = key.unsqueeze(dim=1)
+            encoded_image = encoded_image.unsqueeze(dim=1)
+
         weighted_key_query = torch.nn.functional.tanh(key + query)
 
         # Get attention over the different layers
         weighted_key_query = self.ff_attention(weighted_key_query)
         attention_prob = torch.nn.functional.softmax(weighted_key_query, dim=-2)
 
-        vi_attended = (attention_prob * encoded_image).sum(dim=1)
+        # Weighted sum of the image vectors: [..., 1, width * height] x [..., width * height, channels].
+        vi_attended = torch.matmul(attention_prob.transpose(-1, -2), encoded_image).squeeze(dim=-2)
         u = vi_attended + encoded_question
 
         return u, attention_prob
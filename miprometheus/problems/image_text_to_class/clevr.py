@@ -61,6 +61,7 @@ from torchvision import models
 from torchvision import transforms
 
 from miprometheus.utils.problems_utils.language import Language
+from miprometheus.utils.problems_utils.question_store import QuestionStore
 from miprometheus.utils.data_dict import DataDict
 
 from miprometheus.problems.image_text_to_class.image_text_to_class_problem import ImageTextToClassProblem
@@ -182,6 +183,11 @@ class CLEVR(ImageTextToClassProblem):
                     `Should work for both the training & validation samples although only has been tested on validation \
                     samples so far`.
 
+        - ``sampling``:
+
+            - ``min_family_weight``: Weight added to the error rate of every question family when computing the \
+            sampling weights (see :py:func:`get_sample_weights`), so that solved families are still sampled.
+
 
     .. note::
 
@@ -191,7 +197,8 @@ class CLEVR(ImageTextToClassProblem):
         >>>                        'set': 'train',
         >>>                        'dataset_variant': 'CLEVR'},
         >>>           'images': {'raw_images': True},
-        >>>           'questions': {'embedding_type': 'random', 'embedding_dim': 300, 'embedding_source': 'CLEVR'}})
+        >>>           'questions': {'embedding_type': 'random', 'embedding_dim': 300, 'embedding_source': 'CLEVR'},
+        >>>           'sampling': {'min_family_weight': 0.1}})
 
 
     """
@@ -251,8 +258,7 @@ class CLEVR(ImageTextToClassProblem):
             'query_material': 'query_attribute'}
 
         # for storing the number of correct predictions & total number of questions per category
-        self.tuple_list = [[0, 0] for _ in range(len(self.categories .keys()))]
-        self.categories_stats = dict(zip(self.categories .keys(), self.tuple_list))
+        self.categories_stats = {family: [0, 0] for family in self.categories.keys()}
 
         # problem name
         self.name = 'CLEVR'
@@ -274,14 +280,29 @@ class CLEVR(ImageTextToClassProblem):
                                     ' them here.'.format(os.path.join(self.data_folder, 'generated_files', self.cnn_model, self.set)))
                 self.generate_feature_maps_file()
 
-        # check if the file containing the tokenized questions (& answers, image filename, type etc.) exists or not
-        questions_filename = os.path.join(self.data_folder, 'generated_files', '{}_{}_questions.pkl'.format(self.set, self.dataset))
-        if os.path.isfile(questions_filename) and self.embedding_source == self.dataset:
-            self.logger.info('The file {} already exists, loading it.'.format(questions_filename))
+        # check if the store containing the tokenized questions (& answers, image filename, type etc.) exists or not
+        questions_prefix = self.get_questions_prefix(self.set)
+        # file containing the (pickled) tokenized questions, created by the previous versions
+        questions_filename = questions_prefix + '.pkl'
+        if self.embedding_source == self.dataset and (QuestionStore.exists(questions_prefix) or
+                                                      os.path.isfile(questions_filename)):
 
-            # load questions
-            with open(questions_filename, 'rb') as questions:
-                self.data = pickle.load(questions)
+            if QuestionStore.exists(questions_prefix):
+                self.logger.info('The question store {} already exists, loading it.'.format(questions_prefix))
+                self.data = QuestionStore.load(questions_prefix)
+
+            else:
+                self.logger.info('The file {} already exists, converting it to a question store.'.format(
+                    questions_filename))
+                with open(questions_filename, 'rb') as f:
+                    questions = pickle.load(f)
+
+                self.data = QuestionStore.from_questions(tokens=[q['tokenized_question'] for q in questions],
+                                                         answers=[q['answer'] for q in questions],
+                                                         strings=[q['string_question'] for q in questions],
+                                                         images=[q['imgfile'] for q in questions],
+                                                         families=[q['question_type'] for q in questions],
+                                                         prefix=questions_prefix)
 
             # load word_dic & answer_dic
             with open(os.path.join(self.data_folder, 'generated_files', '{}_dics.pkl'.format(self.dataset)), 'rb') as f:
@@ -350,6 +371,9 @@ class CLEVR(ImageTextToClassProblem):
         # --> At this point, self.data contains the processed questions
         self.length = len(self.data)
 
+        # Collect the padding ratio of the questions.
+        self.padded_lengths_key = 'questions_length'
+
         # create the objects for the specified embeddings
         if self.embedding_type == 'random':
             self.logger.info('Constructing random embeddings using a uniform distribution')
@@ -374,11 +398,13 @@ class CLEVR(ImageTextToClassProblem):
             self.logger.info('Constructing embeddings using {}'.format(self.embedding_type))
             # instantiate Language class
             self.language = Language('lang')
-            self.questions = [q['string_question'] for q in self.data]
-            # use the questions set to construct the embeddings vectors
-            self.language.build_pretrained_vocab(self.questions, vectors=self.embedding_type)
+            questions = [self.data.question_string(i) for i in range(self.length)]
+            # use the questions set to construct the embeddings vectors (cached in generated_files/)
+            self.language.build_pretrained_vocab(questions, vectors=self.embedding_type,
+                                                 cache_folder=os.path.join(self.data_folder, 'generated_files'),
+                                                 cache_name='{}_{}'.format(self.set, self.dataset))
 
-        # Done! The actual question embedding is handled in __getitem__.
+        # Done! The actual question embedding is handled (once per batch) in prepare_batch().
 
     def parse_param_tree(self, params):
         """
@@ -401,7 +427,8 @@ class CLEVR(ImageTextToClassProblem):
                                    'images': {'raw_images': 'True'},
                                    'questions': {'embedding_type': 'random',
                                                  'embedding_dim': 300,
-                                                 'embedding_source': 'CLEVR'}
+                                                 'embedding_source': 'CLEVR'},
+                                   'sampling': {'min_family_weight': 0.1}
                                    })
         # get the data_folder
         self.data_folder = os.path.expanduser(params['settings']['data_folder'])
@@ -431,6 +458,9 @@ class CLEVR(ImageTextToClassProblem):
                                                             "'CLEVR_CoGenT_v1.0'.Please correct it." \
                                                             "Got: {}".format(self.data_folder)
 
+        # get the sampling parameters
+        self.min_family_weight = params['sampling']['min_family_weight']
+
         # get the images parameters:
         self.raw_image = params['images']['raw_images']
         if params['images']['raw_images']:
@@ -479,6 +509,19 @@ class CLEVR(ImageTextToClassProblem):
         else:
             self.embedding_dim = int(self.embedding_type[:-4])
 
+    def get_questions_prefix(self, set):
+        """
+        Returns the path prefix of the files of the question store (see \
+        :py:class:`miprometheus.utils.problems_utils.question_store.QuestionStore`) of a given set.
+
+        :param set: String to specify which dataset to use: ``train``, ``val``...
+        :type set: str
+
+        :return: Path prefix, e.g. `<data_folder>/generated_files/train_CLEVR_questions`.
+
+        """
+        return os.path.join(self.data_folder, 'generated_files', '{}_{}_questions'.format(set, self.dataset))
+
     def generate_questions_dics(self, set, word_dic=None, answer_dic=None, save_to_file=True):
         """
         Loads the questions from the .json file, tokenize them, creates vocab dics and save that to files.
@@ -499,7 +542,8 @@ class CLEVR(ImageTextToClassProblem):
 
         :return:
 
-            - A dict, containing for each question:
+            - A :py:class:`miprometheus.utils.problems_utils.question_store.QuestionStore`, containing for each \
+            question:
 
                 - The tokenized question,
                 - The answer,
@@ -541,8 +585,8 @@ class CLEVR(ImageTextToClassProblem):
         with open(os.path.join(self.data_folder, 'generated_files/index_to_family.json')) as f:
             index_to_family = json.load(f)
 
-        # start constructing vocab sets
-        result = []
+        # start constructing vocab sets - the questions attributes are collected in columns
+        tokens, answers, strings, images, families = [], [], [], [], []
         word_index = 1  # 0 reserved for padding
         answer_index = 0
 
@@ -575,21 +619,22 @@ class CLEVR(ImageTextToClassProblem):
             except Exception:
                 question_type = None
 
-            result.append({'tokenized_question': question_token, 'answer': answer,
-                           'string_question': question['question'], 'imgfile': question['image_filename'],
-                           'question_type': question_type})
+            tokens.append(question_token)
+            answers.append(answer)
+            strings.append(question['question'])
+            images.append(question['image_filename'])
+            families.append(question_type)
             t.update()
         t.close()
 
         self.logger.info('Done: constructed words dictionary of length {}, and answers dictionary of length {}'.format(len(word_dic),
                                                                                                             len(answer_dic)))
-        if save_to_file:
-            # save result to file
-            questions_filename = os.path.join(self.data_folder, 'generated_files', '{}_{}_questions.pkl'.format(self.set, self.dataset))
-            with open(questions_filename, 'wb') as f:
-                pickle.dump(result, f)
+        # create the question store - saved to files (and memory-mapped) if required
+        questions_prefix = self.get_questions_prefix(set) if save_to_file else None
+        result = QuestionStore.from_questions(tokens, answers, strings, images, families, prefix=questions_prefix)
 
-            self.logger.warning('Saved tokenized questions to file {}.'.format(questions_filename))
+        if save_to_file:
+            self.logger.warning('Saved tokenized questions to the question store {}.'.format(questions_prefix))
 
             # save dictionaries to file:
             with open(os.path.join(self.data_folder, 'generated_files', '{}_dics.pkl'.format(self.dataset)), 'wb') as f:
@@ -653,7 +698,8 @@ class CLEVR(ImageTextToClassProblem):
             - images: extracted feature maps from the raw image
             - questions: tensor of word indexes
             - questions_length: len(question)
-            - questions_string: original question string
+            - questions_string: None - the question strings are only loaded for the visualization \
+            (see :py:func:`plot_preprocessing`)
             - questions_type: category of the question (query, count...)
             - targets: index of the answer in the answers dictionary
             - targets_string: None for now
@@ -661,14 +707,16 @@ class CLEVR(ImageTextToClassProblem):
             - imgfiles: image filename
 
         """
-        # load tokenized_question, answer, string_question, image_filename from self.data
-        question, answer, question_string, imgfile, question_type = self.data[index].values()
+        # load answer, image_filename & question type from the question store
+        answer = self.data.answer(index)
+        imgfile = self.data.image(index)
+        question_type = self.data.family(index)
 
         # create the image index to retrieve the feature maps or the original image
-        index = str(imgfile.rsplit('_', 1)[1][:-4]).zfill(6)
+        image_index = str(imgfile.rsplit('_', 1)[1][:-4]).zfill(6)
         extension = '.png' if self.raw_image else '.pt'
         with open(os.path.join(self.image_source, '{}_{}_{}{}'.format('CLEVR-CoGenT' if self.dataset=='CLEVR-CoGenT' else 'CLEVR',
-                                                                      self.set, index, extension)), 'rb') as f:
+                                                                      self.set, image_index, extension)), 'rb') as f:
             try:
                 img = torch.load(f)  # for feature maps
                 img = torch.from_numpy(img).type(torch.FloatTensor).squeeze()
@@ -676,14 +724,12 @@ class CLEVR(ImageTextToClassProblem):
                 img = Image.open(f).convert('RGB')  # for the original images
                 img = transforms.ToTensor()(img).type(torch.FloatTensor).squeeze()
 
-        # embed question
+        # get the token indices of the question - the embedding is done once per batch in prepare_batch()
         if self.embedding_type == 'random':
-            # embed question:
-            question = self.embed_layer(torch.LongTensor(question)).type(torch.FloatTensor)
+            question = torch.from_numpy(self.data.question_tokens(index).astype(np.int64))
 
         else:
-            # embed question
-            question = self.language.embed_sentence(question_string)
+            question = self.language.indices_from_sentence(self.data.question_string(index))
 
         question_length = question.shape[0]
 
@@ -693,7 +739,6 @@ class CLEVR(ImageTextToClassProblem):
         data_dict['images'] = img
         data_dict['questions'] = question
         data_dict['questions_length'] = question_length
-        data_dict['questions_string'] = question_string
         data_dict['questions_type'] = question_type
         data_dict['targets'] = answer
         # leave data_dict['target_string'] as None
@@ -702,6 +747,29 @@ class CLEVR(ImageTextToClassProblem):
 
         return data_dict
 
+    def get_sample_lengths(self):
+        """
+        Returns the lengths of all questions (i.e. the number of tokens), used by the \
+        :py:class:`miprometheus.utils.BucketBatchSampler`.
+
+        :return: List of the questions lengths.
+
+        """
+        if self.embedding_type == 'random':
+            return self.data.question_lengths().tolist()
+        else:
+            return [len(self.data.question_string(i).split()) for i in range(self.length)]
+
+    def get_sample_labels(self):
+        """
+        Returns the encoded answers of all questions, used by the :py:class:`miprometheus.helpers.IndexSplitter` \
+        to create stratified splits.
+
+        :return: Array of the encoded answers.
+
+        """
+        return np.asarray(self.data.answers)
+
     def collate_fn(self, batch):
         """
         Combines a list of DataDict (retrieved with :py:func:`__getitem__`) into a batch.
@@ -714,6 +782,12 @@ class CLEVR(ImageTextToClassProblem):
 
             This length changes between batches, but this shouldn't be an issue.
 
+            The questions are returned as padded token indices [batch_size x maxQuestionLength], \
+            they are embedded by :py:func:`prepare_batch`.
+
+            The question strings are not collated (``questions_string`` is None), they are added by \
+            :py:func:`plot_preprocessing`.
+
 
         :param batch: list of individual samples to combine
         :type batch: list
@@ -722,14 +796,8 @@ class CLEVR(ImageTextToClassProblem):
         'targets_string', 'index','imgfiles'})
 
         """
-        batch_size = len(batch)
-
-        # Get max question length, create tensor of shape [batch_size x maxQuestionLength x embedding]
-        max_len = max(map(lambda x: x['questions_length'], batch))
-        questions = torch.zeros(batch_size, max_len, self.embedding_dim).type(torch.FloatTensor)
-
-        for i, length in enumerate([item['questions_length'] for item in batch]):
-            questions[i, :length, :] = batch[i]['questions']
+        # Pad the token indices: tensor of shape [batch_size x maxQuestionLength]
+        questions = self.pad_indices([item['questions'] for item in batch])
 
         # construct the DataDict and fill it with the batch
         data_dict = self.create_data_dict()
@@ -739,24 +807,46 @@ class CLEVR(ImageTextToClassProblem):
         data_dict['questions_length'] = [item['questions_length'] for item in batch]
         data_dict['targets'] = torch.tensor([item['targets'] for item in batch]).type(torch.LongTensor)
 
-        data_dict['questions_string'] = [item['questions_string'] for item in batch]
         data_dict['index'] = [item['index'] for item in batch]
         data_dict['imgfiles'] = [item['imgfiles'] for item in batch]
         data_dict['questions_type'] = [item['questions_type'] for item in batch]
 
         return data_dict
 
-    def finalize_epoch(self, epoch):
+    def prepare_batch(self, data_dict):
+        """
+        Embeds the questions of the batch with a single look-up: [batch_size x maxQuestionLength] token \
+        indices -> [batch_size x maxQuestionLength x embedding_dim] (zero for the padding elements).
+
+        :param data_dict: DataDict created by :py:func:`collate_fn`.
+
+        :return: New DataDict, containing the embedded questions.
+
         """
-        Empty for now.
+        if self.embedding_type == 'random':
+            weight = self.embed_layer.weight
+        else:
+            weight = self.language.vocab.vectors
 
-        Will call :py:func:`get_acc_per_family` to get the accuracy per family once it has been refactored.
+        data_dict = DataDict(data_dict)
+        data_dict['questions'] = self.embed_indices(data_dict['questions'], data_dict['questions_length'], weight)
+
+        return data_dict
+
+    def finalize_epoch(self, epoch):
+        """
+        Saves the numbers of correct predictions & questions per family accumulated during the epoch (see \
+        :py:func:`get_acc_per_family`) to file.
 
         :param epoch: current epoch index
         :type epoch: int
 
         """
-        # self.get_acc_per_family()
+        with open(os.path.join(self.data_folder, 'generated_files',
+                               '{}_{}_categories_acc.csv'.format(self.dataset, self.set)), 'w') as f:
+            writer = csv.writer(f)
+            for key, value in self.categories_stats.items():
+                writer.writerow([key, value])
 
     def initialize_epoch(self, epoch):
         """
@@ -766,19 +856,28 @@ class CLEVR(ImageTextToClassProblem):
         :type epoch: int
         """
 
-        self.categories_stats = dict(zip(self.categories.keys(), self.tuple_list))
+        self.categories_stats = {family: [0, 0] for family in self.categories.keys()}
 
-    def get_acc_per_family(self, data_dict, logits):
+    def collect_statistics(self, stat_col, data_dict, logits):
         """
-        Compute the accuracy per family for the current batch. Also accumulates
-        the number of correct predictions & questions per family in self.correct_pred_families (saved
-        to file).
+        Collects the accuracy and accumulates the accuracy per family (see :py:func:`get_acc_per_family`).
 
+        :param stat_col: ``StatisticsCollector``.
 
-        .. note::
+        :param data_dict: DataDict containing the targets and the question types.
+        :type data_dict: DataDict
+
+        :param logits: Predictions of the model.
 
-            To refactor.
+        """
+        super(CLEVR, self).collect_statistics(stat_col, data_dict, logits)
+        self.get_acc_per_family(data_dict, logits)
 
+    def get_acc_per_family(self, data_dict, logits):
+        """
+        Accumulates the number of correct predictions & questions per family of the current batch in \
+        ``self.categories_stats`` (saved to file in :py:func:`finalize_epoch` and used by \
+        :py:func:`get_sample_weights`).
 
         :param data_dict: DataDict({'images','questions', 'questions_length', 'questions_string', 'questions_type', \
         'targets', 'targets_string', 'index','imgfiles'})
@@ -794,30 +893,38 @@ class CLEVR(ImageTextToClassProblem):
 
         # get correct predictions
         pred = logits.max(1, keepdim=True)[1]
-        correct = pred.eq(targets.view_as(pred))
+        correct = pred.eq(targets.view_as(pred)).view(-1).tolist()
 
-        for i in range(correct.size(0)):
-            # update # of questions for the corresponding family
-            self.categories_stats[question_types[i]][1] += 1
+        for question_type, is_correct in zip(question_types, correct):
+            # skip the questions of unknown families (e.g. CLEVR-Humans)
+            if question_type not in self.categories_stats:
+                continue
 
-            # update the # of correct predictions for the corresponding family
-            if correct[i] == 1: self.categories_stats[question_types[i]][0] += 1
+            # update the # of correct predictions & questions for the corresponding family
+            self.categories_stats[question_type][0] += is_correct
+            self.categories_stats[question_type][1] += 1
 
-        categories_list = ['query_attribute', 'compare_integer', 'count', 'compare_attribute', 'exist']
-        tuple_list_categories = [[0, 0] for _ in range(len(categories_list))]
-        dic_categories = dict(zip(categories_list, tuple_list_categories))
+    def get_sample_weights(self):
+        """
+        Returns the sampling weights of all questions, used by the weighted sampler (see \
+        :py:class:`miprometheus.utils.AliasWeightedSampler`) to oversample the difficult question families.
 
-        for category in categories_list:
-            for family in self.categories.keys():
-                if self.categories[family] == category:
-                    dic_categories[category][0] += self.categories_stats[family][0]
-                    dic_categories[category][1] += self.categories_stats[family][1]
+        The weight of a question is the error rate of its family accumulated during the current epoch (see \
+        :py:func:`get_acc_per_family`) plus ``min_family_weight``. The questions of families without \
+        statistics (e.g. before the first epoch) get a weight of 1.
 
-        with open(os.path.join(self.data_folder, 'generated_files',
-                               '{}_{}_categories_acc.csv'.format(self.dataset, self.set)), 'w') as f:
-            writer = csv.writer(f)
-        for key, value in self.categories_stats.items():
-            writer.writerow([key, value])
+        :return: Array of the sampling weights.
+
+        """
+        # the last weight is used for the questions of unknown families (index -1)
+        family_weights = np.ones(len(self.data.family_names) + 1)
+
+        for i, family in enumerate(self.data.family_names):
+            correct, total = self.categories_stats.get(family, [0, 0])
+            if total > 0:
+                family_weights[i] = 1 - correct / total + self.min_family_weight
+
+        return family_weights[np.asarray(self.data.families)]
 
     def show_sample(self, data_dict, sample=0):
         """
@@ -835,12 +942,12 @@ class CLEVR(ImageTextToClassProblem):
         plt.figure(1)
 
         # unpack data_dict
-        questions_string = data_dict['questions_string']
         question_types = data_dict['questions_type']
         answers = data_dict['targets']
         imgfiles = data_dict['imgfiles']
 
-        question = questions_string[sample]
+        # get the question string from the question store
+        question = self.data.question_string(data_dict['index'][sample])
         answer = answers[sample]
         answer = list(self.answer_dic.keys())[list(self.answer_dic.values()).index(answer.data)]  # dirty hack to go back from the
         # value in a dict to the key.
@@ -872,11 +979,14 @@ class CLEVR(ImageTextToClassProblem):
 
         :return:
 
-            - data_dict with one added `predicted answer` key,
+            - data_dict with one added `predicted answer` key (and the question strings, loaded from the \
+            question store),
             - logits
 
 
         """
+        # add the question strings - not collated, as only needed for the visualization
+        data_dict['questions_string'] = [self.data.question_string(i) for i in data_dict['index']]
 
         # unpack data_dict
         answers = data_dict['targets']
@@ -1,13 +1,17 @@
 import os
+import json
 import tqdm
 import nltk
 import pandas as pd
+import numpy as np
 import torch
 import pickle
 from PIL import Image
 from torchvision import transforms
 
 from miprometheus.utils.problems_utils.language import Language
+from miprometheus.utils.problems_utils.question_store import QuestionStore
+from miprometheus.utils.data_dict import DataDict
 from miprometheus.utils.param_interface import ParamInterface
 from miprometheus.problems.image_text_to_class.image_text_to_class_problem import ImageTextToClassProblem
 
@@ -20,16 +24,26 @@ class VQAMED(ImageTextToClassProblem):
         self.embedding_source = 'VQAMED'
         self.parse_param_tree(params)
         self.data, self.word_dic, self.answer_dic = self.load_questions()
+        # Answer strings, indexed by the encoded answers.
+        self.answer_strings = sorted(self.answer_dic.keys(), key=lambda answer: self.answer_dic[answer])
 
         # --> At this point, self.data contains the processed questions
         self.length = len(self.data)
 
+        # Collect the padding ratio of the questions.
+        self.padded_lengths_key = 'questions_length'
+
         # check if the folder /generated_files in self.data_folder already exists, if not create it:
         if not os.path.isdir(os.path.join(self.data_folder, 'generated_files')):
             self.logger.warning('Folder {} not found, creating it.'.format(os.path.join(self.data_folder,
                                                                                         'generated_files')))
             os.mkdir(os.path.join(self.data_folder, 'generated_files'))
 
+        # Optionally load the resized images from the memory-mapped array (creating it if required).
+        self.resized_images = None
+        if self.preresize_images:
+            self.load_resized_images()
+
         # create the objects for the specified embeddings
         if self.embedding_type == 'random':
             self.logger.info('Constructing random embeddings using a uniform distribution')
@@ -54,9 +68,11 @@ class VQAMED(ImageTextToClassProblem):
             self.logger.info('Constructing embeddings using {}'.format(self.embedding_type))
             # instantiate Language class
             self.language = Language('lang')
-            self.questions = [q['string_question'] for q in self.data]
-            # use the questions set to construct the embeddings vectors
-            self.language.build_pretrained_vocab(self.questions, vectors=self.embedding_type)
+            questions = [self.data.question_string(i) for i in range(self.length)]
+            # use the questions set to construct the embeddings vectors (cached in generated_files/)
+            self.language.build_pretrained_vocab(questions, vectors=self.embedding_type,
+                                                 cache_folder=os.path.join(self.data_folder, 'generated_files'),
+                                                 cache_name='{}_{}'.format(self.split, self.embedding_source))
 
         # Define the default_values dict: holds parameters values that a model may need.
         self.default_values = {
@@ -87,9 +103,20 @@ class VQAMED(ImageTextToClassProblem):
         self.embedding_dim = params['question']['embedding_dim']
 
         # Load image size.
+        params['image'].add_default_params({'preresize': False, 'draft': True})
         self.height = params['image']['height']
         self.width = params['image']['width']
         self.num_channels = 3
+        # Store the resized images in a memory-mapped array (in generated_files/) instead of decoding the JPEGs.
+        self.preresize_images = params['image']['preresize']
+        # Use the reduced-size JPEG decoding when resizing the images on the fly.
+        self.draft_decoding = params['image']['draft']
+
+        # Transform used to resize the images & convert them to tensors - built once.
+        self.image_transform = transforms.Compose([
+            transforms.Resize([self.height, self.width]),
+            transforms.ToTensor()
+            ])
 
         # Retrieve path and expand it.
         self.data_folder = os.path.expanduser(params['settings']['data_folder'])
@@ -111,30 +138,21 @@ class VQAMED(ImageTextToClassProblem):
 
         :return: DataDict()
         """
-        # Get item.
-        item = self.data[index]
-
         # Load adequate image.
-        img_id = item["image_id"]
-        extension = '.jpg'
-        with open(os.path.join(self.image_source, img_id + extension),'rb') as f:
-            # Load image.
-            img = Image.open(f).convert('RGB')
-            # Resize it and transform to Torch Tensor.
-            transfroms_com = transforms.Compose([
-                    transforms.Resize([self.height,self.width]),
-                        transforms.ToTensor()
-                    ])
-            img = transfroms_com(img).type(torch.FloatTensor).squeeze()
-
-        # Process question.
-        question = item["tokenized_question"]
+        img_id = self.data.image(index)
+        if self.resized_images is not None:
+            # Get the resized image [height x width x channels] from the memory-mapped array.
+            img = torch.from_numpy(np.array(self.resized_images[self.image_rows[index]]))
+            img = img.permute(2, 0, 1).type(torch.FloatTensor).div(255)
+        else:
+            img = self.load_image(img_id, draft=self.draft_decoding)
+
+        # Process question: get the token indices - the embedding is done once per batch in prepare_batch().
+        question_string = self.data.question_string(index)
         if self.embedding_type == 'random':
-            # embed question:
-            question = self.embed_layer(torch.LongTensor(question)).type(torch.FloatTensor)
+            question = torch.from_numpy(self.data.question_tokens(index).astype(np.int64))
         else:
-            # embed question
-            question = self.language.embed_sentence(item["string_question"])
+            question = self.language.indices_from_sentence(question_string)
         # Get length.
         question_length = question.shape[0]
 
@@ -144,15 +162,104 @@ class VQAMED(ImageTextToClassProblem):
         data_dict['images'] = img
         data_dict['questions'] = question
         data_dict['questions_length'] = question_length
-        data_dict['questions_string'] = item["string_question"]
-        data_dict['targets'] = item["answer_encoded"]
-        data_dict['target_string'] = item["string_answer"]
+        data_dict['questions_string'] = question_string
+        data_dict['targets'] = self.data.answer(index)
+        data_dict['target_string'] = self.answer_strings[data_dict['targets']]
         data_dict['index'] = index
         data_dict['image_id'] = img_id
 
         return data_dict
 
 
+    def load_image(self, img_id, draft=False):
+        """
+        Loads an image, resizes it and transforms it into a tensor.
+
+        :param img_id: Image id (name of the `.jpg` file).
+        :type img_id: str
+
+        :param draft: Use the reduced-size JPEG decoding (to the smallest scale larger than the target size).
+        :type draft: bool
+
+        :return: FloatTensor [channels x height x width].
+
+        """
+        with open(os.path.join(self.image_source, img_id + '.jpg'), 'rb') as f:
+            # Load image.
+            img = Image.open(f)
+            if draft:
+                img.draft('RGB', (self.width, self.height))
+            img = img.convert('RGB')
+            # Resize it and transform to Torch Tensor.
+            return self.image_transform(img).type(torch.FloatTensor).squeeze()
+
+    def load_resized_images(self):
+        """
+        Memory-maps the array of the resized images (uint8, [num_images x height x width x channels]), \
+        creating it in `generated_files/` (from the fully decoded JPEGs) if it does not exist.
+
+        Sets ``self.resized_images`` and ``self.image_rows`` (row of the image of every question).
+
+        """
+        prefix = os.path.join(self.data_folder, 'generated_files', '{}_{}_images_{}x{}'.format(
+            self.split, self.embedding_source, self.height, self.width))
+        images_file, ids_file = prefix + '.npy', prefix + '_ids.json'
+
+        # Unique image ids.
+        image_ids = sorted(set(self.data.image(i) for i in range(self.length)))
+
+        if os.path.isfile(images_file) and os.path.isfile(ids_file):
+            with open(ids_file) as f:
+                stored_ids = json.load(f)
+        else:
+            stored_ids = None
+
+        if stored_ids is None or not set(image_ids).issubset(stored_ids):
+            self.logger.warning('Resizing the images and storing them in {}'.format(images_file))
+
+            # Write to a temporary file, so that an interrupted run does not leave an incomplete array.
+            tmp_file = prefix + '.tmp.npy'
+            images = np.lib.format.open_memmap(tmp_file, mode='w+', dtype=np.uint8,
+                                               shape=(len(image_ids), self.height, self.width, self.num_channels))
+            for row, img_id in enumerate(tqdm.tqdm(image_ids, unit=" images")):
+                images[row] = self.load_image(img_id).mul(255).round().byte().permute(1, 2, 0).numpy()
+            images.flush()
+            del images
+            os.replace(tmp_file, images_file)
+
+            with open(ids_file, 'w') as f:
+                json.dump(image_ids, f)
+            stored_ids = image_ids
+
+        self.logger.info('Loading the resized images from {}'.format(images_file))
+        self.resized_images = np.load(images_file, mmap_mode='r')
+
+        rows = {img_id: row for row, img_id in enumerate(stored_ids)}
+        self.image_rows = np.array([rows[self.data.image(i)] for i in range(self.length)], dtype=np.int32)
+
+    def get_sample_lengths(self):
+        """
+        Returns the lengths of all questions (i.e. the number of tokens), used by the \
+        :py:class:`miprometheus.utils.BucketBatchSampler`.
+
+        :return: List of the questions lengths.
+
+        """
+        if self.embedding_type == 'random':
+            return self.data.question_lengths().tolist()
+        else:
+            return [len(self.data.question_string(i).split()) for i in range(self.length)]
+
+    def get_sample_labels(self):
+        """
+        Returns the encoded answers of all questions, used by the :py:class:`miprometheus.helpers.IndexSplitter` \
+        to create stratified splits.
+
+        :return: Array of the encoded answers.
+
+        """
+        return np.asarray(self.data.answers)
+
     def collate_fn(self, batch):
         """
         Combines a list of DataDict (retrieved with :py:func:`__getitem__`) into a batch.
@@ -168,14 +275,8 @@ class VQAMED(ImageTextToClassProblem):
         'targets_string', 'index','imgfiles'})
 
         """
-        # Get batch size.
-        batch_size = len(batch)
-
-        # Create tensor of shape [batch_size x max question_length x embedding].
-        max_len = max(map(lambda x: x['questions_length'], batch))
-        questions = torch.zeros(batch_size, max_len, self.embedding_dim).type(torch.FloatTensor)
-        for i, length in enumerate([item['questions_length'] for item in batch]): 
-            questions[i, :length, :] = batch[i]['questions']
+        # Pad the token indices: tensor of shape [batch_size x max question_length].
+        questions = self.pad_indices([item['questions'] for item in batch])
 
         # construct the DataDict and fill it with the batch
         data_dict = self.create_data_dict()
@@ -195,6 +296,26 @@ class VQAMED(ImageTextToClassProblem):
         data_dict['image_id'] = [item['image_id'] for item in batch]
 
         return data_dict
+
+    def prepare_batch(self, data_dict):
+        """
+        Embeds the questions of the batch with a single look-up: [batch_size x max question_length] token \
+        indices -> [batch_size x max question_length x embedding_dim] (zero for the padding elements).
+
+        :param data_dict: DataDict created by :py:func:`collate_fn`.
+
+        :return: New DataDict, containing the embedded questions.
+
+        """
+        if self.embedding_type == 'random':
+            weight = self.embed_layer.weight
+        else:
+            weight = self.language.vocab.vectors
+
+        data_dict = DataDict(data_dict)
+        data_dict['questions'] = self.embed_indices(data_dict['questions'], data_dict['questions_length'], weight)
+
+        return data_dict
         
 
     def load_questions(self):
@@ -204,63 +325,36 @@ class VQAMED(ImageTextToClassProblem):
             question_file = os.path.join(self.data_folder, 'All_QA_Pairs_val.txt')
 
         self.logger.info('Loading questions from {} ...'.format(question_file))
-        print(question_file)
         df = pd.read_csv(filepath_or_buffer=question_file, sep='|',header=None,
                          names=['ImageID','Question','Answer'])
 
-        result = []
-        # Question related variables.
-        question_dict = {}
-        question_index = 1  # 0 reserved for padding
-        # Answer related variables.
-        answer_dict = {}
-        answer_index = 0 # No padding here.
-
-        t = tqdm.tqdm(total=len(df.index))
-
-        for index, row in df.iterrows():
-            image_id = row['ImageID']
-            question = row['Question']
-            question_words = nltk.word_tokenize(question)
-            question_token = []
-
-            for qword in question_words:
-                try:
-                    question_token.append(question_dict[qword])
-                except KeyError:
-                    question_token.append(question_index)
-                    question_dict[qword] = question_index
-                    question_index += 1
-
-            # Process answer.
-            # We assume this is a classification problem, so need to create a seperate class for each answer.
-            # Number of classes = number of possible answers.
-            answer = row['Answer']
-
-            try:
-                answer_encoded = answer_dict[answer]
-            except KeyError:
-                # New word.
-                answer_dict[answer] = answer_index
-                answer_encoded = answer_index
-                answer_index += 1
-                
-            # Add record to result.
-            result.append({
-                'tokenized_question': question_token,
-                'string_question': question,
-                'answer_encoded': answer_encoded,
-                'string_answer': answer,
-                'image_id': image_id})
-
-            t.update()
-        t.close()
+        # Tokenize the questions.
+        question_words = df['Question'].map(nltk.word_tokenize)
+        lengths = question_words.map(len).values
+        words = pd.Series([qword for qwords in question_words for qword in qwords], dtype=object)
+
+        # Words indexed in the order of their first appearance (0 reserved for padding).
+        codes, vocabulary = pd.factorize(words)
+        question_dict = {qword: index + 1 for index, qword in enumerate(vocabulary)}
+        tokens = np.split(codes + 1, np.cumsum(lengths)[:-1])
+
+        # Process answers.
+        # We assume this is a classification problem, so need to create a seperate class for each answer.
+        # Number of classes = number of possible answers. No padding here.
+        answers, answer_vocabulary = pd.factorize(df['Answer'])
+        answer_dict = {answer: index for index, answer in enumerate(answer_vocabulary)}
+
+        strings = df['Question'].tolist()
+        images = df['ImageID'].astype(str).tolist()
 
         # Set number of answer classes.
         self.nb_classes = len(answer_dict)
         self.logger.info('Constructed question word dictionary of length {}'.format(len(question_dict)))
         self.logger.info('Constructed answer word dictionary of length {}'.format(len(answer_dict)))
 
+        # Create the (in-memory) question store.
+        result = QuestionStore.from_questions(tokens, answers, strings, images)
+
         return result, question_dict, answer_dict
 
 
@@ -27,6 +27,7 @@ from torchvision import datasets, transforms
 
 
 from miprometheus.utils.data_dict import DataDict
+from miprometheus.utils.problems_utils.resident_images import load_resident_images, images_to_float
 from miprometheus.problems.image_to_class.image_to_class_problem import ImageToClassProblem
 
 
@@ -57,6 +58,11 @@ class CIFAR10(ImageToClassProblem):
                 - ``self.use_train_data`` (`bool`, `optional`) : If ``True``, creates dataset from training set, \
                     otherwise creates from test set,
                 - ``self.resize`` : (optional) resize the images to `[h, w]` if set,
+                - ``self.resident`` (`bool`) : If True, keeps the whole split in memory as a single tensor and \
+                    creates the batches by indexing it (see :py:func:`collate_fn`). The images are then resized \
+                    with the bilinear interpolation of the whole batch (see \
+                    :py:func:`miprometheus.utils.images_to_float`) instead of ``transforms.Resize`` \
+                    (DEFAULT: False),
                 - ``self.defaut_values`` :
 
                     >>> self.default_values = {'num_classes': 10,
@@ -73,14 +79,16 @@ class CIFAR10(ImageToClassProblem):
 
         .. warning::
 
-            Resizing images might cause a significant slow down in batch generation.
+            Resizing images might cause a significant slow down in batch generation (unless ``resident`` is set, \
+            in which case whole batches are resized at once).
 
         .. note::
 
             The following is set by default:
 
             >>> params = {'data_folder': '~/data/cifar10',
-            >>>           'use_train_data': True}
+            >>>           'use_train_data': True,
+            >>>           'resident': False}
 
 
         :param params: Dictionary of parameters (read from configuration ``.yaml`` file).
@@ -93,13 +101,15 @@ class CIFAR10(ImageToClassProblem):
         
         # Set default parameters.
         params.add_default_params({'data_folder': '~/data/cifar10',
-                                   'use_train_data': True})
+                                   'use_train_data': True,
+                                   'resident': False})
 
         # Get absolute path.
         data_folder = os.path.expanduser(params['data_folder'])
 
         # Retrieve parameters from the dictionary.
         self.use_train_data = params['use_train_data']
+        self.resident = params['resident']
 
         # Add transformations depending on the resizing option.
         if ('resize' in self.params):
@@ -116,8 +126,9 @@ class CIFAR10(ImageToClassProblem):
             # Up-scale and transform to tensors.
             transform = transforms.Compose([transforms.Resize((self.height, self.width)), transforms.ToTensor()])
 
-            self.logger.warning('Upscaling the images to [{}, {}]. Slows down batch generation.'.format(
-                self.width, self.height))
+            if not self.resident:
+                self.logger.warning('Upscaling the images to [{}, {}]. Slows down batch generation.'.format(
+                    self.width, self.height))
 
         else:
             # Default MNIST settings.
@@ -146,6 +157,11 @@ class CIFAR10(ImageToClassProblem):
         # -> inherits from torch.utils.data.Dataset
 
         self.length = len(self.dataset)
+
+        if self.resident:
+            # Keep the (uint8) images [N x 3 x 32 x 32] and targets [N] - converted & resized per batch.
+            self.images, self.targets = load_resident_images(self.dataset)
+
         # Class names.
         self.labels = 'Airplane Automobile Bird Cat Deer Dog Frog Horse Shipe Truck'.split(' ')
 
@@ -162,8 +178,11 @@ class CIFAR10(ImageToClassProblem):
             - targets: Index of the target class
             - targets_label: Label of the target class (cf ``self.labels``)
 
+            In the resident mode, returns ``index`` only: the batch is created by :py:func:`collate_fn`.
 
         """
+        if self.resident:
+            return index
 
         img, target = self.dataset.__getitem__(index)
         target = torch.tensor(target)
@@ -189,15 +208,50 @@ class CIFAR10(ImageToClassProblem):
             Multi-processing is supported as the data sources are small enough to be kept in memory\
             (`self.root-dir/cifar-10-batches/data_batch_i` have a size of 31.0 MB).
 
+            In the resident mode, ``batch`` is a list of indices and the batch is created by \
+            :py:func:`get_batch`.
+
         :param batch: list of individual ``DataDict`` samples to combine.
 
         :return: ``DataDict({'images','targets', 'targets_label'})`` containing the batch.
 
         """
+        if self.resident:
+            return self.get_batch(batch)
 
         return DataDict({key: value for key, value in zip(self.data_definitions.keys(),
                                                           super(CIFAR10, self).collate_fn(batch).values())})
 
+    def get_batch(self, indices):
+        """
+        Creates a batch by indexing the resident images & targets (resident mode only).
+
+        :param indices: Indices of the samples.
+        :type indices: list
+
+        :return: ``DataDict({'images','targets', 'targets_label'})`` containing the batch.
+
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        targets = self.targets[indices]
+
+        data_dict = DataDict({key: None for key in self.data_definitions.keys()})
+        data_dict['images'] = images_to_float(self.images[indices], self.height, self.width)
+        data_dict['targets'] = targets
+        data_dict['targets_label'] = [self.labels[target] for target in targets.tolist()]
+        return data_dict
+
+    def get_sample_labels(self):
+        """
+        Returns the target classes of all samples, used by the :py:class:`miprometheus.helpers.IndexSplitter` \
+        to create stratified splits.
+
+        :return: Array of the target classes.
+
+        """
+        targets = self.targets if self.resident else load_resident_images(self.dataset)[1]
+        return targets.numpy()
+
 
 if __name__ == "__main__":
     """ Tests sequence generator - generates and displays a random sample"""
@@ -25,6 +25,7 @@ import torch
 from torchvision import datasets, transforms
 
 from miprometheus.utils.data_dict import DataDict
+from miprometheus.utils.problems_utils.resident_images import load_resident_images, images_to_float
 from miprometheus.problems.image_to_class.image_to_class_problem import ImageToClassProblem
 
 
@@ -55,6 +56,11 @@ class MNIST(ImageToClassProblem):
                 - ``self.use_train_data`` (`bool`, `optional`) : If True, creates dataset from ``training.pt``,\
                     otherwise from ``test.pt``
                 - ``self.resize`` : (optional) resize the images to `[h, w]` if set,
+                - ``self.resident`` (`bool`) : If True, keeps the whole split in memory as a single tensor and \
+                    creates the batches by indexing it (see :py:func:`collate_fn`). The images are then resized \
+                    with the bilinear interpolation of the whole batch (see \
+                    :py:func:`miprometheus.utils.images_to_float`) instead of ``transforms.Resize`` \
+                    (DEFAULT: False),
                 - ``self.defaut_values`` :
 
                     >>> self.default_values = {'num_classes': 10,
@@ -71,14 +77,16 @@ class MNIST(ImageToClassProblem):
 
         .. warning::
 
-            Resizing images might cause a significant slow down in batch generation.
+            Resizing images might cause a significant slow down in batch generation (unless ``resident`` is set, \
+            in which case whole batches are resized at once).
 
         .. note::
 
             The following is set by default:
 
             >>> self.params.add_default_params({'data_folder': '~/data/mnist',
-            >>>           'use_train_data': True})
+            >>>           'use_train_data': True,
+            >>>           'resident': False})
 
         :param params_: Dictionary of parameters (read from configuration ``.yaml`` file).
 
@@ -89,7 +97,8 @@ class MNIST(ImageToClassProblem):
 
         # Set default parameters.
         self.params.add_default_params({'data_folder': '~/data/mnist',
-                                        'use_train_data': True
+                                        'use_train_data': True,
+                                        'resident': False
                                         })
 
         # Get absolute path.
@@ -97,6 +106,7 @@ class MNIST(ImageToClassProblem):
 
         # Retrieve parameters from the dictionary.
         self.use_train_data = self.params['use_train_data']
+        self.resident = self.params['resident']
 
         # Add transformations depending on the resizing option.
         if 'resize' in self.params:
@@ -113,8 +123,9 @@ class MNIST(ImageToClassProblem):
             # Up-scale and transform to tensors.
             transform = transforms.Compose([transforms.Resize((self.height, self.width)), transforms.ToTensor()])
 
-            self.logger.warning('Upscaling the images to [{}, {}]. Slows down batch generation.'.format(
-                self.width, self.height))
+            if not self.resident:
+                self.logger.warning('Upscaling the images to [{}, {}]. Slows down batch generation.'.format(
+                    self.width, self.height))
 
         else:
             # Default MNIST settings.
@@ -142,6 +153,10 @@ class MNIST(ImageToClassProblem):
         # Set length.
         self.length = len(self.dataset)
 
+        if self.resident:
+            # Keep the (uint8) images [N x 1 x 28 x 28] and targets [N] - converted & resized per batch.
+            self.images, self.targets = load_resident_images(self.dataset)
+
         # Class names.
         self.labels = 'Zero One Two Three Four Five Six Seven Eight Nine'.split(' ')
 
@@ -157,7 +172,13 @@ class MNIST(ImageToClassProblem):
             - images: Image, resized if ``self.resize`` is set,
             - targets: Index of the target class
             - targets_label: Label of the target class (cf ``self.labels``)
+
+            In the resident mode, returns ``index`` only: the batch is created by :py:func:`collate_fn`.
+
         """
+        if self.resident:
+            return index
+
         # Get image and target.
         img, target = self.dataset.__getitem__(index)
   
@@ -182,15 +203,50 @@ class MNIST(ImageToClassProblem):
             Multi-processing is supported as the data sources are small enough to be kept in memory\
             (`training.pt` has a size of 47.5 MB).
 
+            In the resident mode, ``batch`` is a list of indices and the batch is created by \
+            :py:func:`get_batch`.
+
         :param batch: list of individual ``DataDict`` samples to combine.
 
         :return: ``DataDict({'images','targets', 'targets_label'})`` containing the batch.
 
         """
+        if self.resident:
+            return self.get_batch(batch)
 
         return DataDict({key: value for key, value in zip(self.data_definitions.keys(),
                                                           super(MNIST, self).collate_fn(batch).values())})
 
+    def get_batch(self, indices):
+        """
+        Creates a batch by indexing the resident images & targets (resident mode only).
+
+        :param indices: Indices of the samples.
+        :type indices: list
+
+        :return: ``DataDict({'images','targets', 'targets_label'})`` containing the batch.
+
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        targets = self.targets[indices]
+
+        data_dict = self.create_data_dict()
+        data_dict['images'] = images_to_float(self.images[indices], self.height, self.width)
+        data_dict['targets'] = targets
+        data_dict['targets_label'] = [self.labels[target] for target in targets.tolist()]
+        return data_dict
+
+    def get_sample_labels(self):
+        """
+        Returns the target classes of all samples, used by the :py:class:`miprometheus.helpers.IndexSplitter` \
+        to create stratified splits.
+
+        :return: Array of the target classes.
+
+        """
+        targets = self.targets if self.resident else load_resident_images(self.dataset)[1]
+        return targets.numpy()
+
 
 if __name__ == "__main__":
     """ Tests sequence generator - generates and displays a random sample"""
@@ -210,8 +266,8 @@ if __name__ == "__main__":
     # Create problem.
     mnist = MNIST(params)
 
-    # get a sample
-    sample = mnist[10]
+    # get a sample (a batch of one in the resident mode)
+    sample = mnist[10] if not mnist.resident else mnist.collate_fn([mnist[10]])
     print(type(sample))
     print('__getitem__ works.')
 
@@ -141,6 +141,10 @@ class Problem(Dataset):
         # Get access to AppState: for dtype, visualization flag etc.
         self.app_state = AppState()
 
+        # Key of the DataDict entry containing the lengths of the padded sequences (e.g. 'questions_length').
+        # If set, the padding ratio of the batches is collected as a statistic.
+        self.padded_lengths_key = None
+
     def create_data_dict(self):
         """
         Returns a :py:class:`miprometheus.utils.DataDict` object with keys created on the \
@@ -194,6 +198,131 @@ class Problem(Dataset):
         """
         return torch.utils.data.dataloader.default_collate(batch)
 
+    def prepare_batch(self, data_dict):
+        """
+        Processes a batch (created by :py:func:`collate_fn`) in the main process, right before it is passed \
+        to the model.
+
+        Used e.g. to embed the questions: the samples contain token indices (that are cheap to transfer from the \
+        :py:class:`torch.utils.data.DataLoader` workers), which are then embedded once per batch, with a single \
+        look-up (see :py:func:`embed_indices`).
+
+        .. note::
+
+            The base :py:func:`prepare_batch` returns the batch unchanged. To be redefined in inheriting classes.
+
+
+        :param data_dict: :py:class:`miprometheus.utils.DataDict` containing the batch.
+
+        :return: :py:class:`miprometheus.utils.DataDict` containing the processed batch.
+
+        """
+        return data_dict
+
+    def get_sample_lengths(self):
+        """
+        Returns the lengths of all (variable-length) samples of the problem, used by the \
+        :py:class:`miprometheus.utils.BucketBatchSampler` to group samples of similar lengths into the same batches.
+
+        .. note::
+
+            The base :py:func:`get_sample_lengths` returns None, i.e. the problem does not support bucketing. \
+            To be redefined in inheriting classes.
+
+        :return: List of lengths (one per sample) or None.
+
+        """
+        return None
+
+    def get_sample_labels(self):
+        """
+        Returns the labels (e.g. target classes) of all samples of the problem, used by the \
+        :py:class:`miprometheus.helpers.IndexSplitter` to create stratified splits.
+
+        .. note::
+
+            The base :py:func:`get_sample_labels` returns None, i.e. the problem does not support stratified \
+            splitting. To be redefined in inheriting classes.
+
+        :return: Array of labels (one per sample) or None.
+
+        """
+        return None
+
+    def get_sample_weights(self):
+        """
+        Returns the sampling weights of all samples of the problem, used by the weighted sampler (see \
+        :py:class:`miprometheus.utils.AliasWeightedSampler`) for importance sampling.
+
+        Called when the sampler is built and, if the sampler's 'update_weights' is set, at the end of every \
+        training epoch (after :py:func:`finalize_epoch`), so the weights can be computed from the statistics \
+        collected during the epoch.
+
+        .. note::
+
+            The base :py:func:`get_sample_weights` returns None, i.e. the problem does not provide weights. \
+            To be redefined in inheriting classes.
+
+        :return: Array of non-negative weights (one per sample) or None.
+
+        """
+        return None
+
+    @staticmethod
+    def compute_padding_ratio(lengths):
+        """
+        Computes the ratio of padding elements to all elements of a batch of padded sequences.
+
+        :param lengths: Lengths of the (unpadded) sequences.
+        :type lengths: list
+
+        :return: Padding ratio (float in [0, 1]).
+
+        """
+        return 1.0 - sum(lengths) / (len(lengths) * max(max(lengths), 1))
+
+    @staticmethod
+    def pad_indices(sequences):
+        """
+        Pads a list of variable-length token indices sequences with 0.
+
+        :param sequences: List of ``torch.LongTensor`` of shape [length].
+        :type sequences: list
+
+        :return: ``torch.LongTensor`` of shape [batch_size x max_length].
+
+        """
+        return torch.nn.utils.rnn.pad_sequence(sequences, batch_first=True)
+
+    @staticmethod
+    def embed_indices(indices, lengths, weight):
+        """
+        Embeds a batch of padded token indices with a single look-up into the embedding table.
+
+        The look-up is done on CPU (where the table is stored) and the result is moved to the device \
+        of the indices. The embeddings of the padding elements are set to 0.
+
+        :param indices: Token indices, shape [batch_size x max_length].
+        :type indices: torch.LongTensor
+
+        :param lengths: Lengths of the (unpadded) sequences.
+        :type lengths: list
+
+        :param weight: Embedding table, shape [vocabulary_size x embedding_dim].
+        :type weight: torch.Tensor
+
+        :return: ``torch.FloatTensor`` of shape [batch_size x max_length x embedding_dim].
+
+        """
+        with torch.no_grad():
+            embedded = torch.nn.functional.embedding(indices.cpu(), weight).type(torch.FloatTensor)
+
+            # Zero the padding elements.
+            mask = torch.arange(indices.size(1)).unsqueeze(0) < torch.tensor(lengths).unsqueeze(1)
+            embedded = embedded * mask.unsqueeze(2).type(torch.FloatTensor)
+
+        return embedded.to(indices.device)
+
     def __getitem__(self, index):
         """
         Getter that returns an individual sample from the problem's associated dataset (that can be generated \
@@ -301,13 +430,14 @@ class Problem(Dataset):
         .. note::
 
 
-            Empty - To be redefined in inheriting classes.
+            Adds only the padding ratio (if ``self.padded_lengths_key`` is set) - To be redefined in inheriting classes.
 
 
         :param stat_col: :py:class:`miprometheus.utils.StatisticsCollector`.
 
         """
-        pass
+        if self.padded_lengths_key is not None:
+            stat_col.add_statistic('padding_ratio', '{:4.5f}')
         
     def collect_statistics(self, stat_col, data_dict, logits):
         """
@@ -316,7 +446,8 @@ class Problem(Dataset):
          .. note::
 
 
-            Empty - To be redefined in inheriting classes. The user has to ensure that the corresponding entry \
+            Collects only the padding ratio (if ``self.padded_lengths_key`` is set) - To be redefined in \
+            inheriting classes. The user has to ensure that the corresponding entry \
             in the :py:class:`miprometheus.utils.StatisticsCollector` has been created with \
             :py:func:`add_statistics` beforehand.
 
@@ -328,7 +459,8 @@ class Problem(Dataset):
         :param logits: Predictions being output of the model (:py:class:`torch.Tensor`).
 
         """
-        pass
+        if self.padded_lengths_key is not None:
+            stat_col['padding_ratio'] = self.compute_padding_ratio(data_dict[self.padded_lengths_key])
 
     def add_aggregators(self, stat_agg):
         """
@@ -336,13 +468,14 @@ class Problem(Dataset):
 
         .. note::
 
-            Empty - To be redefined in inheriting classes.
+            Adds only the padding ratio (if ``self.padded_lengths_key`` is set) - To be redefined in inheriting classes.
 
 
         :param stat_agg: :py:class:`miprometheus.utils.StatisticsAggregator`.
 
         """
-        pass
+        if self.padded_lengths_key is not None:
+            stat_agg.add_aggregator('padding_ratio', '{:4.5f}')  # represents the average padding ratio
 
     def aggregate_statistics(self, stat_col, stat_agg):
         """
@@ -351,7 +484,8 @@ class Problem(Dataset):
 
          .. note::
 
-            Empty - To be redefined in inheriting classes.
+            Aggregates only the padding ratio (if ``self.padded_lengths_key`` is set) - To be redefined in \
+            inheriting classes.
             The user can override this function in subclasses but should call \
             :py:func:`aggregate_statistics` to collect basic statistical aggregators (if set).
 
@@ -361,7 +495,8 @@ class Problem(Dataset):
         :param stat_agg: :py:class:`miprometheus.utils.StatisticsAggregator`.
 
         """
-        pass
+        if self.padded_lengths_key is not None:
+            stat_agg['padding_ratio'] = sum(stat_col['padding_ratio']) / len(stat_col['padding_ratio'])
 
     def initialize_epoch(self, epoch):
         """
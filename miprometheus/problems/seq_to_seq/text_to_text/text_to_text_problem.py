@@ -51,6 +51,7 @@ import re
 import torch
 import torch.nn as nn
 from miprometheus.problems.seq_to_seq.seq_to_seq_problem import SeqToSeqProblem
+from miprometheus.utils.problems_utils.bleu_score import sentence_bleu_scores
 
 # global tokens
 PAD_token = 0
@@ -75,9 +76,29 @@ class TextToTextProblem(SeqToSeqProblem):
 
         :param params: Dictionary of parameters (read from configuration ``.yaml`` file).
 
+        .. note::
+
+            The computation of the BLEU score can be limited with the optional `bleu` section:
+
+                - ``num_samples``: number of (randomly selected) samples of the batch used to compute the score \
+                (DEFAULT: -1, i.e. all samples),
+                - ``on_aggregation``: if set, the predictions of the training batches are only stored when \
+                collecting the statistics, and the score is computed over all batches collected since the \
+                collector was last emptied when aggregating them (DEFAULT: False). The score of such batches \
+                is collected as -1, while the scores of the batches processed without gradients \
+                (e.g. the partial validation) are still computed immediately.
+
         """
         super(TextToTextProblem, self).__init__(params)
 
+        # Parameters of the BLEU score computation.
+        params.add_default_params({'bleu': {'num_samples': -1, 'on_aggregation': False}})
+        self.bleu_num_samples = params['bleu']['num_samples']
+        self.bleu_on_aggregation = params['bleu']['on_aggregation']
+        # Scores (or predictions) stored until the aggregation, for every collector:
+        # list of sentence scores or (hypotheses, references, references lengths) tuples.
+        self.bleu_buffers = {}
+
         # set default loss function - negative log likelihood and ignore
         # padding elements.
         self.loss_function = nn.NLLLoss(size_average=True, ignore_index=0)
@@ -101,6 +122,40 @@ class TextToTextProblem(SeqToSeqProblem):
         self.input_lang = None
         self.output_lang = None
 
+    def get_BLEU_inputs(self, data_dict, logits):
+        """
+        Prepares the tensors of word indices used to compute the BLEU score: the most probable words of the \
+        predictions (hypotheses) and the target sentences (references).
+
+        Only ``self.bleu_num_samples`` randomly selected samples are kept (if set).
+
+        :param data_dict: DataDict({'inputs', 'inputs_length', 'inputs_text', 'targets', 'targets_length', 'outputs_text'}).
+
+        :param logits: Predictions of the model.
+
+        :return: Tuple (hypotheses [batch_size x max_length], references [batch_size x max_length], \
+        references lengths [batch_size]), on CPU.
+
+        """
+        batch_size = logits.size(0)
+        samples = list(range(batch_size))
+        if 0 < self.bleu_num_samples < batch_size:
+            samples = torch.randperm(batch_size)[:self.bleu_num_samples].tolist()
+
+        # get most probable words indexes for the selected samples
+        hypotheses = logits.detach()[samples].argmax(dim=-1).cpu()
+
+        # convert the target sentences to indexes (-1 for unknown words, which cannot be predicted)
+        word2index = self.output_lang.word2index
+        sentences = [data_dict['targets_text'][i].split() for i in samples]
+        lengths = [len(sentence) for sentence in sentences]
+        references = torch.full((len(samples), max(lengths + [1])), -1, dtype=torch.long)
+        for i, sentence in enumerate(sentences):
+            if lengths[i] > 0:
+                references[i, :lengths[i]] = torch.LongTensor([word2index.get(word, -1) for word in sentence])
+
+        return hypotheses, references, torch.LongTensor(lengths)
+
     def compute_BLEU_score(self, data_dict, logits):
         """
         Compute the BLEU score in order to evaluate the translation quality
@@ -116,6 +171,10 @@ class TextToTextProblem(SeqToSeqProblem):
             To handle all samples within a batch, we accumulate the individual BLEU score for each pair\
              of sentences and average over the batch size.
 
+            The scores are computed on the tensors of word indices (see \
+            :py:func:`miprometheus.utils.problems_utils.bleu_score.sentence_bleu_scores`), equivalent to NLTK's \
+            ``sentence_bleu()`` with the smoothing `method1`.
+
 
         :param data_dict: DataDict({'inputs', 'inputs_length', 'inputs_text', 'targets', 'targets_length', 'outputs_text'}).
 
@@ -124,33 +183,13 @@ class TextToTextProblem(SeqToSeqProblem):
         :return: Average BLEU Score for the batch ( 0 < BLEU < 1).
 
         """
-        # get most probable words indexes for the batch
-        _, top_indexes = logits.topk(k=1, dim=-1)
-        logits = top_indexes.squeeze()
-        batch_size = logits.shape[0]
-
-        from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
+        hypotheses, references, references_lengths = self.get_BLEU_inputs(data_dict, logits)
 
-        # retrieve target sentences from TextAuxTuple
-        targets_text = []
-        for sentence in data_dict['targets_text']:
-            targets_text.append(sentence.split())
+        # the whole predicted sequences are the hypotheses
+        hypotheses_lengths = torch.full((hypotheses.size(0),), hypotheses.size(1), dtype=torch.long)
+        scores = sentence_bleu_scores(hypotheses, hypotheses_lengths, references, references_lengths)
 
-        # retrieve text sentences from the logits (which should be tensors of
-        # indexes)
-        logits_text = []
-        for logit in logits:
-            logits_text.append(
-                [self.output_lang.index2word[index.item()] for index in logit])
-
-        bleu_score = 0
-        for i in range(batch_size):
-            # compute bleu score and use a smoothing function
-            bleu_score += sentence_bleu([targets_text[i]],
-                                        logits_text[i],
-                                        smoothing_function=SmoothingFunction().method1)
-
-        return round(bleu_score / batch_size, 4)
+        return round(scores.mean().item(), 4)
 
     def evaluate_loss(self, data_dict, logits):
         """
@@ -183,12 +222,18 @@ class TextToTextProblem(SeqToSeqProblem):
         :type stat_col: ``StatisticsCollector``
 
         """
+        # Add basic statistics.
+        super(TextToTextProblem, self).add_statistics(stat_col)
         stat_col.add_statistic('bleu_score', '{:4.5f}')
 
     def collect_statistics(self, stat_col, data_dict, logits):
         """
         Collects BLEU score.
 
+        If ``on_aggregation`` is set, the predictions of the training batches are only stored (the score is \
+        computed by :py:func:`aggregate_statistics`), while the scores of the other batches are also stored, \
+        so they are aggregated over the whole pass (e.g. validation).
+
         :param stat_col: ``StatisticsCollector``
 
         :param data_dict: DataDict({'inputs', 'inputs_length', 'inputs_text', 'targets', 'targets_length', 'outputs_text'}).
@@ -196,8 +241,68 @@ class TextToTextProblem(SeqToSeqProblem):
         :param logits: Predictions of the model.
 
         """
+        # Collect basic statistics.
+        super(TextToTextProblem, self).collect_statistics(stat_col, data_dict, logits)
+        if not self.bleu_on_aggregation:
+            stat_col['bleu_score'] = self.compute_BLEU_score(data_dict, logits)
+            return
+
+        # The first batch collected since the collector was emptied starts a new pass.
+        if len(stat_col['episode']) <= 1 or id(stat_col) not in self.bleu_buffers:
+            self.bleu_buffers[id(stat_col)] = []
+        buffer = self.bleu_buffers[id(stat_col)]
+
+        if torch.is_grad_enabled():
+            # Only store the predictions - the score will be computed in aggregate_statistics()
+            # (-1 marks the score of the batch as not computed).
+            buffer.append(self.get_BLEU_inputs(data_dict, logits))
+            stat_col['bleu_score'] = -1
+        else:
+            # Evaluation batch - might not be aggregated at all (e.g. partial validation).
+            hypotheses, references, references_lengths = self.get_BLEU_inputs(data_dict, logits)
+            hypotheses_lengths = torch.full((hypotheses.size(0),), hypotheses.size(1), dtype=torch.long)
+            scores = sentence_bleu_scores(hypotheses, hypotheses_lengths, references, references_lengths)
+            buffer.append(scores)
+            stat_col['bleu_score'] = round(scores.mean().item(), 4)
+
+    def add_aggregators(self, stat_agg):
+        """
+        Adds the average BLEU score to ``StatisticsAggregator``.
+
+        :param stat_agg: ``StatisticsAggregator``.
+
+        """
+        # Add basic aggregators.
+        super(TextToTextProblem, self).add_aggregators(stat_agg)
+        stat_agg.add_aggregator('bleu_score', '{:4.5f}')
+
+    def aggregate_statistics(self, stat_col, stat_agg):
+        """
+        Aggregates the BLEU score: averages the scores collected for every batch or, if ``on_aggregation`` \
+        is set, computes the average score of all sentences stored for the collector (and empties the storage).
+
+        :param stat_col: ``StatisticsCollector``.
 
-        stat_col['bleu_score'] = self.compute_BLEU_score(data_dict, logits)
+        :param stat_agg: ``StatisticsAggregator``.
+
+        """
+        # Aggregate base statistics.
+        super(TextToTextProblem, self).aggregate_statistics(stat_col, stat_agg)
+
+        if not self.bleu_on_aggregation:
+            stat_agg['bleu_score'] = sum(stat_col['bleu_score']) / max(len(stat_col['bleu_score']), 1)
+            return
+
+        scores = []
+        for item in self.bleu_buffers.pop(id(stat_col), []):
+            if torch.is_tensor(item):
+                scores.append(item)
+                continue
+            hypotheses, references, references_lengths = item
+            hypotheses_lengths = torch.full((hypotheses.size(0),), hypotheses.size(1), dtype=torch.long)
+            scores.append(sentence_bleu_scores(hypotheses, hypotheses_lengths, references, references_lengths))
+
+        stat_agg['bleu_score'] = torch.cat(scores).mean().item() if len(scores) > 0 else 0.0
 
     def show_sample(self, data_dict, sample=0):
         """
@@ -133,6 +133,9 @@ class TranslationAnki(TextToTextProblem):
         # get the dataset size
         self.length = len(self.tensor_pairs)
 
+        # collect the padding ratio of the input sentences
+        self.padded_lengths_key = 'inputs_length'
+
         # create the nn.Embedding layer for the input vocabulary set
         self.logger.info('Constructing random embeddings for the input vocabulary set')
         self.input_embed_layer = torch.nn.Embedding(num_embeddings=self.input_lang.n_words, embedding_dim=self.embedding_dim)
@@ -170,7 +173,7 @@ class TranslationAnki(TextToTextProblem):
             with open(weights_filepath, 'wb') as f:
                 pickle.dump(self.output_embed_layer.weight.data, f)
 
-        # the actual embedding is handled in __getitem__.
+        # the actual embedding is handled (once per batch) in prepare_batch().
 
         # define the default_values dict: holds parameters values that a model may need.
         self.default_values = {'input_vocab_size': self.input_lang.n_words,
@@ -397,11 +400,9 @@ class TranslationAnki(TextToTextProblem):
         input_tensor, target_tensor = self.tensor_pairs[index]
         input_text, target_text = self.pairs[index]
 
-        # embed the input sentence:
-        input_tensor = self.input_embed_layer(torch.LongTensor(input_tensor)).type(torch.FloatTensor)
-
-        # embed the output sentence:
-        target_tensor = self.output_embed_layer(torch.LongTensor(target_tensor)).type(torch.FloatTensor)
+        # get the token indices of the input & output sentences - they are embedded in prepare_batch().
+        input_tensor = torch.LongTensor(input_tensor).view(-1)
+        target_tensor = torch.LongTensor(target_tensor).view(-1)
 
         # return data_dict
         data_dict = DataDict({key: None for key in self.data_definitions.keys()})
@@ -415,6 +416,15 @@ class TranslationAnki(TextToTextProblem):
 
         return data_dict
 
+    def get_sample_lengths(self):
+        """
+        Returns the lengths of all input sentences, used by the :py:class:`miprometheus.utils.BucketBatchSampler`.
+
+        :return: List of the input sentences lengths.
+
+        """
+        return [len(input_tensor) for input_tensor, _ in self.tensor_pairs]
+
     def collate_fn(self, batch):
         """
         Combines a list of DataDict (retrieved with ``__getitem__``) into a batch.
@@ -425,10 +435,15 @@ class TranslationAnki(TextToTextProblem):
 
             Hence, for a given batch, each sentence is padded to the length of the longest one.
 
-            **The batch is sorted decreasingly as a function of the input sentences length.**
+            **The batch is sorted decreasingly as a function of the input sentences length.** \
+            The sort is skipped if the batch is already ordered (e.g. when using the \
+            :py:class:`miprometheus.utils.BucketBatchSampler`).
 
             This length changes between batches, but this shouldn't be an issue.
 
+            The sentences are returned as padded token indices [batch_size x max_length], \
+            they are embedded by :py:func:`prepare_batch`.
+
 
         :param batch: Individual samples to combine
         :type batch: list
@@ -437,20 +452,11 @@ class TranslationAnki(TextToTextProblem):
         containing the batch.
 
         """
-        batch_size = len(batch)
-
-        # get max input sentence length, create tensor of shape [batch_size x max_input_length] & sort inputs by
-        # decreasing length
-        max_input_len = max(map(lambda x: x['inputs_length'], batch))
-        sort_by_len = sorted(batch, key=lambda x: x['inputs_length'], reverse=True)
-
-        # create tensor containing the embedded input sentences
-        inputs = torch.zeros(batch_size, max_input_len, self.embedding_dim).type(torch.FloatTensor)
-
-        # get max output sentence length
-        max_output_len = max(map(lambda x: x['targets_length'], batch))
-        # create tensor containing the embedded output sentences
-        outputs = torch.zeros(batch_size, max_output_len, self.embedding_dim).type(torch.FloatTensor)
+        # sort inputs by decreasing length - if not already sorted
+        if all(batch[i]['inputs_length'] >= batch[i + 1]['inputs_length'] for i in range(len(batch) - 1)):
+            sort_by_len = batch
+        else:
+            sort_by_len = sorted(batch, key=lambda x: x['inputs_length'], reverse=True)
 
         # construct the DataDict and fill it with the batch
         data_dict = DataDict({key: None for key in self.data_definitions.keys()})
@@ -461,12 +467,28 @@ class TranslationAnki(TextToTextProblem):
         data_dict['targets_length'] = [elt['targets_length'] for elt in sort_by_len]
         data_dict['targets_text'] = [elt['targets_text'] for elt in sort_by_len]
 
-        for i, length in enumerate(data_dict['inputs_length']):  # only way to do this?
-            inputs[i, :length, :] = sort_by_len[i]['inputs']
-            outputs[i, :data_dict['targets_length'][i], :] = sort_by_len[i]['targets']
+        # pad the token indices: tensors of shape [batch_size x max_input_length] & [batch_size x max_output_length]
+        data_dict['inputs'] = self.pad_indices([elt['inputs'] for elt in sort_by_len])
+        data_dict['targets'] = self.pad_indices([elt['targets'] for elt in sort_by_len])
 
-        data_dict['inputs'] = inputs
-        data_dict['targets'] = outputs
+        return data_dict
+
+    def prepare_batch(self, data_dict):
+        """
+        Embeds the input & output sentences of the batch, with a single look-up for each: \
+        [batch_size x max_length] token indices -> [batch_size x max_length x embedding_dim] \
+        (zero for the padding elements).
+
+        :param data_dict: DataDict created by :py:func:`collate_fn`.
+
+        :return: New DataDict, containing the embedded sentences.
+
+        """
+        data_dict = DataDict(data_dict)
+        data_dict['inputs'] = self.embed_indices(data_dict['inputs'], data_dict['inputs_length'],
+                                                 self.input_embed_layer.weight)
+        data_dict['targets'] = self.embed_indices(data_dict['targets'], data_dict['targets_length'],
+                                                  self.output_embed_layer.weight)
 
         return data_dict
 
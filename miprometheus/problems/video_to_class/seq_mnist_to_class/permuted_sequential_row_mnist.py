@@ -23,6 +23,7 @@ import torch
 from torchvision import datasets, transforms
 
 from miprometheus.utils.data_dict import DataDict
+from miprometheus.utils.problems_utils.resident_images import load_resident_images, images_to_float
 from miprometheus.problems.video_to_class.video_to_class_problem import VideoToClassProblem
 
 
@@ -51,6 +52,9 @@ class PermutedSequentialRowMnist(VideoToClassProblem):
                     and  ``processed/test.pt`` will be saved,
                 - ``self.use_train_data`` (`bool`, `optional`) : If True, creates dataset from ``training.pt``,\
                     otherwise from ``test.pt``
+                - ``self.resident`` (`bool`, `optional`) : If True, keeps the whole split in memory as \
+                    a single tensor and creates the batches by indexing it (see :py:func:`collate_fn`) \
+                    (DEFAULT: False),
                 - ``self.defaut_values`` :
 
                     >>> self.default_values = {'nb_classes': 10,
@@ -73,9 +77,12 @@ class PermutedSequentialRowMnist(VideoToClassProblem):
         # Call base class constructor.
         super(PermutedSequentialRowMnist, self).__init__(params)
 
+        params.add_default_params({'resident': False})
+
         # Retrieve parameters from the dictionary.
         self.use_train_data = params['use_train_data']
         self.root_dir = params['root_dir']
+        self.resident = params['resident']
 
         self.num_rows = 28
         self.num_columns = 28
@@ -100,6 +107,7 @@ class PermutedSequentialRowMnist(VideoToClassProblem):
 
         # define transforms
         pixel_permutation = torch.randperm(self.num_rows)
+        self.pixel_permutation = pixel_permutation
         transform = transforms.Compose([transforms.ToTensor(),
                                         transforms.Lambda(lambda x: x[:, pixel_permutation])])
 
@@ -109,6 +117,11 @@ class PermutedSequentialRowMnist(VideoToClassProblem):
 
         self.length = len(self.dataset)
 
+        if self.resident:
+            # Keep the (uint8) images [N x 1 x 28 x 28] with permuted rows and targets [N].
+            self.images, self.targets = load_resident_images(self.dataset)
+            self.images = self.images[:, :, self.pixel_permutation].contiguous()
+
     def __getitem__(self, index):
         """
         Getter method to access the dataset and return a sample.
@@ -123,8 +136,12 @@ class PermutedSequentialRowMnist(VideoToClassProblem):
             - targets: Index of the target class
             - targets_label: Label of the target class (cf ``self.labels``)
 
+            In the resident mode, returns ``index`` only: the batch is created by :py:func:`collate_fn`.
 
         """
+        if self.resident:
+            return index
+
         # get sample
         img, target = self.dataset.__getitem__(index)
 
@@ -154,15 +171,48 @@ class PermutedSequentialRowMnist(VideoToClassProblem):
             Multi-processing is supported as the data sources are small enough to be kept in memory\
             (`training.pt` has a size of 47.5 MB).
 
+            In the resident mode, ``batch`` is a list of indices and the batch is created by \
+            :py:func:`get_batch`.
+
         :param batch: list of individual ``DataDict`` samples to combine.
 
         :return: ``DataDict({'images','targets', 'targets_label'})`` containing the batch.
 
         """
 
+        if self.resident:
+            return self.get_batch(batch)
+
         return DataDict({key: value for key, value in zip(self.data_definitions.keys(),
                                                           super(PermutedSequentialRowMnist, self).collate_fn(batch).values())})
 
+    def get_batch(self, indices):
+        """
+        Creates a batch by indexing the resident images & targets (resident mode only).
+
+        :param indices: Indices of the samples.
+        :type indices: list
+
+        :return: ``DataDict({'images', 'mask', 'targets', 'targets_label'})`` containing the batch.
+
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        batch_size = len(indices)
+        targets = self.targets[indices]
+
+        # create mask
+        mask = torch.IntTensor(batch_size, self.num_rows, 1).zero_()
+        mask[:, -1, 0] = 1
+
+        data_dict = DataDict({key: None for key in self.data_definitions.keys()})
+        data_dict['images'] = images_to_float(self.images[indices], self.num_rows, self.num_columns).view(
+            batch_size, self.num_rows, 1, 1, self.num_columns)
+        data_dict['mask'] = mask
+        data_dict['targets'] = targets.view(batch_size, 1, 1).expand(batch_size, self.num_rows, 1).contiguous()
+        data_dict['targets_label'] = [self.labels[target] for target in targets.tolist()]
+
+        return data_dict
+
 
 if __name__ == "__main__":
     """ Tests sequence generator - generates and displays a random sample"""
@@ -177,8 +227,10 @@ if __name__ == "__main__":
     # Create problem.
     problem = PermutedSequentialRowMnist(params)
 
-    # get a sample
+    # get a sample (in the resident mode, collate a batch of one)
     sample = problem[0]
+    if problem.resident:
+        sample = DataDict({key: value[0] for key, value in problem.collate_fn([sample]).items()})
     print(repr(sample))
 
     # test whether data structures match expected definitions
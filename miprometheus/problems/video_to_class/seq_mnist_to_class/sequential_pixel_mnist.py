@@ -23,6 +23,7 @@ import torch
 from torchvision import datasets, transforms
 
 from miprometheus.utils.data_dict import DataDict
+from miprometheus.utils.problems_utils.resident_images import load_resident_images, images_to_float
 from miprometheus.problems.video_to_class.video_to_class_problem import VideoToClassProblem
 
 
@@ -51,6 +52,9 @@ class SequentialPixelMNIST(VideoToClassProblem):
                     and  ``processed/test.pt`` will be saved,
                 - ``self.use_train_data`` (`bool`, `optional`) : If True, creates dataset from ``training.pt``,\
                     otherwise from ``test.pt``
+                - ``self.resident`` (`bool`, `optional`) : If True, keeps the whole split in memory as \
+                    a single tensor and creates the batches by indexing it (see :py:func:`collate_fn`) \
+                    (DEFAULT: False),
                 - ``self.defaut_values`` :
 
                     >>> self.default_values = {'nb_classes': 10,
@@ -70,9 +74,12 @@ class SequentialPixelMNIST(VideoToClassProblem):
         # Call base class constructors.
         super(SequentialPixelMNIST, self).__init__(params)
 
+        params.add_default_params({'resident': False})
+
         # Retrieve parameters from the dictionary.
         self.use_train_data = params['use_train_data']
         self.root_dir = params['root_dir']
+        self.resident = params['resident']
 
         self.num_rows = 28
         self.num_columns = 28
@@ -103,6 +110,10 @@ class SequentialPixelMNIST(VideoToClassProblem):
 
         self.length = len(self.dataset)
 
+        if self.resident:
+            # Keep the (uint8) images [N x 1 x 28 x 28] and targets [N].
+            self.images, self.targets = load_resident_images(self.dataset)
+
     def __getitem__(self, index):
         """
         Getter method to access the dataset and return a sample.
@@ -116,7 +127,12 @@ class SequentialPixelMNIST(VideoToClassProblem):
             - mask
             - targets: Index of the target class
 
+            In the resident mode, returns ``index`` only: the batch is created by :py:func:`collate_fn`.
+
         """
+        if self.resident:
+            return index
+
         # get sample
         img, target = self.dataset.__getitem__(index)
 
@@ -146,15 +162,49 @@ class SequentialPixelMNIST(VideoToClassProblem):
             Multi-processing is supported as the data sources are small enough to be kept in memory\
             (`training.pt` has a size of 47.5 MB).
 
+            In the resident mode, ``batch`` is a list of indices and the batch is created by \
+            :py:func:`get_batch`.
+
         :param batch: list of individual ``DataDict`` samples to combine.
 
         :return: ``DataDict({'sequences','targets', 'targets_label'})`` containing the batch.
 
         """
 
+        if self.resident:
+            return self.get_batch(batch)
+
         return DataDict({key: value for key, value in zip(self.data_definitions.keys(),
                                                           super(SequentialPixelMNIST, self).collate_fn(batch).values())})
 
+    def get_batch(self, indices):
+        """
+        Creates a batch by indexing the resident images & targets (resident mode only).
+
+        :param indices: Indices of the samples.
+        :type indices: list
+
+        :return: ``DataDict({'images', 'mask', 'targets', 'targets_label'})`` containing the batch.
+
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        batch_size = len(indices)
+        length = self.num_rows * self.num_columns
+        targets = self.targets[indices]
+
+        # create mask
+        mask = torch.IntTensor(batch_size, length, 1).zero_()
+        mask[:, -1, 0] = 1
+
+        data_dict = DataDict({key: None for key in self.data_definitions.keys()})
+        data_dict['images'] = images_to_float(self.images[indices], self.num_rows, self.num_columns).view(
+            batch_size, length, 1, 1, 1)
+        data_dict['mask'] = mask
+        data_dict['targets'] = targets.view(batch_size, 1, 1).expand(batch_size, length, 1).contiguous()
+        data_dict['targets_label'] = [self.labels[target] for target in targets.tolist()]
+
+        return data_dict
+
 
 if __name__ == "__main__":
     """ Tests sequence generator - generates and displays a random sample"""
@@ -169,8 +219,10 @@ if __name__ == "__main__":
     # Create problem.
     problem = SequentialPixelMNIST(params)
 
-    # get a sample
+    # get a sample (in the resident mode, collate a batch of one)
     sample = problem[0]
+    if problem.resident:
+        sample = DataDict({key: value[0] for key, value in problem.collate_fn([sample]).items()})
     print(repr(sample))
 
     # test whether data structures match expected definitions
@@ -1,4 +1,9 @@
+from .alias_weighted_sampler import AliasWeightedSampler
 from .app_state import AppState
+from .batch_cache import BatchCache
+from .bucket_batch_sampler import BucketBatchSampler
+from .cell_state_history import CellStateHistory
+from .checkpoint_manager import CheckpointManager
 from .param_interface import ParamInterface
 from .param_registry import MetaSingletonABC, ParamRegistry
 from .sampler_factory import SamplerFactory
@@ -8,15 +13,24 @@ from .statistics_collector import StatisticsCollector
 from .statistics_aggregator import StatisticsAggregator
 from .time_plot import TimePlot
 from .data_dict import DataDict
+from .distributed_shard_sampler import DistributedShardSampler
 
 from .loss.masked_cross_entropy_loss import MaskedCrossEntropyLoss
 from .loss.masked_bce_with_logits_loss import MaskedBCEWithLogitsLoss
 
+from .problems_utils.bleu_score import sentence_bleu_scores
 from .problems_utils.generate_feature_maps import GenerateFeatureMaps
 from .problems_utils.language import Language
+from .problems_utils.question_store import QuestionStore
+from .problems_utils.resident_images import load_resident_images, images_to_float
 
 __all__ = [
+    'AliasWeightedSampler',
     'AppState',
+    'BatchCache',
+    'BucketBatchSampler',
+    'CellStateHistory',
+    'CheckpointManager',
     'ParamInterface',
     'MetaSingletonABC',
     'ParamRegistry',
@@ -27,8 +41,13 @@ __all__ = [
     'StatisticsAggregator',
     'TimePlot',
     'DataDict',
+    'DistributedShardSampler',
     'MaskedCrossEntropyLoss',
     'MaskedBCEWithLogitsLoss',
+    'sentence_bleu_scores',
     'GenerateFeatureMaps',
-    'Language'
+    'Language',
+    'QuestionStore',
+    'load_resident_images',
+    'images_to_float'
     ]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+alias_weighted_sampler.py: contains a weighted random sampler drawing the indices in O(1) with the alias method, \
+used for the importance sampling of large datasets.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import numpy as np
+from torch.utils.data.sampler import Sampler
+
+
+class AliasWeightedSampler(Sampler):
+    """
+    Samples the indices ``[0, len(weights)-1]`` with replacement, with probabilities proportional to the given \
+    weights (as ``torch.utils.data.sampler.WeightedRandomSampler`` with ``replacement=True``).
+
+    The draws use the alias method (Walker, Vose): every index ``i`` gets a column split into the probability \
+    ``prob[i]`` of returning ``i`` and the complement of returning ``alias[i]``. Drawing an index then requires \
+    one uniform column and one uniform threshold, i.e. O(1) regardless of the number of indices, and the draws of \
+    an epoch are generated with a few vectorized ``numpy`` operations (in chunks of ``chunk_size`` indices).
+
+    The tables are built in O(n log n) by a vectorized equivalent of the sequential sweep pairing the \
+    `small` (``prob < 1``) and `large` (``prob >= 1``) columns, hence rebuilding them between epochs \
+    (see :py:func:`set_weights`) is cheap, even for tens of millions of indices.
+
+    .. note::
+
+        The new weights are used from the next epoch, i.e. the next call to :py:func:`__iter__`.
+
+    """
+
+    def __init__(self, weights, num_samples=None, chunk_size=2**20):
+        """
+        Initializes the sampler.
+
+        :param weights: Non-negative weights of all indices (e.g. a memory-mapped ``np.array``), not \
+        necessarily summing to 1.
+        :type weights: list or ``np.array``
+
+        :param num_samples: Number of indices drawn per epoch (DEFAULT: None, i.e. ``len(weights)``).
+        :type num_samples: int
+
+        :param chunk_size: Number of indices drawn at once (DEFAULT: 2**20).
+        :type chunk_size: int
+
+        """
+        self.num_samples = num_samples
+        self.chunk_size = chunk_size
+
+        self.set_weights(weights)
+
+    def set_weights(self, weights):
+        """
+        Sets new weights, i.e. (re)builds the alias tables.
+
+        :param weights: Non-negative weights of all indices (their number cannot change if ``num_samples`` \
+        was set).
+        :type weights: list or ``np.array``
+
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        n = len(weights)
+
+        if n == 0 or weights.min() < 0 or not np.isfinite(weights).all() or weights.sum() <= 0:
+            raise ValueError("The weights must be non-negative, finite and cannot be all zero.")
+
+        # Scale the probabilities so that the average column is 1.
+        prob = weights * (n / weights.sum())
+        alias = np.arange(n, dtype=np.int64)
+
+        small = np.flatnonzero(prob < 1)
+        large = np.flatnonzero(prob >= 1)
+
+        if len(small) > 0 and len(large) > 0:
+            # Cumulative deficits of the small columns & surpluses of the large columns.
+            deficits = np.cumsum(1 - prob[small])
+            surpluses = np.cumsum(prob[large] - 1)
+
+            # Every small column is filled by the large column active in the sweep, i.e. the first one whose
+            # cumulative surplus reaches the deficits of the previous small columns. Both searches compare the
+            # same cumulative sums, so that their (complementary) tie rules agree on the exact ties, frequent
+            # for integer or repeated weights.
+            previous_deficits = np.concatenate([np.zeros(1), deficits[:-1]])
+            active = np.searchsorted(surpluses, previous_deficits, side='left')
+            alias[small] = large[np.minimum(active, len(large) - 1)]
+
+            # A large column exhausted (by the small column t) is filled by the next large column.
+            new_prob = np.ones(len(large))
+            t = np.searchsorted(deficits, surpluses[:-1], side='right')
+            exhausted = np.flatnonzero(t < len(small))
+            new_prob[exhausted] = 1 + surpluses[exhausted] - deficits[t[exhausted]]
+            alias[large[exhausted]] = large[exhausted + 1]
+
+            prob[large] = new_prob
+        else:
+            # All columns are (numerically) full.
+            prob[:] = 1
+
+        self.prob = np.clip(prob, 0, 1)
+        self.alias = alias
+
+    def __iter__(self):
+        """
+        Draws the indices of the (new) epoch.
+
+        :return: Iterator over the indices.
+
+        """
+        n = len(self.prob)
+        remaining = len(self)
+
+        while remaining > 0:
+            size = min(remaining, self.chunk_size)
+            remaining -= size
+
+            # Draw the columns, then keep their indices or take their aliases.
+            columns = np.random.randint(n, size=size)
+            keep = np.random.random_sample(size) < self.prob[columns]
+            indices = np.where(keep, columns, self.alias[columns])
+
+            for index in indices.tolist():
+                yield index
+
+    def __len__(self):
+        """
+        :return: Number of indices drawn per epoch.
+
+        """
+        return self.num_samples if self.num_samples is not None else len(self.prob)
+
+    def get_probabilities(self):
+        """
+        Computes the (normalized) sampling probabilities of all indices from the alias tables, e.g. for checks.
+
+        :return: ``np.array`` of probabilities.
+
+        """
+        n = len(self.prob)
+        return (self.prob + np.bincount(self.alias, weights=1 - self.prob, minlength=n)) / n
+
+
+if __name__ == "__main__":
+    """
+    Compares the probabilities of the alias tables (for integer, tied and continuous weights) & the empirical \
+    frequencies with the weights.
+    """
+    # Integer & repeated weights (many exact ties in the construction).
+    for weights in [np.arange(10.), np.array([5, 4, 1, 2, 4, 5, 2, 4, 3]), np.random.randint(0, 7, size=1000)]:
+        assert np.allclose(AliasWeightedSampler(weights).get_probabilities(), weights / weights.sum())
+
+    weights = np.random.exponential(size=1000) * (np.random.random_sample(1000) < 0.8)
+    expected = weights / weights.sum()
+
+    sampler = AliasWeightedSampler(weights, num_samples=10**6)
+    assert np.allclose(sampler.get_probabilities(), expected)
+
+    frequencies = np.bincount(np.fromiter(sampler, dtype=np.int64), minlength=len(weights)) / len(sampler)
+    print('Max. difference between the frequencies and the probabilities: {:.5f}'.format(
+        np.abs(frequencies - expected).max()))
+    assert frequencies[weights == 0].sum() == 0
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+batch_cache.py: contains a memory-bounded cache of collated batches (``DataDict``), used e.g. to avoid reloading \
+the same validation batches over and over again.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import torch
+import logging
+from collections import OrderedDict
+
+from miprometheus.utils.app_state import AppState
+
+
+class BatchCache(object):
+    """
+    Least Recently Used (LRU) cache of collated batches, bounded by a memory budget.
+
+    The batches are indexed by their position in the (deterministic) sequence of batches, e.g. the episode index \
+    within a pass over the validation set.
+
+    .. warning::
+
+        The cache assumes that the cached batches are identical in every pass over the set, what is true \
+        for datasets loaded from disk, but not for problems generating the samples on-the-fly (as the cached \
+        batches would become a fixed set).
+
+    """
+
+    def __init__(self, max_size_mb, use_device=True):
+        """
+        Initializes the cache.
+
+        :param max_size_mb: Memory budget (in MB). Only the tensors contained in the batches are taken into account.
+        :type max_size_mb: float
+
+        :param use_device: If set, batches are stored on the GPU when CUDA is used, falling back to \
+        CPU memory if the device runs out of memory (DEFAULT: True).
+        :type use_device: bool
+
+        """
+        self.logger = logging.getLogger('BatchCache')
+        self.app_state = AppState()
+
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.use_device = use_device
+
+        # Cached batches (from least to most recently used) and their sizes.
+        self.batches = OrderedDict()
+        self.sizes = dict()
+        self.size = 0
+
+        # Counters.
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_batch_size_in_bytes(batch):
+        """
+        Returns the memory footprint of the tensors contained in a batch.
+
+        :param batch: Batch of data.
+        :type batch: ``DataDict``
+
+        :return: Size in bytes.
+
+        """
+        return sum(value.element_size() * value.numel() for value in batch.values() if isinstance(value, torch.Tensor))
+
+    def __contains__(self, key):
+        return key in self.batches
+
+    def __len__(self):
+        return len(self.batches)
+
+    def get(self, key):
+        """
+        Returns the batch associated with a given key, marking it as the most recently used.
+
+        :param key: Key (index) of the batch.
+
+        :return: Cached ``DataDict`` or None if not present.
+
+        """
+        if key not in self.batches:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.batches.move_to_end(key)
+        return self.batches[key]
+
+    def put(self, key, batch):
+        """
+        Adds a batch to the cache, evicting the least recently used batches if the memory budget is exceeded.
+
+        :param key: Key (index) of the batch.
+
+        :param batch: Batch of data.
+        :type batch: ``DataDict``
+
+        :return: Batch as stored in the cache (possibly moved to the GPU), or the original batch if it was \
+        not cached (i.e. it exceeds the memory budget on its own).
+
+        """
+        size = self.get_batch_size_in_bytes(batch)
+        if size > self.max_size:
+            return batch
+
+        # Replace the old batch, if present.
+        if key in self.batches:
+            self.size -= self.sizes.pop(key)
+            del self.batches[key]
+
+        # Evict least recently used batches.
+        while self.size + size > self.max_size:
+            old_key, _ = self.batches.popitem(last=False)
+            self.size -= self.sizes.pop(old_key)
+
+        # Move the batch to the device - if it fits.
+        if self.use_device and self.app_state.use_CUDA:
+            try:
+                batch = batch.cuda()
+            except RuntimeError:
+                self.logger.warning("Could not store batch on the GPU, keeping it in CPU memory")
+
+        self.batches[key] = batch
+        self.sizes[key] = size
+        self.size += size
+
+        return batch
+
+    def clear(self):
+        """
+        Empties the cache.
+
+        """
+        self.batches.clear()
+        self.sizes.clear()
+        self.size = 0
+
+    def get_statistics_string(self):
+        """
+        :return: String summarizing the state of the cache.
+
+        """
+        return "{} batches cached ({:.1f} MB out of {:.1f} MB), {} hits, {} misses".format(
+            len(self.batches), self.size / (1024 * 1024), self.max_size / (1024 * 1024), self.hits, self.misses)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+bucket_batch_sampler.py: contains a batch sampler grouping samples of similar lengths, reducing the padding \
+of the variable-length sequences (questions, sentences).
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import numpy as np
+from torch.utils.data.sampler import Sampler
+
+
+class BucketBatchSampler(Sampler):
+    """
+    Batch sampler grouping the indices of samples of similar lengths into the same batches.
+
+    In every epoch:
+
+        - the indices are shuffled and split into buckets of ``bucket_size`` batches,
+        - every bucket is sorted by decreasing length and split into batches,
+        - the order of the batches is shuffled.
+
+    Hence the composition of the batches still changes between epochs, while the padding is limited to the \
+    differences of lengths within a (sorted) bucket.
+
+    .. note::
+
+        The samples within a batch are ordered by decreasing length (ties keep the random order), so that \
+        e.g. ``pack_padded_sequence()`` can be used without sorting the batch in ``collate_fn``.
+
+    .. note::
+
+        This is a batch sampler: it must be passed to the ``DataLoader`` as ``batch_sampler`` (what the workers \
+        do automatically) and its length is the number of batches.
+
+    """
+    # Marks the samplers returning batches (passed to the DataLoader as batch_sampler).
+    batch_sampling = True
+
+    def __init__(self, lengths, batch_size, bucket_size=100, shuffle=True, drop_last=False):
+        """
+        Initializes the sampler.
+
+        :param lengths: Lengths of all samples of the problem (e.g. returned by \
+        :py:func:`miprometheus.problems.Problem.get_sample_lengths`).
+        :type lengths: list or ``np.array``
+
+        :param batch_size: Size of the batches.
+        :type batch_size: int
+
+        :param bucket_size: Number of batches in a bucket (DEFAULT: 100). Larger buckets result in less padding, \
+        but also in less random batches.
+        :type bucket_size: int
+
+        :param shuffle: Shuffle the samples & batches in every epoch (DEFAULT: True). If not set, the buckets \
+        contain consecutive samples and the batches are returned in order.
+        :type shuffle: bool
+
+        :param drop_last: Drop the incomplete batches (DEFAULT: False). Note that there is (at most) one such \
+        batch per bucket.
+        :type drop_last: bool
+
+        """
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.batch_size = batch_size
+        self.bucket_size = max(bucket_size, 1)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+        # Number of samples in every bucket - does not depend on the epoch.
+        num_samples = len(self.lengths)
+        samples_per_bucket = self.batch_size * self.bucket_size
+        self.bucket_sizes = [min(samples_per_bucket, num_samples - start)
+                             for start in range(0, num_samples, samples_per_bucket)]
+
+    def __iter__(self):
+        """
+        Generates the batches of the (new) epoch.
+
+        :return: Iterator over the batches (lists of indices).
+
+        """
+        if self.shuffle:
+            indices = np.random.permutation(len(self.lengths))
+        else:
+            indices = np.arange(len(self.lengths))
+
+        batches = []
+        start = 0
+        for size in self.bucket_sizes:
+            bucket = indices[start:start + size]
+            start += size
+
+            # Sort by decreasing length - stable, so that the samples of same lengths keep the random order.
+            bucket = bucket[np.argsort(-self.lengths[bucket], kind='stable')]
+
+            for i in range(0, size, self.batch_size):
+                batch = bucket[i:i + self.batch_size]
+                if len(batch) < self.batch_size and self.drop_last:
+                    continue
+                batches.append(batch.tolist())
+
+        if self.shuffle:
+            batches = [batches[i] for i in np.random.permutation(len(batches))]
+
+        return iter(batches)
+
+    def __len__(self):
+        """
+        :return: Number of batches per epoch.
+
+        """
+        if self.drop_last:
+            return sum(size // self.batch_size for size in self.bucket_sizes)
+        return sum((size + self.batch_size - 1) // self.batch_size for size in self.bucket_sizes)
+
+    @property
+    def num_samples(self):
+        """
+        :return: Number of samples returned per epoch.
+
+        """
+        if self.drop_last:
+            return len(self) * self.batch_size
+        return len(self.lengths)
+
+    def padding_ratio(self):
+        """
+        Computes the (expected) ratio of padding elements to all elements of the padded batches, e.g. to compare \
+        different bucket sizes.
+
+        .. note::
+
+            Iterates over a single epoch (does not change the random state of the batches returned later).
+
+        :return: Padding ratio (float in [0, 1]).
+
+        """
+        state = np.random.get_state()
+        padded, total = 0, 0
+        for batch in self:
+            lengths = self.lengths[batch]
+            padded += len(batch) * lengths.max()
+            total += lengths.sum()
+        np.random.set_state(state)
+
+        return 1.0 - total / max(padded, 1)
+
+
+if __name__ == "__main__":
+    """
+    Compares the padding ratio of random batches and bucketed batches.
+    """
+    # Lengths of "questions".
+    lengths = np.random.randint(3, 45, size=10000)
+
+    for bucket_size in [1, 10, 100]:
+        sampler = BucketBatchSampler(lengths, batch_size=64, bucket_size=bucket_size)
+        print('Bucket of {} batches: {} batches, padding ratio: {:.3f}'.format(
+            bucket_size, len(sampler), sampler.padding_ratio()))
+
+    # Check that each sample is returned exactly once.
+    indices = sorted(i for batch in sampler for i in batch)
+    assert indices == list(range(len(lengths)))
+    print('Each sample returned once.')
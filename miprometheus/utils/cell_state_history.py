@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+cell_state_history.py: contains a bounded recorder of the cell states, used by the models for visualization.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import torch
+import numpy as np
+from collections import deque
+
+
+class CellStateHistory(object):
+    """
+    Records the history of (recurrent) cell states for visualization purposes.
+
+    In order to bound the memory usage (and the overhead of recording):
+
+        - only a single, selected sample from the batch is recorded (as only one sample is visualized), \
+        detached and copied to CPU,
+        - only every ``stride``-th step is recorded,
+        - at most ``max_length`` (most recent) states are kept (ring buffer).
+
+    .. note::
+
+        The recorded states keep the batch dimension (of size 1), so the visualization should index \
+        them with 0, regardless of the index of the recorded sample.
+
+    """
+
+    def __init__(self, sample=0, stride=1, max_length=-1):
+        """
+        Initializes the recorder.
+
+        :param sample: Index of the recorded sample (DEFAULT: 0).
+        :type sample: int
+
+        :param stride: Only every ``stride``-th step will be recorded (DEFAULT: 1, i.e. all steps).
+        :type stride: int
+
+        :param max_length: Maximum number of stored states (DEFAULT: -1, i.e. unlimited).
+        :type max_length: int
+
+        """
+        self.sample = sample
+        self.stride = max(stride, 1)
+        self.max_length = max_length if max_length > 0 else None
+
+        self.reset()
+
+    def reset(self):
+        """
+        Empties the history, e.g. before processing a new batch.
+
+        """
+        self.states = deque(maxlen=self.max_length)
+        # Indices of the recorded steps.
+        self.steps = deque(maxlen=self.max_length)
+        # Index of the next step.
+        self.step = 0
+
+    def select_sample(self, state, to_numpy=False):
+        """
+        Selects the recorded sample from a (nested) cell state, detaching the tensors and copying them to CPU.
+
+        :param state: Cell state: tensor, numpy array or (nested) tuple/named tuple/list of those \
+        (other objects are returned unchanged).
+
+        :param to_numpy: If set, converts the tensors to numpy arrays (DEFAULT: False).
+        :type to_numpy: bool
+
+        :return: Cell state containing only the selected sample (keeping the batch dimension).
+
+        """
+        if isinstance(state, torch.Tensor):
+            state = state[self.sample:self.sample + 1].detach().cpu()
+            return state.numpy() if to_numpy else state
+        if isinstance(state, np.ndarray):
+            return state[self.sample:self.sample + 1].copy()
+        if isinstance(state, tuple) and hasattr(state, '_fields'):
+            return type(state)(*[self.select_sample(item, to_numpy) for item in state])
+        if isinstance(state, (tuple, list)):
+            return type(state)([self.select_sample(item, to_numpy) for item in state])
+        return state
+
+    def record(self, state, to_numpy=False):
+        """
+        Records the cell state of the current step (if the step is not skipped due to ``stride``).
+
+        :param state: Cell state (see :py:func:`select_sample`).
+
+        :param to_numpy: If set, converts the tensors to numpy arrays (DEFAULT: False).
+        :type to_numpy: bool
+
+        """
+        step = self.step
+        self.step += 1
+
+        if step % self.stride != 0:
+            return
+
+        self.steps.append(step)
+        self.states.append(self.select_sample(state, to_numpy))
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __getitem__(self, index):
+        return self.states[index]
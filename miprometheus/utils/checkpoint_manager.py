@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+checkpoint_manager.py: contains the class responsible for writing model checkpoints (and their metadata) to disk \
+asynchronously.
+
+"""
+__author__ = "Tomasz Kornuta & Vincent Marois"
+
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+class CheckpointManager(object):
+    """
+    Class writing model checkpoints to disk in a background thread, so that the training does not stall on disk I/O.
+
+    Each checkpoint `<name>.pt` is accompanied by a small `<name>.json` metadata file, containing everything \
+    but the model parameters (name, episode, loss, training status, timestamps and statistics).
+
+    .. note::
+
+        The training status is kept only in the metadata file: changing it does not require to load and rewrite \
+        the (possibly large) checkpoint.
+
+    .. note::
+
+        All files are first written to a temporary file, which is then atomically renamed, so a checkpoint \
+        (or metadata) file is never left half-written. The writes are processed in order by a single thread.
+
+    .. note::
+
+        The queue and the writing thread are created on the first write request and are not copied \
+        (``copy.deepcopy()``) nor pickled along with the manager (e.g. with the model owning it): the copy \
+        starts with an empty queue and creates its own thread when required.
+
+    """
+
+    def __init__(self, logger=None):
+        """
+        Initializes the manager. The queue and the writing thread are created on the first write request.
+
+        :param logger: Logger used to report the progress (DEFAULT: None, i.e. creates a new one).
+        :type logger: ``logging.Logger``
+
+        """
+        self.logger = logger if logger is not None else logging.getLogger('CheckpointManager')
+
+        # Queue of write requests and the thread processing it (created when required).
+        self.queue = None
+        self.thread = None
+
+        # Metadata of the checkpoints written so far, indexed by the checkpoint filename.
+        self.metadata = dict()
+
+    @staticmethod
+    def get_metadata_filename(checkpoint_file):
+        """
+        Returns the name of the metadata file associated with a given checkpoint file, i.e. the checkpoint \
+        filename with the `.pt` extension replaced by `.json` (e.g. `model_best.pt` -> `model_best.json`).
+
+        :param checkpoint_file: Name of the checkpoint file.
+        :type checkpoint_file: str
+
+        :return: Name of the metadata file.
+
+        """
+        return os.path.splitext(checkpoint_file)[0] + '.json'
+
+    @staticmethod
+    def snapshot_state_dict(module):
+        """
+        Returns a copy of the state dict of a module, with all tensors moved to CPU.
+
+        .. note::
+
+            The copy is required as the parameters will be modified by the optimizer while \
+            the checkpoint is being written.
+
+        :param module: Module (model) to take the snapshot of.
+        :type module: ``torch.nn.Module``
+
+        :return: ``OrderedDict`` containing copies of the parameters and buffers.
+
+        """
+        state_dict = module.state_dict()
+
+        snapshot = OrderedDict()
+        for key, value in state_dict.items():
+            # .cpu() already copies tensors stored on a GPU.
+            snapshot[key] = value.detach().cpu() if value.is_cuda else value.detach().clone()
+
+        # Keep the version metadata used by load_state_dict().
+        snapshot._metadata = getattr(state_dict, '_metadata', None)
+
+        return snapshot
+
+    @staticmethod
+    def export_metadata(chkpt):
+        """
+        Extracts the metadata (i.e. everything but the ``state_dict``) of a checkpoint.
+
+        Timestamps are exported using the `%Y%m%d_%H%M%S` format.
+
+        :param chkpt: Checkpoint dictionary (as created by :py:func:`miprometheus.models.Model.save`).
+        :type chkpt: dict
+
+        :return: Dictionary that can be serialized to `json`.
+
+        """
+        return {'name': chkpt['name'],
+                'model_timestamp': '{0:%Y%m%d_%H%M%S}'.format(chkpt['model_timestamp']),
+                'episode': int(chkpt['episode']),
+                'loss': float(chkpt['loss']),
+                'status': chkpt['status'],
+                'status_timestamp': '{0:%Y%m%d_%H%M%S}'.format(chkpt['status_timestamp']),
+                'training_stats': chkpt['training_stats'],
+                'validation_stats': chkpt['validation_stats']
+               }
+
+    def save(self, chkpt, checkpoint_file):
+        """
+        Requests writing of the checkpoint and its metadata to file.
+
+        :param chkpt: Checkpoint dictionary. Its ``state_dict`` must not be modified afterwards \
+        (see :py:func:`snapshot_state_dict`).
+        :type chkpt: dict
+
+        :param checkpoint_file: Name of the checkpoint file.
+        :type checkpoint_file: str
+
+        """
+        metadata = self.export_metadata(chkpt)
+        self.metadata[checkpoint_file] = metadata
+
+        self.enqueue(self._write_checkpoint, chkpt, checkpoint_file)
+        self.enqueue(self._write_metadata, dict(metadata), self.get_metadata_filename(checkpoint_file))
+
+    def update_status(self, checkpoint_file, status, status_timestamp):
+        """
+        Requests an update of the training status stored in the metadata file of a given checkpoint.
+
+        :param checkpoint_file: Name of the checkpoint file (previously saved with :py:func:`save`).
+        :type checkpoint_file: str
+
+        :param status: New training status.
+        :type status: str
+
+        :param status_timestamp: Time of the status change.
+        :type status_timestamp: ``datetime.datetime``
+
+        :return: False if the checkpoint was not saved by this manager, True otherwise.
+
+        """
+        if checkpoint_file not in self.metadata:
+            self.logger.warning("Cannot update the training status: checkpoint {} was not saved".format(
+                checkpoint_file))
+            return False
+
+        metadata = self.metadata[checkpoint_file]
+        metadata['status'] = status
+        metadata['status_timestamp'] = '{0:%Y%m%d_%H%M%S}'.format(status_timestamp)
+
+        self.enqueue(self._write_metadata, dict(metadata), self.get_metadata_filename(checkpoint_file))
+        return True
+
+    def enqueue(self, function, *args):
+        """
+        Adds a write request to the queue, starting the writing thread if required.
+
+        :param function: Function that will be called by the writing thread.
+
+        :param args: Arguments of the function.
+
+        """
+        if self.thread is None:
+            self.queue = queue.Queue()
+            self.thread = threading.Thread(target=self._process_queue, name='CheckpointManager', daemon=True)
+            self.thread.start()
+            # Make sure that all pending checkpoints will be written before exiting.
+            atexit.register(self.wait)
+
+        self.queue.put((function, args))
+
+    def wait(self):
+        """
+        Blocks until all requested checkpoints are written to disk.
+
+        """
+        if self.thread is not None:
+            self.queue.join()
+
+    def __getstate__(self):
+        """
+        Returns the state of the manager without the queue and the writing thread (which cannot be copied \
+        nor pickled).
+
+        """
+        state = self.__dict__.copy()
+        state['queue'] = None
+        state['thread'] = None
+        return state
+
+    def _process_queue(self):
+        """
+        Main loop of the writing thread.
+
+        """
+        while True:
+            function, args = self.queue.get()
+            try:
+                function(*args)
+            except Exception as e:
+                self.logger.error("Could not write checkpoint: {}".format(e))
+            finally:
+                self.queue.task_done()
+
+    def _write_checkpoint(self, chkpt, checkpoint_file):
+        """
+        Writes the checkpoint to a temporary file, then atomically renames it.
+
+        """
+        tmp_file = checkpoint_file + '.tmp'
+        torch.save(chkpt, tmp_file)
+        os.replace(tmp_file, checkpoint_file)
+        self.logger.info("Model and statistics exported to checkpoint {}".format(checkpoint_file))
+
+    def _write_metadata(self, metadata, metadata_file):
+        """
+        Writes the metadata to a temporary file, then atomically renames it.
+
+        """
+        tmp_file = metadata_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_file, metadata_file)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+distributed_shard_sampler.py: contains a sampler returning the shard of the indices (or batches) of another \
+sampler assigned to one process of the distributed (data-parallel) training.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import torch
+import numpy as np
+from torch.utils.data.sampler import Sampler
+
+
+class DistributedShardSampler(Sampler):
+    """
+    Wraps a sampler and returns the shard of its indices assigned to one of the ``num_replicas`` processes.
+
+    In every epoch, all processes draw the same indices from the wrapped sampler (the random draws use a state \
+    derived from ``seed`` and the epoch, the same in all processes, while the random state of the process is \
+    preserved), pad them (if ``pad`` is set) by repeating the first ones so that their number is divisible by \
+    ``num_replicas`` and keep every ``num_replicas``-th index, starting at ``rank``.
+
+    Unlike ``torch.utils.data.distributed.DistributedSampler`` (limited to the shuffled indices of a dataset), \
+    it works with any sampler created by the :py:class:`miprometheus.utils.SamplerFactory`. Batch samplers \
+    (e.g. :py:class:`miprometheus.utils.BucketBatchSampler`) are sharded by batches.
+
+    .. note::
+
+        With the padding, all processes get the same number of indices (batches), hence run the same number \
+        of episodes, which is required by the synchronization of the gradients (training). Without it, every \
+        index is returned exactly once (the numbers of indices of the processes differ by at most one), so \
+        the statistics of the evaluation (e.g. validation) are not biased by the repeated samples.
+
+    .. note::
+
+        The epoch is incremented by every iteration over the sampler, so the shards change between epochs \
+        without calling :py:func:`set_epoch`.
+
+    """
+
+    def __init__(self, sampler, num_replicas, rank, seed=0, pad=True):
+        """
+        Initializes the sampler.
+
+        :param sampler: Sampler (or batch sampler) to shard.
+        :type sampler: ``torch.utils.data.sampler.Sampler``
+
+        :param num_replicas: Number of processes of the distributed training.
+        :type num_replicas: int
+
+        :param rank: Rank of the current process (in [0, num_replicas-1]).
+        :type rank: int
+
+        :param seed: Seed of the random draws, must be the same in all processes (DEFAULT: 0).
+        :type seed: int
+
+        :param pad: Pad the indices, so all processes get the same number of them (DEFAULT: True).
+        :type pad: bool
+
+        """
+        self.sampler = sampler
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = seed
+        self.pad = pad
+        self.epoch = 0
+
+        # Batch samplers are passed to the DataLoader as batch_sampler.
+        self.batch_sampling = getattr(sampler, 'batch_sampling', False)
+
+    def set_epoch(self, epoch):
+        """
+        Sets the epoch used to draw the indices of the next iteration.
+
+        :param epoch: Index of the epoch.
+        :type epoch: int
+
+        """
+        self.epoch = epoch
+
+    def __iter__(self):
+        """
+        Draws the indices of the (new) epoch and returns the shard of the current process.
+
+        :return: Iterator over the indices (batches).
+
+        """
+        # Draw the indices with the random state shared by all processes.
+        numpy_state = np.random.get_state()
+        with torch.random.fork_rng(devices=[]):
+            np.random.seed((self.seed + self.epoch) % 2**32)
+            torch.manual_seed((self.seed + self.epoch) % 2**32)
+            items = list(self.sampler)
+        np.random.set_state(numpy_state)
+        self.epoch += 1
+
+        if not self.pad:
+            return iter(items[self.rank::self.num_replicas])
+
+        # Pad the indices, so every process gets the same number of them.
+        total = len(self) * self.num_replicas
+        while 0 < len(items) < total:
+            items += items[:total - len(items)]
+
+        return iter(items[self.rank:total:self.num_replicas])
+
+    def __len__(self):
+        """
+        :return: Number of indices (batches) returned per epoch to the current process.
+
+        """
+        if not self.pad:
+            return (len(self.sampler) - self.rank + self.num_replicas - 1) // self.num_replicas
+        return (len(self.sampler) + self.num_replicas - 1) // self.num_replicas
+
+    @property
+    def num_samples(self):
+        """
+        :return: Number of samples returned per epoch to the current process (batch samplers only, \
+        an upper bound without the padding, as the sizes of the batches may differ).
+
+        """
+        return (self.sampler.num_samples + self.num_replicas - 1) // self.num_replicas
+
+
+if __name__ == "__main__":
+    """
+    Checks that the shards of a random sampler cover all indices, exactly once without the padding.
+    """
+    from torch.utils.data.sampler import SubsetRandomSampler
+
+    shards = [list(DistributedShardSampler(SubsetRandomSampler(range(1000)), 3, rank, seed=7))
+              for rank in range(3)]
+
+    assert all(len(shard) == 334 for shard in shards)
+    indices = [i for shard in shards for i in shard]
+    assert sorted(set(indices)) == list(range(1000))
+    print('Shards of {} processes cover the {} indices.'.format(len(shards), len(set(indices))))
+
+    shards = [list(DistributedShardSampler(SubsetRandomSampler(range(1000)), 3, rank, seed=7, pad=False))
+              for rank in range(3)]
+
+    assert [len(shard) for shard in shards] == [334, 333, 333]
+    assert sorted(i for shard in shards for i in shard) == list(range(1000))
+    print('Shards of {} processes (without padding) cover the indices exactly once.'.format(len(shards)))
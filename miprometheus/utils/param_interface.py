@@ -174,6 +174,28 @@ class ParamInterface(Mapping):
             else:
                 yield key
 
+    def get_leaf(self, leaf_key):
+        """
+        Returns the value of the specified ``leaf_key`` of the current :py:class:`ParamInterface`.
+
+        :param leaf_key: leaf key to look for.
+        :type leaf_key: str
+
+        :return: Value of the (first found) leaf, ``None`` if ``leaf_key`` is not in \
+        :py:func:`ParamInterface.leafs`.
+
+        """
+        for key, value in self.items():
+
+            if isinstance(value, ParamInterface):
+                # hit a sub ParamInterface, recursion
+                if leaf_key in list(value.leafs()):
+                    return value.get_leaf(leaf_key)
+            elif key == leaf_key:
+                return value
+
+        return None
+
     def set_leaf(self, leaf_key, leaf_value):
         """
         Update the value of the specified ``leaf_key`` of the current :py:class:`ParamInterface` \
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+bleu_score.py:
+
+    - Contains the definition of a sentence_bleu_scores function, computing the BLEU scores of a batch of \
+    sentences represented as tensors of word indices.
+
+"""
+__author__ = "Vincent Marois"
+
+import torch
+
+
+def sentence_bleu_scores(hypotheses, hypotheses_lengths, references, references_lengths, max_order=4,
+                         epsilon=0.1):
+    """
+    Computes the sentence-level BLEU scores of a batch of (padded) sentences of word indices, with uniform \
+    n-gram weights and the smoothing `method1` (i.e. ``epsilon`` is added to the numerators of the null \
+    precisions).
+
+    Equivalent to calling (for every sample) NLTK's:
+
+        >>> sentence_bleu([reference], hypothesis, smoothing_function=SmoothingFunction(epsilon).method1)
+
+    .. note::
+
+        Instead of hashing the n-grams, the n-gram counts are computed from the (batched) n-gram equality \
+        matrices between the hypotheses and the references, i.e. for every n-gram of the hypothesis:
+
+            - h: number of occurrences of the n-gram in the hypothesis,
+            - r: number of occurrences of the n-gram in the reference,
+
+        and the clipped count of the n-gram (min(h, r)) is distributed over its h occurrences. The complexity is \
+        O(batch_size x hypotheses_length x references_length), which is negligible for sentences.
+
+    :param hypotheses: Word indices of the hypotheses, shape [batch_size x max_hypotheses_length].
+    :type hypotheses: torch.LongTensor
+
+    :param hypotheses_lengths: Lengths of the hypotheses (the indices after them are ignored).
+    :type hypotheses_lengths: torch.LongTensor or list
+
+    :param references: Word indices of the references, shape [batch_size x max_references_length].
+    :type references: torch.LongTensor
+
+    :param references_lengths: Lengths of the references (the indices after them are ignored).
+    :type references_lengths: torch.LongTensor or list
+
+    :param max_order: Maximum n-gram order (DEFAULT: 4).
+    :type max_order: int
+
+    :param epsilon: Smoothing epsilon (DEFAULT: 0.1).
+    :type epsilon: float
+
+    :return: BLEU scores, shape [batch_size] (float64, 0 < BLEU < 1).
+
+    """
+    device = hypotheses.device
+    hyp_len = torch.as_tensor(hypotheses_lengths, device=device).double()
+    ref_len = torch.as_tensor(references_lengths, device=device).double()
+
+    # Positions of the unigrams.
+    hyp_pos = torch.arange(hypotheses.size(1), device=device).double().unsqueeze(0)
+    ref_pos = torch.arange(references.size(1), device=device).double().unsqueeze(0)
+
+    # Unigram equality matrices: hypothesis-reference [B x Th x Tr] and hypothesis-hypothesis [B x Th x Th].
+    hyp_ref_unigrams = hypotheses.unsqueeze(2) == references.unsqueeze(1)
+    hyp_hyp_unigrams = hypotheses.unsqueeze(2) == hypotheses.unsqueeze(1)
+
+    hyp_ref, hyp_hyp = hyp_ref_unigrams, hyp_hyp_unigrams
+    log_precisions = []
+    no_match = None
+    for n in range(1, max_order + 1):
+        if n > 1:
+            # n-gram (i, j) matches if the (n-1)-gram (i, j) and the unigram (i+n-1, j+n-1) match.
+            hyp_ref = hyp_ref[:, :-1, :-1] & hyp_ref_unigrams[:, n - 1:, n - 1:]
+            hyp_hyp = hyp_hyp[:, :-1, :-1] & hyp_hyp_unigrams[:, n - 1:, n - 1:]
+
+        num_hyp_ngrams = hyp_hyp.size(1)
+        # Masks of the valid n-grams (fully contained in the unpadded sentences).
+        hyp_valid = (hyp_pos[:, :num_hyp_ngrams] + n <= hyp_len.unsqueeze(1)).double()
+        ref_valid = (ref_pos[:, :hyp_ref.size(2)] + n <= ref_len.unsqueeze(1)).double()
+
+        # Occurrences of every n-gram of the hypothesis in the hypothesis & the reference.
+        hyp_counts = torch.matmul(hyp_hyp.double(), hyp_valid.unsqueeze(2)).squeeze(2)
+        ref_counts = torch.matmul(hyp_ref.double(), ref_valid.unsqueeze(2)).squeeze(2)
+
+        # Clipped counts, distributed over the occurrences of the n-grams.
+        clipped = torch.min(hyp_counts, ref_counts) / hyp_counts.clamp(min=1)
+        numerator = (clipped * hyp_valid).sum(dim=1)
+        denominator = (hyp_len - n + 1).clamp(min=1)
+
+        if n == 1:
+            no_match = numerator == 0
+
+        # Smoothing (method1).
+        numerator = torch.where(numerator == 0, torch.full_like(numerator, epsilon), numerator)
+        log_precisions.append(torch.log(numerator / denominator))
+
+    # Geometric mean of the precisions.
+    scores = torch.exp(torch.stack(log_precisions, dim=1).mean(dim=1))
+
+    # Brevity penalty.
+    brevity_penalty = torch.where(hyp_len > ref_len, torch.ones_like(hyp_len),
+                                  torch.exp(1 - ref_len / hyp_len.clamp(min=1)))
+    scores = scores * brevity_penalty
+
+    # No unigram matches (e.g. empty hypothesis) - BLEU is 0.
+    return scores.masked_fill(no_match, 0)
+
+
+if __name__ == "__main__":
+    """
+    Compares the scores with NLTK.
+    """
+    from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
+
+    torch.manual_seed(0)
+    batch_size, vocabulary_size = 64, 10
+    hypotheses = torch.randint(0, vocabulary_size, (batch_size, 15)).long()
+    references = torch.randint(0, vocabulary_size, (batch_size, 12)).long()
+    hypotheses_lengths = torch.randint(1, 16, (batch_size,)).long()
+    references_lengths = torch.randint(1, 13, (batch_size,)).long()
+
+    scores = sentence_bleu_scores(hypotheses, hypotheses_lengths, references, references_lengths)
+
+    for i in range(batch_size):
+        hypothesis = hypotheses[i, :hypotheses_lengths[i]].tolist()
+        reference = references[i, :references_lengths[i]].tolist()
+        expected = sentence_bleu([reference], hypothesis, smoothing_function=SmoothingFunction().method1)
+        assert abs(scores[i].item() - expected) < 1e-6, (i, scores[i].item(), expected)
+
+    print('BLEU scores match NLTK.')
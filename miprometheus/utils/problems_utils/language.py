@@ -44,7 +44,11 @@ __author__ = "Vincent Marois, Ryan L. McAvoy"
 
 """
 
+import os
+import json
 import torch
+import logging
+import numpy as np
 from collections import Counter, OrderedDict
 from torchtext import vocab
 
@@ -70,22 +74,62 @@ class Language(object):
         self.unk_token = "<unk>"
         self.pad_token = "<pad>"
 
+        self.logger = logging.getLogger('Language')
+
     def embed_sentence(self, sentence):
         """
-        Embed an entire sentence using a pretrained embedding.
+        Embed an entire sentence using a pretrained embedding (with a single look-up).
 
         :param sentence: A string containing the words to embed
         :returns: FloatTensor of embedded vectors [max_sentence_length, embedding size]
 
         """
-        outsentence = torch.zeros(
-            (len(sentence.split()), self.vocab.vectors.size()[1]))
+        return self.vocab.vectors.index_select(0, self.indices_from_sentence(sentence))
+
+    def embed_sentences(self, sentences):
+        """
+        Embed a batch of sentences using a pretrained embedding (with a single look-up).
+
+        The sentences are padded with the embedding of the padding token.
+
+        :param sentences: A list of strings containing the words to embed
+        :returns: FloatTensor of embedded vectors [batch_size, max_sentence_length, embedding size]
+
+        """
+        indices = self.indices_from_sentences(sentences)
+        embedded = self.vocab.vectors.index_select(0, indices.view(-1))
 
-        # embed a word at a time
-        for i, word in enumerate(sentence.split()):
-            outsentence[i, :] = self.embed_word(word)
+        return embedded.view(indices.size(0), indices.size(1), -1)
+
+    def indices_from_sentence(self, sentence):
+        """
+        Returns the vocabulary indices of the words of a sentence, e.g. to embed a batch of sentences \
+        at once (with a single look-up into ``self.vocab.vectors``).
+
+        :param sentence: A string containing the words
+        :returns: LongTensor of indices [sentence_length]
+
+        """
+        return torch.LongTensor([self.vocab.stoi[word] for word in sentence.split()])
+
+    def indices_from_sentences(self, sentences):
+        """
+        Returns the vocabulary indices of the words of a batch of sentences, padded with the index of the \
+        padding token.
 
-        return outsentence
+        :param sentences: A list of strings containing the words
+        :returns: LongTensor of indices [batch_size, max_sentence_length]
+
+        """
+        words = [sentence.split() for sentence in sentences]
+        max_length = max([len(sentence) for sentence in words] + [0])
+        pad_index = self.vocab.stoi[self.pad_token]
+
+        stoi = self.vocab.stoi
+        indices = [[stoi[word] for word in sentence] + [pad_index] * (max_length - len(sentence))
+                   for sentence in words]
+
+        return torch.LongTensor(indices).view(len(sentences), max_length)
 
     def embed_word(self, word):
         """
@@ -119,12 +163,18 @@ class Language(object):
 
         return self.vocab.itos[index]
 
-    def build_pretrained_vocab(self, data_set, **kwargs):
+    def build_pretrained_vocab(self, data_set, cache_folder=None, cache_name=None, **kwargs):
         """
         Construct the torchtext Vocab object from a list of sentences. This
         allows us to load only vectors we actually need.
 
+        If ``cache_folder`` and ``cache_name`` are set, the vocabulary-restricted embedding matrix is cached in \
+        `<cache_folder>/<cache_name>_<vectors>_vectors.npy` (with the vocabulary in `..._itos.json`), so that \
+        the next runs do not have to load (or download) the full pretrained vectors.
+
         :param data_set: A list containing strings (either sentences or just single word string work)
+        :param cache_folder: Folder containing the cached vectors (DEFAULT: None, i.e. no caching).
+        :param cache_name: Name of the dataset the vocabulary is built from, e.g. `train_CLEVR` (DEFAULT: None).
         :param \**kwargs: The keyword arguments for the vectors class from torch text. The most important kwarg is vectors which is a string containing the embedding type to be loaded
 
         """
@@ -140,8 +190,39 @@ class Language(object):
             tok for tok in [self.unk_token, self.pad_token, self.init_token,
                             self.eos_token]
             if tok is not None))
+
+        if cache_folder is None or cache_name is None or 'vectors' not in kwargs:
+            self.vocab = self.vocab_cls(counter, specials=specials, **kwargs)
+            return
+
+        cache_prefix = os.path.join(os.path.expanduser(cache_folder), '{}_{}'.format(cache_name, kwargs['vectors']))
+        vectors_file, itos_file = cache_prefix + '_vectors.npy', cache_prefix + '_itos.json'
+
+        # Build the vocabulary only - does not require the pretrained vectors.
+        vocab_kwargs = {key: value for key, value in kwargs.items() if key != 'vectors'}
+        self.vocab = self.vocab_cls(counter, specials=specials, **vocab_kwargs)
+
+        if os.path.isfile(vectors_file) and os.path.isfile(itos_file):
+            with open(itos_file) as f:
+                itos = json.load(f)
+
+            # Make sure that the cache corresponds to the same vocabulary.
+            if itos == self.vocab.itos:
+                self.logger.info('Loading the cached {} vectors from {}'.format(kwargs['vectors'], vectors_file))
+                self.vocab.vectors = torch.from_numpy(np.load(vectors_file))
+                return
+
+            self.logger.warning('The cached vectors {} do not match the vocabulary, rebuilding them'.format(
+                vectors_file))
+
+        # Load the pretrained vectors & cache the vocabulary-restricted embedding matrix.
         self.vocab = self.vocab_cls(counter, specials=specials, **kwargs)
 
+        np.save(vectors_file, self.vocab.vectors.numpy())
+        with open(itos_file, 'w') as f:
+            json.dump(self.vocab.itos, f)
+        self.logger.info('Cached the {} vectors in {}'.format(kwargs['vectors'], vectors_file))
+
 
 """
 The names of the classes available in torchtext vocab for reference
@@ -309,6 +390,7 @@ if __name__ == '__main__':
     print("Which as expected corresponds to:", word)
 
     print(lang.embed_sentence("Big Falcon Rocket is awesome").size())
+    print(lang.embed_sentences(["Big Falcon Rocket is awesome", "king"]).size())
     #analogy('cat', 'kitten', 'dog')
     #analogy('dog', 'puppy', 'cat')
     #analogy('russia', 'moscow', 'france')
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+question_store.py: contains a compact, columnar store of tokenized questions (used by the VQA problems).
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import os
+import json
+import numpy as np
+
+
+class QuestionStore(object):
+    """
+    Compact, columnar store of tokenized questions, replacing a list of per-question dicts.
+
+    The questions are kept in a few flat ``numpy`` arrays:
+
+        - tokens: all tokenized questions concatenated (int32) and their offsets (int64, one more than questions),
+        - answers: encoded answers (int32),
+        - families: indices of the question families (int16, -1 if unknown) in a (small) list of family names,
+        - images: image filenames (fixed-width bytes).
+
+    Stored on disk (see :py:func:`from_questions`), the arrays are memory-mapped: the startup does not require \
+    to unpickle the questions and the (read-only) pages are shared by the ``DataLoader`` workers, instead of \
+    being copied by the reference counting of millions of Python objects.
+
+    The question strings, only needed for the visualization, are kept in a separate file (utf-8 encoded \
+    strings concatenated with their offsets), memory-mapped on the first access only.
+
+    """
+    # Arrays stored in the files <prefix>_<name>.npy.
+    arrays = ['tokens', 'offsets', 'answers', 'families', 'images']
+    # Arrays of the question strings (loaded lazily).
+    string_arrays = ['strings', 'string_offsets']
+
+    def __init__(self, arrays, family_names, prefix=None):
+        """
+        Initializes the store. Use :py:func:`load` or :py:func:`from_questions` instead.
+
+        :param arrays: Dictionary of the (possibly memory-mapped) arrays. The string arrays may be missing, \
+        in which case they are loaded from files on the first access.
+        :type arrays: dict
+
+        :param family_names: Names of the question families.
+        :type family_names: list
+
+        :param prefix: Path prefix of the files (DEFAULT: None, i.e. the store exists in memory only).
+        :type prefix: str
+
+        """
+        self.tokens = arrays['tokens']
+        self.offsets = arrays['offsets']
+        self.answers = arrays['answers']
+        self.families = arrays['families']
+        self.images = arrays['images']
+
+        self.strings = arrays.get('strings', None)
+        self.string_offsets = arrays.get('string_offsets', None)
+
+        self.family_names = family_names
+        self.prefix = prefix
+
+    @staticmethod
+    def get_filename(prefix, name):
+        """
+        :return: Name of the file storing a given array.
+
+        """
+        return '{}_{}.npy'.format(prefix, name)
+
+    @staticmethod
+    def exists(prefix):
+        """
+        Checks if all files of a store exist.
+
+        :param prefix: Path prefix of the files.
+        :type prefix: str
+
+        :return: True if the store can be loaded.
+
+        """
+        names = QuestionStore.arrays + QuestionStore.string_arrays
+        return os.path.isfile(prefix + '_meta.json') and \
+            all(os.path.isfile(QuestionStore.get_filename(prefix, name)) for name in names)
+
+    @classmethod
+    def load(cls, prefix):
+        """
+        Loads (memory-maps) the store from files.
+
+        :param prefix: Path prefix of the files.
+        :type prefix: str
+
+        :return: :py:class:`QuestionStore` instance.
+
+        """
+        arrays = {name: np.load(cls.get_filename(prefix, name), mmap_mode='r') for name in cls.arrays}
+
+        with open(prefix + '_meta.json') as f:
+            meta = json.load(f)
+
+        return cls(arrays, meta['family_names'], prefix)
+
+    @classmethod
+    def from_questions(cls, tokens, answers, strings, images, families=None, prefix=None):
+        """
+        Creates the store from lists of question attributes (one element per question).
+
+        :param tokens: Tokenized questions (lists of word indices).
+        :type tokens: list
+
+        :param answers: Encoded answers.
+        :type answers: list
+
+        :param strings: Question strings.
+        :type strings: list
+
+        :param images: Image filenames.
+        :type images: list
+
+        :param families: Question families (str or None). Optional.
+        :type families: list
+
+        :param prefix: Path prefix of the files. If set, the store is written to files and memory-mapped, \
+        otherwise it is kept in memory (DEFAULT: None).
+        :type prefix: str
+
+        :return: :py:class:`QuestionStore` instance.
+
+        """
+        arrays = dict()
+
+        lengths = np.array([len(question) for question in tokens], dtype=np.int64)
+        arrays['offsets'] = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(lengths)])
+        arrays['tokens'] = np.fromiter((token for question in tokens for token in question), dtype=np.int32,
+                                       count=int(arrays['offsets'][-1]))
+        arrays['answers'] = np.asarray(answers, dtype=np.int32)
+
+        # Encode the families.
+        family_names = sorted(set(family for family in (families or []) if family is not None))
+        family_index = {family: i for i, family in enumerate(family_names)}
+        if families is None:
+            arrays['families'] = np.full(len(answers), -1, dtype=np.int16)
+        else:
+            arrays['families'] = np.array([family_index.get(family, -1) for family in families], dtype=np.int16)
+
+        arrays['images'] = np.array([image.encode('utf-8') for image in images], dtype=np.bytes_)
+
+        # Concatenate the encoded strings.
+        encoded = [string.encode('utf-8') for string in strings]
+        arrays['string_offsets'] = np.concatenate([np.zeros(1, dtype=np.int64),
+                                                   np.cumsum([len(string) for string in encoded], dtype=np.int64)])
+        arrays['strings'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        if prefix is None:
+            return cls(arrays, family_names)
+
+        # Save the arrays & metadata, then memory-map them.
+        for name in cls.arrays + cls.string_arrays:
+            np.save(cls.get_filename(prefix, name), arrays[name])
+
+        with open(prefix + '_meta.json', 'w') as f:
+            json.dump({'num_questions': len(answers), 'family_names': family_names}, f)
+
+        return cls.load(prefix)
+
+    def __len__(self):
+        """
+        :return: Number of questions.
+
+        """
+        return len(self.answers)
+
+    def question_tokens(self, index):
+        """
+        :return: Tokenized question (int32 array view).
+
+        """
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    def question_lengths(self):
+        """
+        :return: Array of the lengths (number of tokens) of all questions.
+
+        """
+        return np.diff(self.offsets)
+
+    def answer(self, index):
+        """
+        :return: Encoded answer.
+
+        """
+        return int(self.answers[index])
+
+    def family(self, index):
+        """
+        :return: Name of the question family or None if unknown.
+
+        """
+        family = self.families[index]
+        return self.family_names[family] if family >= 0 else None
+
+    def image(self, index):
+        """
+        :return: Image filename.
+
+        """
+        return self.images[index].decode('utf-8')
+
+    def question_string(self, index):
+        """
+        Returns the question string, memory-mapping the strings file on the first access.
+
+        :return: Question string.
+
+        """
+        if self.strings is None:
+            self.strings = np.load(self.get_filename(self.prefix, 'strings'), mmap_mode='r')
+            self.string_offsets = np.load(self.get_filename(self.prefix, 'string_offsets'), mmap_mode='r')
+
+        return self.strings[self.string_offsets[index]:self.string_offsets[index + 1]].tobytes().decode('utf-8')
+
+
+if __name__ == "__main__":
+    """
+    Tests the store.
+    """
+    import tempfile
+
+    tokens = [[1, 2, 3], [4, 5], [1, 6, 7, 8]]
+    answers = [0, 1, 0]
+    strings = ['Is it red?', 'How many?', 'Is the cube small?']
+    images = ['CLEVR_train_000000.png', 'CLEVR_train_000000.png', 'CLEVR_train_000001.png']
+    families = ['exist', 'count', None]
+
+    with tempfile.TemporaryDirectory() as folder:
+        for prefix in [None, os.path.join(folder, 'train_CLEVR_questions')]:
+            store = QuestionStore.from_questions(tokens, answers, strings, images, families, prefix)
+            if prefix is not None:
+                # Reload, the strings will be loaded lazily.
+                store = QuestionStore.load(prefix)
+
+            for i in range(len(store)):
+                assert store.question_tokens(i).tolist() == tokens[i]
+                assert store.answer(i) == answers[i]
+                assert store.question_string(i) == strings[i]
+                assert store.image(i) == images[i]
+                assert store.family(i) == families[i]
+            assert store.question_lengths().tolist() == [3, 2, 4]
+
+    print('QuestionStore works.')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+resident_images.py:
+
+    - Contains functions keeping a whole (small) ``torchvision`` image dataset in memory as a single tensor \
+    and converting batches of its images, used by the `resident` mode of the MNIST & CIFAR-10 problems.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import torch
+import numpy as np
+import torch.nn.functional as F
+
+
+def load_resident_images(dataset):
+    """
+    Extracts all images and targets of a ``torchvision`` MNIST or CIFAR-10 dataset (without applying its \
+    transforms).
+
+    :param dataset: ``torchvision.datasets.MNIST`` or ``torchvision.datasets.CIFAR10`` instance.
+
+    :return: Tuple (images, targets), with:
+
+        - images: ``torch.ByteTensor`` of shape [num_samples x channels x height x width],
+        - targets: ``torch.LongTensor`` of shape [num_samples].
+
+    """
+    if hasattr(dataset, 'data'):
+        # Recent torchvision versions.
+        images, targets = dataset.data, dataset.targets
+    elif dataset.train:
+        images, targets = dataset.train_data, dataset.train_labels
+    else:
+        images, targets = dataset.test_data, dataset.test_labels
+
+    # MNIST stores a ByteTensor, CIFAR-10 a numpy array.
+    images = torch.from_numpy(np.asarray(images)) if isinstance(images, np.ndarray) else images
+
+    if images.dim() == 3:
+        # Single channel: [N x H x W] -> [N x 1 x H x W].
+        images = images.unsqueeze(1)
+    else:
+        # Channels last: [N x H x W x C] -> [N x C x H x W].
+        images = images.permute(0, 3, 1, 2)
+
+    return images.contiguous(), torch.as_tensor(targets, dtype=torch.long)
+
+
+def images_to_float(images, height, width):
+    """
+    Converts a batch of images to floats in [0, 1] (as ``transforms.ToTensor()``), resizing them if required.
+
+    .. note::
+
+        The resizing uses the bilinear interpolation of ``torch.nn.functional.interpolate`` on the whole batch, \
+        which (unlike ``transforms.Resize``) does not apply antialiasing when down-scaling.
+
+    :param images: Batch of images, shape [batch_size x channels x height x width].
+    :type images: ``torch.ByteTensor``
+
+    :param height: Output height.
+    :type height: int
+
+    :param width: Output width.
+    :type width: int
+
+    :return: ``torch.FloatTensor`` of shape [batch_size x channels x height x width].
+
+    """
+    images = images.float().div_(255)
+
+    if images.shape[2:] != (height, width):
+        images = F.interpolate(images, size=(height, width), mode='bilinear', align_corners=False)
+
+    return images
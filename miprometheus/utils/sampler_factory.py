@@ -23,8 +23,12 @@ __author__ = "Tomasz Kornuta"
 
 import os
 import logging
+import numpy as np
 import torch.utils.data.sampler
 
+from miprometheus.utils.bucket_batch_sampler import BucketBatchSampler
+from miprometheus.utils.alias_weighted_sampler import AliasWeightedSampler
+
 
 class SamplerFactory(object):
     """
@@ -51,8 +55,24 @@ class SamplerFactory(object):
 
         .. warning::
 
-            ``torch.utils.data.sampler.WeightedRandomSampler``, ``torch.utils.data.sampler.BatchSampler``, \
-            ``torch.utils.data.sampler.DistributedSampler`` are not yet supported.
+            ``torch.utils.data.sampler.BatchSampler``, ``torch.utils.data.sampler.DistributedSampler`` are not \
+            yet supported. In the distributed training of the trainers (see ``--nprocs``), every sampler \
+            is sharded automatically by the :py:class:`miprometheus.utils.DistributedShardSampler`.
+
+        .. note::
+
+            ``WeightedRandomSampler`` is built as :py:class:`miprometheus.utils.AliasWeightedSampler` (sampling \
+            with replacement, in O(1) per index). The weights (one per sample) are:
+
+            - read from the 'weights' key: list or name of a file (``.npy`` files are memory-mapped, text files \
+            contain comma-separated values),
+
+            - or else returned by :py:func:`miprometheus.problems.Problem.get_sample_weights`.
+
+            It accepts the optional keys 'num_samples' (DEFAULT: -1, i.e. the number of weights) and \
+            'update_weights' (DEFAULT: False). If the latter is set, the trainers update the weights at the end \
+            of every epoch with the ones returned by :py:func:`miprometheus.problems.Problem.get_sample_weights` \
+            (e.g. computed from the statistics collected during the epoch).
 
         .. note::
 
@@ -68,9 +88,23 @@ class SamplerFactory(object):
             - Option 3: list of indices.
                 >>> yaml_list = yaml.load('[0, 2, 5, 10]')
 
-            - Option 4: name of the file containing indices.
+            - Option 4: name of the text file containing (comma-separated) indices.
                 >>> filename = "~/data/mnist/training_indices.txt"
 
+            - Option 5: name of the binary ``.npy`` file containing indices (e.g. created by \
+            :py:class:`miprometheus.helpers.IndexSplitter`), memory-mapped instead of being read.
+                >>> filename = "~/data/mnist/training_indices.npy"
+
+            Except for the ``.npy`` files, two indices are interpreted as a range (see :py:func:`load_indices`).
+
+        .. note::
+
+            :py:class:`miprometheus.utils.BucketBatchSampler` groups samples of similar lengths into the same \
+            batches, using the lengths returned by :py:func:`miprometheus.problems.Problem.get_sample_lengths`. \
+            It accepts the optional keys 'bucket_size' (DEFAULT: 100), 'shuffle' (DEFAULT: True) and 'drop_last' \
+            (DEFAULT: False), whereas the batch size is taken from the problem parameters. \
+            As this is a batch sampler, the worker passes it to the DataLoader as ``batch_sampler``.
+
 
         :return: Instance of a given sampler or ``None`` if the section not present or couldn't build the sampler.
 
@@ -91,6 +125,41 @@ class SamplerFactory(object):
             # Get the class name.
             name = params['name']
 
+            # Handle the bucketing batch sampler.
+            if name == 'BucketBatchSampler':
+                lengths = problem.get_sample_lengths()
+                if lengths is None:
+                    raise Exception("Problem '{}' does not provide the lengths of its samples required by "
+                                    "BucketBatchSampler.".format(problem.name))
+
+                params.add_default_params({'bucket_size': 100, 'shuffle': True, 'drop_last': False})
+                logger.info('Loading the {} sampler from {}'.format(name, BucketBatchSampler.__module__))
+
+                return BucketBatchSampler(lengths, problem.params['batch_size'], bucket_size=params['bucket_size'],
+                                          shuffle=params['shuffle'], drop_last=params['drop_last'])
+
+            # Handle the weighted sampler - using the alias method.
+            if name == 'WeightedRandomSampler':
+                params.add_default_params({'num_samples': -1, 'update_weights': False})
+
+                if 'weights' in params:
+                    weights = SamplerFactory.load_weights(params['weights'])
+                else:
+                    weights = problem.get_sample_weights()
+                    if weights is None:
+                        raise Exception("The sampler configuration section does not contain the key 'weights' "
+                                        "and problem '{}' does not provide the weights of its samples required by "
+                                        "WeightedRandomSampler.".format(problem.name))
+
+                if len(weights) != len(problem):
+                    raise Exception("WeightedRandomSampler requires one weight per sample, got {} weights for {} "
+                                    "samples.".format(len(weights), len(problem)))
+
+                logger.info('Loading the {} sampler from {}'.format(name, AliasWeightedSampler.__module__))
+
+                num_samples = params['num_samples'] if params['num_samples'] > 0 else None
+                return AliasWeightedSampler(weights, num_samples)
+
             # Verify that the specified class is in the samplers package.
             if name not in dir(torch.utils.data.sampler):
                 raise Exception("Could not find the specified class '{}' in the samplers package".format(name))
@@ -109,51 +178,24 @@ class SamplerFactory(object):
                     raise Exception("The sampler configuration section does not contain the key 'indices' "
                                     "required by SubsetRandomSampler.")
 
-                indices = params['indices']
-
-                # Analyze the type.
-                if type(indices) == str:
-                    # Try to open the file.
-                    try:
-                        # from expanduser()'s doc: If the expansion fails or if the path does not begin
-                        # with a tilde, the path is returned unchanged. -> So operation below should be safe.
-                        file = open(os.path.expanduser(indices), "r")
-                        # Read the file.
-                        indices = file.readline() 
-                        file.close()
-
-                    except Exception:
-                        # Ok, this is not a file.
-                        pass
-                    finally:
-                        # Try to process it as a string.
-                        # Get the digits.
-                        digits = indices.split(',')
-                        indices = [int(x) for x in digits]
-                else:
-                    # Assume that type(indices) is a list of ints.
-                    digits = indices
-
-                # Finally, we got the list of digits.
-                if len(digits) == 2:
-                    # Create a range.
-                    indices = range(int(digits[0]), int(digits[1]))
-                # Else: use them as they are
+                indices = SamplerFactory.load_indices(params['indices'], logger)
 
                 # Check if indices are within range.
-                if max(indices) >= len(problem):
+                max_index = indices[-1] if isinstance(indices, range) else int(np.max(indices))
+                if max_index >= len(problem):
                     logger.error("SubsetRandomSampler cannot work properly when indices are out of range ({}) "
-                                 "considering that there are {} samples in the problem!".format(max(indices),
+                                 "considering that there are {} samples in the problem!".format(max_index,
                                                                                                 len(problem)))
                     exit(-1)
 
                 # Create the sampler object.
                 sampler = sampler_class(indices)
 
-            elif sampler_class.__name__ in ['WeightedRandomSampler', 'BatchSampler', 'DistributedSampler']:
+            elif sampler_class.__name__ in ['BatchSampler', 'DistributedSampler']:
                 # Sorry, don't support those. Yet;)
                 logger.error("Sampler Factory currently does not support {} sampler. Please pick one of the others "
-                             "or use defaults random sampling.".format(sampler_class.__name__))
+                             "or use defaults random sampling (sharded automatically in the distributed "
+                             "training).".format(sampler_class.__name__))
                 exit(-2)
             else:
                 # Create "regular" sampler.
@@ -167,6 +209,85 @@ class SamplerFactory(object):
             logger.warning("Using default sampling without sampler.")
             return None
 
+    @staticmethod
+    def load_indices(indices, logger):
+        """
+        Loads the indices of a subset of the dataset (see :py:func:`build` for the accepted options).
+
+        .. note::
+
+            The ``.npy`` files are memory-mapped, i.e. the (possibly millions of) indices are neither read nor \
+            parsed, and the pages are shared between the ``DataLoader`` workers.
+
+        .. warning::
+
+            For backward compatibility, two indices (in a list, a string or a text file) are interpreted as a \
+            range ``[start, end)``. Use a ``.npy`` file to pass two actual indices.
+
+        :param indices: Indices, range or name of a file containing them.
+        :type indices: list, range or str
+
+        :param logger: Logging utility.
+        :type logger: logging.Logger
+
+        :return: ``range`` or ``np.array`` (possibly memory-mapped) of indices.
+
+        """
+        if type(indices) == str:
+            # from expanduser()'s doc: If the expansion fails or if the path does not begin
+            # with a tilde, the path is returned unchanged. -> So operation below should be safe.
+            filename = os.path.expanduser(indices)
+
+            if filename.endswith('.npy'):
+                # Binary file: memory-map it, the indices are used as they are.
+                return np.load(filename, mmap_mode='r')
+
+            if os.path.isfile(filename):
+                # Read the text file.
+                with open(filename, "r") as file:
+                    indices = file.read()
+            # Else: ok, this is not a file - process it as a string.
+
+            # Get the digits.
+            digits = np.fromstring(indices, dtype=np.int64, sep=',')
+        elif isinstance(indices, range):
+            return indices
+        else:
+            # Assume that type(indices) is a list of ints.
+            digits = np.asarray(indices, dtype=np.int64)
+
+        # Finally, we got the list of digits.
+        if len(digits) == 2:
+            # Create a range.
+            logger.warning('Interpreting the two indices as the range [{}, {}).'.format(digits[0], digits[1]))
+            return range(int(digits[0]), int(digits[1]))
+
+        # Else: use them as they are
+        return digits
+
+    @staticmethod
+    def load_weights(weights):
+        """
+        Loads the weights of the samples used by ``WeightedRandomSampler``.
+
+        :param weights: Weights or name of a file containing them (``.npy`` files are memory-mapped, text files \
+        contain comma-separated values).
+        :type weights: list or str
+
+        :return: ``np.array`` (possibly memory-mapped) of weights.
+
+        """
+        if type(weights) == str:
+            filename = os.path.expanduser(weights)
+
+            if filename.endswith('.npy'):
+                return np.load(filename, mmap_mode='r')
+
+            with open(filename, "r") as file:
+                return np.fromstring(file.read(), dtype=np.float64, sep=',')
+
+        return np.asarray(weights, dtype=np.float64)
+
 
 if __name__ == "__main__":
     """
@@ -190,6 +311,8 @@ if __name__ == "__main__":
     yaml_list = yaml.load('[0, 2, 5, 10]')
     # Option 4: name of the file containing indices.
     filename = "~/data/mnist/training_indices.txt"
+    # Option 5: name of the binary file containing indices.
+    filename = "~/data/mnist/training_indices.npy"
 
     params = ParamInterface()
     params.add_default_params({'name': 'SubsetRandomSampler',
@@ -26,12 +26,15 @@ __author__ = "Tomasz Kornuta"
 import numpy as np
 
 
-def split_indices(length, split, logger, random_sampling=True):
+def split_indices(length, split, logger, random_sampling=True, labels=None):
     """
     Splits the indices of an array of a given ``length`` into two parts, using the ``split`` as the divider.
 
     Random sampling is used by default, but can be turned off.
 
+    If ``labels`` are provided, the split is stratified: every label is distributed between the two parts \
+    proportionally to the split (the rounding remainders go to the labels with the largest fractional parts).
+
     :param length: Length (size) of the dataset.
     :type length: int
 
@@ -42,14 +45,47 @@ def split_indices(length, split, logger, random_sampling=True):
     :type logger: logging.Logger
 
     :param random_sampling: Use random sampling (DEFAULT: ``True``). If set to ``False``, will return two ranges \
-    instead of lists with indices.
+    instead of lists with indices (or, for stratified splits, the first samples of every label in the first part).
     :type random_sampling: bool
 
-    :return: Two lists with indices (when random_sampling is ``True``), or two lists with two elements - \
-    ranges (when ``False``).
+    :param labels: Labels of the samples, used for a stratified split (DEFAULT: ``None``).
+    :type labels: list or ``np.array``
+
+    :return: Two lists with indices (when random_sampling is ``True`` or the split is stratified), or two lists \
+    with two elements - ranges (otherwise).
 
     """  
-    if random_sampling:
+    if labels is not None:
+        logger.info('Using stratified {}sampling'.format('random ' if random_sampling else ''))
+        # Encode the labels.
+        _, inverse = np.unique(np.asarray(labels), return_inverse=True)
+        counts = np.bincount(inverse)
+
+        # Number of indices of every label in the first part.
+        quotas = counts * split / length
+        sizes = np.floor(quotas).astype(np.int64)
+        remainder = split - sizes.sum()
+        sizes[np.argsort(sizes - quotas, kind='stable')[:remainder]] += 1
+
+        # Group the (randomly permuted) indices by label.
+        indices = np.random.permutation(length) if random_sampling else np.arange(length)
+        indices = indices[np.argsort(inverse[indices], kind='stable')]
+
+        # Rank of every index within its label.
+        ranks = np.arange(length) - np.repeat(np.cumsum(counts) - counts, counts)
+        in_a = ranks < np.repeat(sizes, counts)
+
+        split_a = indices[in_a]
+        split_b = indices[~in_a]
+        if random_sampling:
+            # Do not keep the indices grouped by label.
+            split_a = np.random.permutation(split_a)
+            split_b = np.random.permutation(split_b)
+        else:
+            split_a = np.sort(split_a)
+            split_b = np.sort(split_b)
+
+    elif random_sampling:
         logger.info('Using random sampling')
         # Random indices.
         indices = np.random.permutation(length)
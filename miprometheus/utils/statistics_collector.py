@@ -22,6 +22,10 @@ statistics_collector.py: contains class used for collection and export of statis
  """
 __author__ = "Tomasz Kornuta & Vincent Marois"
 
+import pickle
+import numbers
+import torch
+import torch.distributed as dist
 from collections import Mapping
 
 
@@ -114,6 +118,78 @@ class StatisticsCollector(Mapping):
         for key in self.statistics.keys():
             del self.statistics[key][:]
 
+    def all_reduce(self, summed_keys=('batch_size',)):
+        """
+        Reduces the last collected values over all processes of the distributed training (in place): \
+        the numbers are averaged, except the ones of the ``summed_keys``, which are summed.
+
+        .. note::
+
+            Must be called by all processes (collecting the same statistics). The values other than numbers \
+            and one-element tensors (e.g. strings or booleans) are left unchanged, while the integers \
+            (e.g. episode) remain integers.
+
+        :param summed_keys: Keys of the statistics which are summed, e.g. the batch size (DEFAULT: ('batch_size',)).
+        :type summed_keys: tuple
+
+        """
+        # Gather the numerical values, in the same order in all processes.
+        keys, values = [], []
+        for key in sorted(self.statistics.keys()):
+            if len(self.statistics[key]) == 0:
+                continue
+            value = self.statistics[key][-1]
+            if torch.is_tensor(value) and value.numel() == 1:
+                value = value.item()
+            if isinstance(value, numbers.Number) and not isinstance(value, bool):
+                keys.append(key)
+                values.append(value)
+
+        if len(keys) == 0:
+            return
+
+        # Reduce all values at once.
+        totals = torch.tensor([float(value) for value in values], dtype=torch.float64)
+        dist.all_reduce(totals)
+
+        for key, value, total in zip(keys, values, totals.tolist()):
+            if key not in summed_keys:
+                total /= dist.get_world_size()
+            if isinstance(value, numbers.Integral):
+                total = int(round(total))
+            self.statistics[key][-1] = total
+
+    def all_gather(self):
+        """
+        Gathers the values collected by all processes of the distributed training (in place): the list of \
+        every statistic is replaced by the concatenation of the lists of all processes (in the order of ranks), \
+        so the aggregation covers the batches of all processes.
+
+        .. note::
+
+            Must be called by all processes (collecting the same statistics), which (unlike \
+            :py:func:`all_reduce`) can collect different numbers of values, e.g. when validating on the \
+            shards of a set which are not padded to the same size.
+
+        """
+        # Serialize the collected values.
+        data = torch.tensor(list(pickle.dumps(self.statistics)), dtype=torch.uint8)
+
+        # Gather the sizes, then the data padded to the largest size.
+        size = torch.tensor([data.numel()], dtype=torch.int64)
+        sizes = [torch.zeros_like(size) for _ in range(dist.get_world_size())]
+        dist.all_gather(sizes, size)
+        max_size = max(int(s) for s in sizes)
+
+        padded = torch.zeros(max_size, dtype=torch.uint8)
+        padded[:data.numel()] = data
+        gathered = [torch.zeros_like(padded) for _ in sizes]
+        dist.all_gather(gathered, padded)
+
+        statistics = [pickle.loads(bytes(tensor[:int(s)].tolist())) for tensor, s in zip(gathered, sizes)]
+        for key in self.statistics.keys():
+            self.statistics[key] = [value for stats in statistics for value in stats.get(key, [])]
+
     def initialize_csv_file(self, log_dir, filename):
         """
         Method creates new csv file and initializes it with a header produced
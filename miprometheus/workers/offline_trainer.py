@@ -27,7 +27,7 @@ __author__ = "Vincent Marois, Tomasz Kornuta"
 import torch
 import numpy as np
 
-from miprometheus.workers.trainer import Trainer
+from miprometheus.workers.trainer import Trainer, launch_trainer
 
 
 class OfflineTrainer(Trainer):
@@ -204,6 +204,9 @@ class OfflineTrainer(Trainer):
                     # 2. Backward gradient flow.
                     loss.backward()
 
+                    # Average the gradients over the processes of the distributed training (if set).
+                    self.synchronize_gradients()
+
                     # Check the presence of the 'gradient_clipping'  parameter.
                     try:
                         # if present - clip gradients to a range (-gradient_clipping, gradient_clipping)
@@ -285,6 +288,9 @@ class OfflineTrainer(Trainer):
                 # Inform the problem class that the epoch has ended.
                 self.training_problem.finalize_epoch(epoch)
 
+                # Update the weights of the (weighted) sampler for the next epoch.
+                self.update_sampler_weights(epoch)
+
                 # Aggregate training statistics for the epoch.
                 self.aggregate_and_export_statistics(self.model, self.training_problem, 
                                                      self.training_stat_col, self.training_stat_agg,
@@ -305,7 +311,7 @@ class OfflineTrainer(Trainer):
                 self.validate_on_set(episode, epoch)
 
                 # Save the model using the average validation loss.
-                self.model.save(self.model_dir, training_status, self.training_stat_agg, self.validation_stat_agg)
+                self.save_model(training_status, self.training_stat_agg, self.validation_stat_agg)
 
                 # Terminal conditions.
                 # I - the loss is < threshold (only when curriculum learning is finished if set.)
@@ -318,7 +324,7 @@ class OfflineTrainer(Trainer):
                         training_status = "Converged (Full Validation Loss went below Loss Stop threshold)"
 
                         # ... and THEN try to save the model using the average validation loss.
-                        self.model.save(self.model_dir, training_status, self.training_stat_agg, self.validation_stat_agg)
+                        self.save_model(training_status, self.training_stat_agg, self.validation_stat_agg)
 
                         break
 
@@ -355,7 +361,7 @@ class OfflineTrainer(Trainer):
             # Try to save the model only if we hit the epoch limit.
             if epoch+1 >= self.epoch_limit:
                 # Try to save the model using the average validation loss.
-                self.model.save(self.model_dir, training_status, self.training_stat_agg, self.validation_stat_agg)
+                self.save_model(training_status, self.training_stat_agg, self.validation_stat_agg)
 
             self.logger.info('Experiment finished!')
 
@@ -369,6 +375,8 @@ class OfflineTrainer(Trainer):
             # Finalize statistics collection.
             self.finalize_statistics_collection()
             self.finalize_tensorboard()
+            # Wait until all checkpoints are written to disk.
+            self.model.checkpoint_manager.wait()
 
 
 def main():
@@ -376,11 +384,8 @@ def main():
     Entry point function for the ``OfflineTrainer``.
 
     """
-    trainer = OfflineTrainer()
-    # parse args, load configuration and create all required objects.
-    trainer.setup_experiment()
-    # GO!
-    trainer.run_experiment()
+    # Run the trainer - in several processes in the distributed training.
+    launch_trainer(OfflineTrainer)
 
 
 if __name__ == '__main__':
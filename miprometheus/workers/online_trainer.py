@@ -26,7 +26,7 @@ __author__ = "Vincent Marois, Tomasz Kornuta"
 import torch
 import numpy as np
 
-from miprometheus.workers.trainer import Trainer
+from miprometheus.workers.trainer import Trainer, launch_trainer
 
 
 class OnlineTrainer(Trainer):
@@ -189,6 +189,9 @@ class OnlineTrainer(Trainer):
                 # 2. Backward gradient flow.
                 loss.backward()
 
+                # Average the gradients over the processes of the distributed training (if set).
+                self.synchronize_gradients()
+
                 # Check the presence of the 'gradient_clipping'  parameter.
                 try:
                     # if present - clip gradients to a range (-gradient_clipping, gradient_clipping)
@@ -256,7 +259,7 @@ class OnlineTrainer(Trainer):
                     validation_loss = self.validate_on_batch(self.validation_batch, episode, epoch)
 
                     # Save the model using the latest validation statistics.
-                    self.model.save(self.model_dir, training_status, self.training_stat_col, self.validation_stat_col)
+                    self.save_model(training_status, self.training_stat_col, self.validation_stat_col)
 
                     # Terminal conditions.
                     # I. the loss is < threshold (only when curriculum learning is finished if set.)
@@ -270,7 +273,7 @@ class OnlineTrainer(Trainer):
                                 "Loss Stop threshold)"
 
                             # ... and THEN save the model using the latest validation statistics.
-                            self.model.save(self.model_dir, training_status, self.training_stat_col, self.validation_stat_col)
+                            self.save_model(training_status, self.training_stat_col, self.validation_stat_col)
                             break
 
                     # II. Early stopping is set and loss hasn't improved by delta in n epochs.
@@ -291,6 +294,9 @@ class OnlineTrainer(Trainer):
                     # Inform the problem class that the epoch has ended.
                     self.training_problem.finalize_epoch(epoch)
 
+                    # Update the weights of the (weighted) sampler for the next epoch.
+                    self.update_sampler_weights(epoch)
+
                     # Aggregate training statistics for the epoch.
                     self.aggregate_and_export_statistics(self.model, self.training_problem, 
                             self.training_stat_col, self.training_stat_agg, episode, '[Full Training]')
@@ -329,7 +335,7 @@ class OnlineTrainer(Trainer):
                 self.validate_on_batch(self.validation_batch, episode, epoch)
 
                 # Try to save the model using the latest validation statistics.
-                self.model.save(self.model_dir, training_status, self.training_stat_col, self.validation_stat_col)
+                self.save_model(training_status, self.training_stat_col, self.validation_stat_col)
 
             self.logger.info('\n' + '='*80)
             self.logger.info('Training finished because {}'.format(training_status))
@@ -356,6 +362,8 @@ class OnlineTrainer(Trainer):
             # Finalize statistics collection.
             self.finalize_statistics_collection()
             self.finalize_tensorboard()
+            # Wait until all checkpoints are written to disk.
+            self.model.checkpoint_manager.wait()
 
 
 def main():
@@ -363,11 +371,8 @@ def main():
     Entry point function for the ``OnlineTrainer``.
 
     """
-    trainer = OnlineTrainer()
-    # parse args, load configuration and create all required objects.
-    trainer.setup_experiment()
-    # GO!
-    trainer.run_experiment()
+    # Run the trainer - in several processes in the distributed training.
+    launch_trainer(OnlineTrainer)
 
 
 if __name__ == '__main__':
@@ -26,13 +26,18 @@ tester.py:
 __author__ = "Vincent Marois, Tomasz Kornuta, Younes Bouhadjar"
 
 import os
+import copy
+import time
 import torch
+import numpy as np
 from time import sleep
 from datetime import datetime
+from torch.utils.data import DataLoader
 
 from miprometheus.workers.worker import Worker
 from miprometheus.models.model_factory import ModelFactory
 from miprometheus.problems.problem_factory import ProblemFactory
+from miprometheus.utils.bucket_batch_sampler import BucketBatchSampler
 from miprometheus.utils.statistics_collector import StatisticsCollector
 from miprometheus.utils.statistics_aggregator import StatisticsAggregator
 
@@ -62,6 +67,27 @@ class Tester(Worker):
                                  dest='visualize',
                                  help='Activate dynamic visualization')
 
+        self.parser.add_argument('--inference',
+                                 action='store_true',
+                                 dest='inference',
+                                 help='Activate the throughput-oriented inference mode, configured by the '
+                                      '`inference` subsection of the `testing` section. (Default: False)')
+
+        # Problem and model - kept between the individual experiments (multiple tests).
+        self.problem = None
+        self.model = None
+
+        # Configuration of the problem and default values used for building the current problem and model.
+        self.problem_config = None
+        self.model_default_values = None
+
+        # Flag indicating whether the max number of episodes was computed from the size of the test set.
+        self.max_test_episodes_auto = False
+
+        # Throughput counters (inference mode): number of processed samples and total time of the test.
+        self.num_samples = 0
+        self.test_time = 0.0
+
     def setup_global_experiment(self):
         """
         Sets up the global test experiment for the ``Tester``:
@@ -150,6 +176,13 @@ class Tester(Worker):
 
             >>> self.dataloader = DataLoader(dataset=self.problem, ...)
 
+        .. note::
+
+            In the case of multiple tests, the problem built for the previous test is reused if its configuration \
+            did not change (ignoring the ``batch_size`` and ``max_test_episodes``, which only affect the \
+            DataLoader), and so is the model (with the weights already loaded from checkpoint) if the \
+            default values of the problem did not change.
+
         """
 
         # Get testing problem name.
@@ -192,19 +225,103 @@ class Tester(Worker):
 
         ################# TESTING PROBLEM ################# 
 
-        # Build test problem and dataloader.
-        self.problem, self.sampler, self.dataloader = \
-            self.build_problem_sampler_loader(self.params['testing'],'testing') 
+        # Build test problem - unless the one built for the previous test can be reused.
+        problem_rebuilt = (self.problem is None) or (self.get_problem_config() != self.problem_config)
+        if problem_rebuilt:
+            self.problem = ProblemFactory.build(self.params['testing']['problem'])
+            # Remember the configuration completed with the default values added by the problem.
+            self.problem_config = self.get_problem_config()
+        else:
+            self.logger.info("Reusing the problem built for the previous test")
+
+        # Settings of the inference mode.
+        self.params['testing'].add_default_params({'inference': {'auto_batch_size': False,
+                                                                 'max_batch_size': 4096,
+                                                                 'num_workers': 0}})
+        if self.flags.inference and self.params['testing']['inference']['num_workers'] > 0:
+            # Load the data in separate processes.
+            self.params['testing']['dataloader'].add_config_params(
+                {'num_workers': self.params['testing']['inference']['num_workers']})
 
+        # Build the sampler and dataloader.
+        self.sampler, self.dataloader = self.build_sampler_loader(self.problem, self.params['testing'], 'testing')
+        self.set_max_test_episodes()
+
+        ################# MODEL #################
+
+        # Rebuild the model only if the problem changed its default values.
+        if (self.model is None) or (problem_rebuilt and self.default_values_changed()):
+            # Create model object.
+            self.model = ModelFactory.build(self.params['model'], self.problem.default_values)
+            self.model_default_values = copy.deepcopy(self.problem.default_values)
+
+            # Load the pretrained model from checkpoint.
+            try: 
+                model_name = self.flags.model
+                # Load parameters from checkpoint.
+                self.model.load(model_name)
+            except KeyError:
+                self.logger.error("File {} indicated in the command line (--m) seems not to be a valid model checkpoint".format(model_name))
+                exit(-5)
+            except Exception as e:
+                self.logger.error(e)
+                # Exit by following the logic: if user wanted to load the model but failed, then continuing the experiment makes no sense.
+                exit(-6)
+
+            # Move the model to CUDA if applicable.
+            if self.app_state.use_CUDA:
+                self.model.cuda()
+
+            # Log the model summary.
+            self.logger.info(self.model.summarize())
+        else:
+            self.logger.info("Reusing the model loaded for the previous test")
+
+        # Turn on evaluation mode.
+        self.model.eval()
+
+        # Pick the batch size maximizing the throughput (optional, overrides the configured batch size).
+        if self.flags.inference and self.params['testing']['inference']['auto_batch_size']:
+            batch_size = self.probe_batch_size()
+            if batch_size != self.params['testing']['problem']['batch_size']:
+                self.params['testing']['problem'].add_config_params({'batch_size': batch_size})
+                # Rebuild the sampler and dataloader.
+                self.sampler, self.dataloader = self.build_sampler_loader(self.problem, self.params['testing'],
+                                                                          'testing')
+                self.set_max_test_episodes()
+
+        # Export and log configuration, optionally asking the user for confirmation.
+        self.export_experiment_configuration(self.log_dir, "testing_configuration.yaml",self.flags.confirm)
+
+    def get_problem_config(self):
+        """
+        Returns (a copy of) the configuration of the testing problem, without the parameters affecting \
+        only the DataLoader (``batch_size`` and ``max_test_episodes``).
+
+        :return: Configuration of the problem (``dict``).
+
+        """
+        problem_config = copy.deepcopy(self.params['testing']['problem'].to_dict())
+        problem_config.pop('batch_size', None)
+        problem_config.pop('max_test_episodes', None)
+
+        return problem_config
+
+    def set_max_test_episodes(self):
+        """
+        Sets the maximum number of test episodes, depending on the size of the test set and the batch size.
+
+        """
         # check if the maximum number of episodes is specified, if not put a
         # default equal to the size of the dataset (divided by the batch size)
         # So that by default, we loop over the test set once.
         max_test_episodes = len(self.dataloader)
 
-        self.params['testing']['problem'].add_default_params({'max_test_episodes': max_test_episodes})
-        if self.params["testing"]["problem"]["max_test_episodes"] == -1:
-            # Overwrite the config value!
+        self.params['testing']['problem'].add_default_params({'max_test_episodes': -1})
+        if self.params["testing"]["problem"]["max_test_episodes"] == -1 or self.max_test_episodes_auto:
+            # Overwrite the config value! (Recomputed in every test, as the batch size might have changed).
             self.params['testing']['problem'].add_config_params({'max_test_episodes': max_test_episodes})
+            self.max_test_episodes_auto = True
 
         # Warn if indicated number of episodes is larger than an epoch size:
         if self.params["testing"]["problem"]["max_test_episodes"] > max_test_episodes:
@@ -214,36 +331,152 @@ class Tester(Worker):
         self.logger.info("Setting the max number of episodes to: {}".format(
             self.params["testing"]["problem"]["max_test_episodes"]))
 
-        ################# MODEL #################
-
-        # Create model object.
-        self.model = ModelFactory.build(self.params['model'], self.problem.default_values)
+    def get_inference_context(self):
+        """
+        Returns the context manager disabling the gradient computation: ``torch.inference_mode()`` in \
+        the inference mode (if supported by the installed PyTorch version), ``torch.no_grad()`` otherwise.
 
-        # Load the pretrained model from checkpoint.
-        try: 
-            model_name = self.flags.model
-            # Load parameters from checkpoint.
-            self.model.load(model_name)
-        except KeyError:
-            self.logger.error("File {} indicated in the command line (--m) seems not to be a valid model checkpoint".format(model_name))
-            exit(-5)
-        except Exception as e:
-            self.logger.error(e)
-            # Exit by following the logic: if user wanted to load the model but failed, then continuing the experiment makes no sense.
-            exit(-6)
+        """
+        if self.flags.inference and hasattr(torch, 'inference_mode'):
+            return torch.inference_mode()
+        return torch.no_grad()
 
-        # Turn on evaluation mode.
-        self.model.eval()
+    def synchronize(self):
+        """
+        Waits for the computations on GPU to finish (if CUDA is used), so the measured times are exact.
 
-        # Move the model to CUDA if applicable.
+        """
         if self.app_state.use_CUDA:
-            self.model.cuda()
+            torch.cuda.synchronize()
 
-        # Log the model summary.
-        self.logger.info(self.model.summarize())
+    @staticmethod
+    def get_batch_size(data_dict):
+        """
+        Returns the number of samples in a batch, i.e. the first dimension of its first tensor.
 
-        # Export and log configuration, optionally asking the user for confirmation.
-        self.export_experiment_configuration(self.log_dir, "testing_configuration.yaml",self.flags.confirm)
+        :param data_dict: Batch of data.
+        :type data_dict: ``DataDict``
+
+        :return: Number of samples (0 if the batch does not contain any tensor).
+
+        """
+        for value in data_dict.values():
+            if isinstance(value, torch.Tensor):
+                return value.size(0)
+        return 0
+
+    def probe_batch_size(self):
+        """
+        Looks for the batch size maximizing the throughput of the model.
+
+        Starting from the configured batch size, doubles it as long as the throughput (samples/s) of the model \
+        improves by at least 5%, the model does not run out of memory and the size is below the \
+        `max_batch_size` limit (and the size of the test set).
+
+        :return: Selected batch size.
+
+        """
+        batch_size = self.params['testing']['problem']['batch_size']
+        max_batch_size = min(self.params['testing']['inference']['max_batch_size'], len(self.problem))
+
+        best_batch_size = batch_size
+        best_throughput = 0
+
+        with self.get_inference_context():
+            while batch_size <= max_batch_size:
+                try:
+                    # Get a batch of the probed size.
+                    loader = DataLoader(dataset=self.problem, batch_size=batch_size,
+                                        collate_fn=self.problem.collate_fn)
+                    data_dict = self.problem.prepare_batch(next(iter(loader)))
+                    if self.app_state.use_CUDA:
+                        data_dict = data_dict.cuda()
+
+                    # Warm up, then measure.
+                    self.model(data_dict)
+                    self.synchronize()
+                    start = time.perf_counter()
+                    self.model(data_dict)
+                    self.synchronize()
+                    throughput = batch_size / (time.perf_counter() - start)
+
+                except RuntimeError as e:
+                    # Most probably out of memory.
+                    self.logger.info("Probing batch size {} failed: {}".format(batch_size, e))
+                    if self.app_state.use_CUDA:
+                        torch.cuda.empty_cache()
+                    break
+
+                self.logger.info("Probed batch size {}: {:.1f} samples/s".format(batch_size, throughput))
+                if throughput < 1.05 * best_throughput:
+                    break
+
+                best_batch_size = batch_size
+                best_throughput = throughput
+                batch_size *= 2
+
+        self.logger.info("Selected batch size: {}".format(best_batch_size))
+        return best_batch_size
+
+    def add_statistics(self, stat_col):
+        """
+        Calls base method and adds the batch latency to ``StatisticsCollector`` (inference mode only).
+
+        :param stat_col: ``StatisticsCollector``.
+
+        """
+        super(Tester, self).add_statistics(stat_col)
+
+        if self.flags.inference:
+            # Time (in ms) of processing a batch: forward pass, loss and statistics.
+            stat_col.add_statistic('batch_latency', '{:.3f}')
+
+    def add_aggregators(self, stat_agg):
+        """
+        Calls base method and adds the throughput and latency aggregators to ``StatisticsAggregator`` \
+        (inference mode only).
+
+        :param stat_agg: ``StatisticsAggregator``.
+
+        """
+        super(Tester, self).add_aggregators(stat_agg)
+
+        if self.flags.inference:
+            stat_agg.add_aggregator('samples_per_second', '{:.1f}')
+            stat_agg.add_aggregator('batch_latency_p50', '{:.3f}')
+            stat_agg.add_aggregator('batch_latency_p99', '{:.3f}')
+
+    def aggregate_statistics(self, stat_col, stat_agg):
+        """
+        Calls base method and aggregates the throughput and latency (inference mode only).
+
+        :param stat_col: ``StatisticsCollector``
+
+        :param stat_agg: ``StatisticsAggregator``
+
+        """
+        super(Tester, self).aggregate_statistics(stat_col, stat_agg)
+
+        if self.flags.inference:
+            # Throughput takes into account the whole loop, including data loading.
+            stat_agg['samples_per_second'] = self.num_samples / max(self.test_time, 1e-9)
+            # No latency was measured if no batch was processed (the aggregators keep their default values).
+            if len(stat_col['batch_latency']) > 0:
+                stat_agg['batch_latency_p50'] = float(np.percentile(stat_col['batch_latency'], 50))
+                stat_agg['batch_latency_p99'] = float(np.percentile(stat_col['batch_latency'], 99))
+
+    def default_values_changed(self):
+        """
+        Checks whether the default values of the current problem differ from the ones used to build the model.
+
+        :return: True if the default values changed (or cannot be compared), else False.
+
+        """
+        try:
+            return bool(self.problem.default_values != self.model_default_values)
+        except Exception:
+            # E.g. values that cannot be compared (arrays) - play it safe.
+            return True
 
     def initialize_statistics_collection(self):
         """
@@ -287,6 +520,11 @@ class Tester(Worker):
             - Logs statistics & accumulates loss,
             - Activate visualization if set.
 
+        .. note::
+
+            In the inference mode (`--inference`), the statistics are not exported to the csv file in every \
+            episode, only the aggregated statistics (extended by the throughput and batch latency) are exported.
+
 
         """
         # Initialize tensorboard and statistics collection.
@@ -296,7 +534,9 @@ class Tester(Worker):
         self.app_state.visualize = self.flags.visualize
 
         # Get number of samples - depending whether using sampler or not.
-        if self.params['testing']['dataloader']['drop_last']:
+        if isinstance(self.sampler, BucketBatchSampler):
+            num_samples = self.sampler.num_samples
+        elif self.params['testing']['dataloader']['drop_last']:
             # if we are supposed to drop the last (incomplete) batch.
             num_samples = len(self.dataloader) * \
                 self.params['testing']['problem']['batch_size']
@@ -308,22 +548,33 @@ class Tester(Worker):
         self.logger.info('Testing over the entire test set ({} samples in {} episodes)'.format(
             num_samples, len(self.dataloader)))
 
+        # Reset the throughput counters.
+        self.num_samples = 0
+        self.test_time = 0.0
+
         try:
             # Run test
-            with torch.no_grad():
+            with self.get_inference_context():
 
                 episode = 0
+                start_time = time.perf_counter()
                 for test_dict in self.dataloader:
 
                     if episode == self.params["testing"]["problem"]["max_test_episodes"]:
                         break
 
                     # Evaluate model on a given batch.
+                    batch_start = time.perf_counter()
                     logits, _ = self.predict_evaluate_collect(self.model, self.problem, 
                                                               test_dict, self.testing_stat_col, episode)
 
-                    # Export to csv - at every step.
-                    self.testing_stat_col.export_to_csv()
+                    if self.flags.inference:
+                        self.synchronize()
+                        self.testing_stat_col['batch_latency'] = 1000 * (time.perf_counter() - batch_start)
+                        self.num_samples += self.get_batch_size(test_dict)
+                    else:
+                        # Export to csv - at every step.
+                        self.testing_stat_col.export_to_csv()
 
                     # Log to logger - at logging frequency.
                     if episode % self.flags.logging_interval == 0:
@@ -340,6 +591,8 @@ class Tester(Worker):
                     # move to next episode.
                     episode += 1
 
+                self.test_time = time.perf_counter() - start_time
+
                 self.logger.info('\n' + '='*80)
                 self.logger.info('Test finished')
 
@@ -454,12 +707,19 @@ class Tester(Worker):
         new_params = {k: v[test_index] for k, v in self.multi_tests_params.items()}
         self.logger.warning("Updating the testing config with: {}".format(new_params))
 
+        changed_params = {}
         for leaf_key, new_value in new_params.items():
+            # Compare with the current value of the leaf.
+            if self.params['testing'].get_leaf(leaf_key) != new_value:
+                changed_params[leaf_key] = new_value
             self.params['testing'].set_leaf(leaf_key, new_value)
 
-        self.logger.warning("Updated the testing configuration.")
+        # An indicated number of episodes is no longer computed from the size of the test set.
+        if 'max_test_episodes' in new_params:
+            self.max_test_episodes_auto = False
+
+        self.logger.warning("Updated the testing configuration, changed values: {}".format(changed_params))
         self.logger.info('\n' + '=' * 80 + '\n')
-        return True
 
 
 def main():
@@ -27,13 +27,24 @@ __author__ = "Vincent Marois, Tomasz Kornuta"
 import os
 import yaml
 import torch
+import logging
+import numpy as np
+import torch.distributed as dist
+import torch.multiprocessing as mp
 from time import sleep
 from random import randrange
 from datetime import datetime
 
+from torch.utils.data import DataLoader
+from torch.utils.data.sampler import BatchSampler, SequentialSampler
+
 from miprometheus.workers.worker import Worker
 from miprometheus.models.model_factory import ModelFactory
+from miprometheus.models.sequential_model import SequentialModel
 
+from miprometheus.utils.alias_weighted_sampler import AliasWeightedSampler
+from miprometheus.utils.batch_cache import BatchCache
+from miprometheus.utils.distributed_shard_sampler import DistributedShardSampler
 from miprometheus.utils.statistics_collector import StatisticsCollector
 from miprometheus.utils.statistics_aggregator import StatisticsAggregator
 
@@ -46,6 +57,11 @@ class Trainer(Worker):
 
     All other types of trainers (e.g. ``OnlineTrainer`` & ``OfflineTrainer``) should subclass it.
 
+    .. note::
+
+        The trainers support the distributed data-parallel training on several processes (and nodes), \
+        see :py:func:`initialize_distributed` and :py:func:`launch_trainer`.
+
     """
 
     def __init__(self, name="Trainer"):
@@ -85,12 +101,56 @@ class Trainer(Worker):
                                       "2: Only during validation episodes.\n"
                                       "3: Only during the last validation, after the training is completed.\n")
 
+        # Arguments of the distributed data-parallel training.
+        self.parser.add_argument('--nprocs',
+                                 dest='nprocs',
+                                 default=1,
+                                 type=int,
+                                 help='Number of training processes launched on this node. If the total number of '
+                                      'processes (on all nodes) is greater than 1, the training is distributed '
+                                      '(data-parallel, using the gloo backend). (DEFAULT: 1)')
+
+        self.parser.add_argument('--nnodes',
+                                 dest='nnodes',
+                                 default=1,
+                                 type=int,
+                                 help='Number of nodes of the distributed training, each launching --nprocs '
+                                      'processes. (DEFAULT: 1)')
+
+        self.parser.add_argument('--node_rank',
+                                 dest='node_rank',
+                                 default=0,
+                                 type=int,
+                                 help='Rank of this node in [0, nnodes-1]. The node 0 hosts the processes writing the '
+                                      'logs, statistics and checkpoints. (DEFAULT: 0)')
+
+        self.parser.add_argument('--master_addr',
+                                 dest='master_addr',
+                                 default='127.0.0.1',
+                                 type=str,
+                                 help='Address of the node 0, used to initialize the distributed training. '
+                                      '(DEFAULT: 127.0.0.1)')
+
+        self.parser.add_argument('--master_port',
+                                 dest='master_port',
+                                 default=29500,
+                                 type=int,
+                                 help='Free port of the node 0, used to initialize the distributed training. '
+                                      '(DEFAULT: 29500)')
+
+        # Index of the process on this node (set by the launcher, see launch_trainer()).
+        self.local_rank = 0
+
     def setup_experiment(self):
         """
         Sets up experiment of all trainers:
 
             - Calls base class setup_experiment to parse the command line arguments,
 
+            - Initializes the distributed training (if set):
+
+                >>> self.initialize_distributed()
+
             - Loads the config file(s):
 
                 >>> configs_to_load = self.recurrent_config_parse(flags.config, [])
@@ -124,6 +184,7 @@ class Trainer(Worker):
             - Handles the validation of the model:
 
                 - Creates validation problem & DataLoader
+                - Creates the cache of validation batches (optional)
 
             - Set optimizer:
 
@@ -146,6 +207,9 @@ class Trainer(Worker):
         if self.flags.use_gpu and (torch.cuda.device_count() == 0):
             self.logger.error("Cannot use GPU as there are no CUDA-compatible devices present in the system!")
             exit(-2)
+
+        # Initialize the process group of the distributed training (if set).
+        self.initialize_distributed()
             
         # Get the list of configurations which need to be loaded.
         configs_to_load = self.recurrent_config_parse(self.flags.config, [])
@@ -182,8 +246,9 @@ class Trainer(Worker):
             print("Error: Couldn't retrieve the model name from the loaded configuration")
             exit(-1)
 
-        # Prepare the output path for logging
-        while True:  # Dirty fix: if log_dir already exists, wait for 1 second and try again
+        # Prepare the output path for logging (in the first process of the distributed training).
+        self.log_dir = None
+        while self.rank == 0:  # Dirty fix: if log_dir already exists, wait for 1 second and try again
             try:
                 time_str = '{0:%Y%m%d_%H%M%S}'.format(datetime.now())
                 if self.flags.savetag != '':
@@ -195,13 +260,22 @@ class Trainer(Worker):
             else:
                 break
 
-        # Set log dir and add the handler for the logfile to the logger.
-        self.log_file = self.log_dir + 'trainer.log'
+        if self.world_size > 1:
+            # Share the output path with the other processes.
+            self.log_dir = self.broadcast_string(self.log_dir)
+
+        # Set log dir and add the handler for the logfile (one per process) to the logger.
+        self.log_file = self.log_dir + ('trainer.log' if self.rank == 0 else 'trainer_rank_{}.log'.format(self.rank))
         self.add_file_handler_to_logger(self.log_file)
 
         # Models dir.
         self.model_dir = self.log_dir + 'models/'
-        os.makedirs(self.model_dir, exist_ok=False)
+        if self.rank == 0:
+            os.makedirs(self.model_dir, exist_ok=False)
+
+        # Use the same random seeds in all processes (the same problems, initial model & sample draws).
+        if self.world_size > 1:
+            self.broadcast_random_seeds(self.params['training'])
 
         # Set random seeds in the training section.
         self.set_random_seeds(self.params['training'], 'training')
@@ -247,6 +321,28 @@ class Trainer(Worker):
         #print(self.validation_batch['sequences'].shape )
         #exit(1)
 
+        # Cache of the validation batches, reused in every validation on the full set (optional).
+        self.params['validation'].add_default_params({'cache': {'enabled': False,
+                                                                'max_size_mb': 1024,
+                                                                'use_device': True}})
+        if self.params['validation']['cache']['enabled']:
+            self.validation_cache = BatchCache(self.params['validation']['cache']['max_size_mb'],
+                                               self.params['validation']['cache']['use_device'])
+
+            # Fix the composition of the validation batches.
+            if getattr(self.validations_sampler, 'batch_sampling', False):
+                self.validation_batch_indices = list(self.validations_sampler)
+            else:
+                sampler = self.validations_sampler if self.validations_sampler is not None \
+                    else SequentialSampler(self.validation_problem)
+                self.validation_batch_indices = list(BatchSampler(sampler,
+                                                                  self.params['validation']['problem']['batch_size'],
+                                                                  self.params['validation']['dataloader']['drop_last']))
+            self.logger.info("Cache of validation batches activated (memory budget: {} MB)".format(
+                self.params['validation']['cache']['max_size_mb']))
+        else:
+            self.validation_cache = None
+
         ################# MODEL PROBLEM ################# 
         
         # Build the model using the loaded configuration and the default values of the problem.
@@ -282,6 +378,21 @@ class Trainer(Worker):
         if self.app_state.use_CUDA:
             self.model.cuda()
 
+        if self.world_size > 1:
+            # Start all replicas of the model from the state of the first process.
+            self.broadcast_model_state()
+
+            # Decorrelate the random streams of the processes (e.g. the samples generated on the fly).
+            np.random.seed((self.params['training']['seed_numpy'] + self.rank) % 2**32)
+            torch.manual_seed((self.params['training']['seed_torch'] + self.rank) % 2**32)
+
+        # Set truncated BPTT and activation checkpointing of sequential models (both disabled by default).
+        if isinstance(self.model, SequentialModel):
+            self.params['training'].add_default_params({'bptt': {'truncation_window': 0,
+                                                                 'checkpoint_chunk_size': 0}})
+            self.model.set_bptt(self.params['training']['bptt']['truncation_window'],
+                                self.params['training']['bptt']['checkpoint_chunk_size'])
+
         # Log the model summary.
         self.logger.info(self.model.summarize())
 
@@ -297,6 +408,228 @@ class Trainer(Worker):
                                                                      self.model.parameters()),
                                                               **optimizer_conf)
 
+    def initialize_distributed(self):
+        """
+        Initializes the distributed data-parallel training, if the number of processes \
+        (``--nnodes`` x ``--nprocs``) is greater than 1:
+
+            - Joins the process group (``torch.distributed`` with the gloo backend), with the rank \
+            ``node_rank * nprocs + local_rank``,
+            - Limits the number of threads of the process to its share of the cores of the node,
+            - Disables the visualization & limits the logging to warnings in all processes but the first one.
+
+        Every process trains a replica of the model on its shard of the training set \
+        (see :py:class:`miprometheus.utils.DistributedShardSampler`) and the gradients are averaged over \
+        the processes before every optimization step (see :py:func:`synchronize_gradients`).
+
+        """
+        self.world_size = self.flags.nnodes * self.flags.nprocs
+        self.rank = self.flags.node_rank * self.flags.nprocs + self.local_rank
+
+        if self.world_size == 1:
+            return
+
+        if not dist.is_available():
+            self.logger.error("Cannot run the distributed training as torch.distributed is not available!")
+            exit(-3)
+
+        dist.init_process_group(backend='gloo',
+                                init_method='tcp://{}:{}'.format(self.flags.master_addr, self.flags.master_port),
+                                world_size=self.world_size,
+                                rank=self.rank)
+
+        # Share the cores of the node between its processes.
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.flags.nprocs))
+
+        if self.rank > 0:
+            self.flags.visualize = -1
+            self.logger.setLevel(logging.WARNING)
+
+        self.logger.info("Distributed training initialized: {} processes on {} node(s)".format(
+            self.world_size, self.flags.nnodes))
+
+    def finalize_distributed(self):
+        """
+        Leaves the process group of the distributed training (if initialized).
+
+        """
+        if self.world_size > 1 and dist.is_initialized():
+            dist.destroy_process_group()
+
+    def broadcast_string(self, string, max_length=4096):
+        """
+        Broadcasts a string from the first process to all processes of the distributed training.
+
+        :param string: String to broadcast (ignored in the other processes).
+        :type string: str
+
+        :param max_length: Maximal length of the encoded string (DEFAULT: 4096).
+        :type max_length: int
+
+        :return: The string of the first process.
+
+        """
+        data = torch.zeros(max_length, dtype=torch.uint8)
+        if self.rank == 0:
+            encoded = list(string.encode('utf-8'))
+            data[:len(encoded)] = torch.tensor(encoded, dtype=torch.uint8)
+
+        dist.broadcast(data, 0)
+
+        return bytes(data.tolist()).rstrip(b'\0').decode('utf-8')
+
+    def broadcast_random_seeds(self, params):
+        """
+        Sets the random seeds of the first process of the distributed training (drawn if not indicated) \
+        in the parameters of all processes, before :py:func:`set_random_seeds`.
+
+        :param params: Section of the configuration containing the seeds ("training").
+
+        """
+        params.add_default_params({'seed_numpy': -1, 'seed_torch': -1})
+        seeds = [params['seed_numpy'], params['seed_torch']]
+        if self.rank == 0:
+            seeds = [randrange(0, 2 ** 32) if seed == -1 else seed for seed in seeds]
+
+        seeds = torch.tensor(seeds, dtype=torch.int64)
+        dist.broadcast(seeds, 0)
+
+        params.add_config_params({'seed_numpy': int(seeds[0]), 'seed_torch': int(seeds[1])})
+
+    def broadcast_model_state(self, buffers_only=False):
+        """
+        Broadcasts the parameters and buffers (e.g. the running statistics of the batch normalization) \
+        of the model from the first process to all processes of the distributed training.
+
+        :param buffers_only: Broadcast the buffers only (DEFAULT: False).
+        :type buffers_only: bool
+
+        """
+        tensors = list(self.model.buffers())
+        if not buffers_only:
+            tensors = list(self.model.parameters()) + tensors
+
+        for tensor in tensors:
+            dist.broadcast(tensor.data, 0)
+
+    def synchronize_gradients(self):
+        """
+        Averages the gradients of the model over all processes of the distributed training, so all replicas \
+        perform the same optimization step (what ``torch.nn.parallel.DistributedDataParallel`` does).
+
+        The gradients are flattened and reduced with a single all-reduce. The parameters which did not get \
+        gradients in a process (e.g. unused in its batch) contribute zeros.
+
+        .. note::
+
+            Does nothing if the training is not distributed. Must be called after ``loss.backward()`` and \
+            before the gradient clipping & optimization step.
+
+        """
+        if self.world_size == 1:
+            return
+
+        params = [p for p in self.model.parameters() if p.requires_grad]
+        grads = torch.cat([(p.grad.data if p.grad is not None else torch.zeros_like(p.data)).contiguous().view(-1)
+                           for p in params])
+
+        dist.all_reduce(grads)
+        grads.div_(self.world_size)
+
+        offset = 0
+        for p in params:
+            grad = grads[offset:offset + p.numel()].view_as(p.data)
+            offset += p.numel()
+            if p.grad is None:
+                p.grad = grad.clone()
+            else:
+                p.grad.data.copy_(grad)
+
+    def predict_evaluate_collect(self, model, problem, data_dict, stat_col, episode, epoch=None):
+        """
+        Calls the base method, then (in the distributed training) reduces the collected statistics over all \
+        processes (see :py:func:`miprometheus.utils.StatisticsCollector.all_reduce`), so the exported and \
+        aggregated statistics concern the batches of all processes.
+
+        :param model: trainable model.
+        :type model: ``models.model.Model`` or a subclass
+
+        :param problem: problem generating samples.
+        :type problem: ``problems.problem.problem`` or a subclass
+
+        :param data_dict: contains the batch of samples to pass to the model.
+        :type data_dict: ``DataDict``
+
+        :param stat_col: statistics collector used for logging accuracy etc.
+        :type stat_col: ``StatisticsCollector``
+
+        :param episode: current episode index
+        :type episode: int
+
+        :param epoch: current epoch index.
+        :type epoch: int, optional
+
+        :return: logits, loss (of the batch of the current process).
+
+        """
+        logits, loss = super(Trainer, self).predict_evaluate_collect(model, problem, data_dict, stat_col,
+                                                                     episode, epoch)
+
+        if self.world_size > 1:
+            stat_col.all_reduce()
+
+        return logits, loss
+
+    def export_experiment_configuration(self, log_dir, filename, user_confirm):
+        """
+        Calls the base method in the first process of the distributed training only (the other ones wait \
+        for the optional confirmation in their first collective operation).
+
+        .. note::
+
+            The processes spawned by :py:func:`launch_trainer` (``--nprocs`` > 1) have no standard input, \
+            hence the confirmation is skipped (with a warning).
+
+        :param log_dir: Directory used to host log files (such as the collected statistics).
+        :type log_dir: str
+
+        :param filename: Name of the ``yaml`` file to write to.
+        :type filename: str
+
+        :param user_confirm: Whether to request user confirmation.
+        :type user_confirm: bool
+
+        """
+        if self.rank > 0:
+            return
+
+        if user_confirm and self.flags.nprocs > 1:
+            self.logger.warning("Cannot request the user confirmation (--agree) in the spawned processes of the "
+                                "distributed training, starting the experiment")
+            user_confirm = False
+
+        super(Trainer, self).export_experiment_configuration(log_dir, filename, user_confirm)
+
+    def save_model(self, training_status, training_stats, validation_stats):
+        """
+        Saves the model (see :py:func:`miprometheus.models.Model.save`) - in the first process of the \
+        distributed training only, as all replicas of the model are identical.
+
+        :param training_status: String representing the current status of training.
+        :type training_status: str
+
+        :param training_stats: Training statistics that will be saved to checkpoint along with the model.
+
+        :param validation_stats: Validation statistics that will be saved to checkpoint along with the model.
+
+        :return: True if this is currently the best model (always False in the other processes).
+
+        """
+        if self.rank > 0:
+            return False
+
+        return self.model.save(self.model_dir, training_status, training_stats, validation_stats)
+
     def add_statistics(self, stat_col):
         """
         Calls base method and adds epoch statistics to ``StatisticsCollector``.
@@ -330,7 +663,7 @@ class Trainer(Worker):
             - For training statistics (adds the statistics of the model & problem),
             - For validation statistics (adds the statistics of the model & problem).
 
-        - Creates the output files (csv).
+        - Creates the output files (csv) - in the first process of the distributed training only.
 
         """
         # TRAINING.
@@ -339,31 +672,37 @@ class Trainer(Worker):
         self.add_statistics(self.training_stat_col)
         self.training_problem.add_statistics(self.training_stat_col)
         self.model.add_statistics(self.training_stat_col)
-        # Create the csv file to store the training statistics.
-        self.training_batch_stats_file = self.training_stat_col.initialize_csv_file(self.log_dir, 'training_statistics.csv')
-
         # Create statistics aggregator for training.
         self.training_stat_agg = StatisticsAggregator()
         self.add_aggregators(self.training_stat_agg)
         self.training_problem.add_aggregators(self.training_stat_agg)
         self.model.add_aggregators(self.training_stat_agg)
-        # Create the csv file to store the training statistic aggregations.
-        self.training_set_stats_file = self.training_stat_agg.initialize_csv_file(self.log_dir, 'training_set_agg_statistics.csv')
-
         # VALIDATION.
         # Create statistics collector for validation.
         self.validation_stat_col = StatisticsCollector()
         self.add_statistics(self.validation_stat_col)
         self.validation_problem.add_statistics(self.validation_stat_col)
         self.model.add_statistics(self.validation_stat_col)
-        # Create the csv file to store the validation statistics.
-        self.validation_batch_stats_file = self.validation_stat_col.initialize_csv_file(self.log_dir, 'validation_statistics.csv')
-
         # Create statistics aggregator for validation.
         self.validation_stat_agg = StatisticsAggregator()
         self.add_aggregators(self.validation_stat_agg)
         self.validation_problem.add_aggregators(self.validation_stat_agg)
         self.model.add_aggregators(self.validation_stat_agg)
+
+        if self.rank > 0:
+            # The other processes of the distributed training do not export the statistics.
+            self.training_batch_stats_file = None
+            self.training_set_stats_file = None
+            self.validation_batch_stats_file = None
+            self.validation_set_stats_file = None
+            return
+
+        # Create the csv file to store the training statistics.
+        self.training_batch_stats_file = self.training_stat_col.initialize_csv_file(self.log_dir, 'training_statistics.csv')
+        # Create the csv file to store the training statistic aggregations.
+        self.training_set_stats_file = self.training_stat_agg.initialize_csv_file(self.log_dir, 'training_set_agg_statistics.csv')
+        # Create the csv file to store the validation statistics.
+        self.validation_batch_stats_file = self.validation_stat_col.initialize_csv_file(self.log_dir, 'validation_statistics.csv')
         # Create the csv file to store the validation statistic aggregations.
         self.validation_set_stats_file = self.validation_stat_agg.initialize_csv_file(self.log_dir, 'validation_set_agg_statistics.csv')
 
@@ -373,18 +712,18 @@ class Trainer(Worker):
 
         """
         # Close all files.
-        self.training_batch_stats_file.close()
-        self.training_set_stats_file.close()
-        self.validation_batch_stats_file.close()
-        self.validation_set_stats_file.close()
+        for csv_file in [self.training_batch_stats_file, self.training_set_stats_file,
+                         self.validation_batch_stats_file, self.validation_set_stats_file]:
+            if csv_file is not None:
+                csv_file.close()
 
     def initialize_tensorboard(self):
         """
         Initializes the TensorBoard writers, and log directories.
 
         """
-        # Create TensorBoard outputs - if TensorBoard is supposed to be used.
-        if self.flags.tensorboard is not None:
+        # Create TensorBoard outputs - if TensorBoard is supposed to be used (in the first process only).
+        if self.flags.tensorboard is not None and self.rank == 0:
             from tensorboardX import SummaryWriter
             self.training_batch_writer = SummaryWriter(self.log_dir + '/training')
             self.training_stat_col.initialize_tensorboard(self.training_batch_writer)
@@ -417,6 +756,39 @@ class Trainer(Worker):
         if self.validation_set_writer is not None:
             self.validation_set_writer.close()
 
+    def update_sampler_weights(self, epoch):
+        """
+        Updates the weights of the training (weighted) sampler with the ones returned by the training problem \
+        (see :py:func:`miprometheus.problems.Problem.get_sample_weights`), if its 'update_weights' is set.
+
+        Called at the end of an epoch, the new weights are used in the next one.
+
+        :param epoch: Index of the epoch which has just ended.
+        :type epoch: int
+
+        """
+        sampler = self.training_sampler
+        if isinstance(sampler, DistributedShardSampler):
+            sampler = sampler.sampler
+
+        if not isinstance(sampler, AliasWeightedSampler) or \
+                not self.params['training']['sampler']['update_weights']:
+            return
+
+        weights = self.training_problem.get_sample_weights()
+        if weights is None:
+            self.logger.warning('Problem did not return the sample weights, keeping the previous ones.')
+            return
+
+        if self.world_size > 1:
+            # Average the weights of all processes (e.g. computed from the statistics of their shards).
+            weights = torch.from_numpy(np.asarray(weights, dtype=np.float64).copy())
+            dist.all_reduce(weights)
+            weights = (weights / self.world_size).numpy()
+
+        sampler.set_weights(weights)
+        self.logger.info('Updated the weights of the training sampler after epoch {}'.format(epoch))
+
     def validate_on_batch(self, valid_batch, episode, epoch):
         """
         Performs a validation of the model using the provided batch.
@@ -432,7 +804,8 @@ class Trainer(Worker):
         :param epoch: current epoch index.
         :type epoch: int, optional
 
-        :return: Validation loss.
+        :return: Validation loss (averaged over all processes of the distributed training, so all of them \
+        take the same decisions, e.g. whether the training has converged).
 
         """
         # Turn on evaluation mode.
@@ -440,11 +813,15 @@ class Trainer(Worker):
         # Empty the statistics collector.
         self.validation_stat_col.empty()
 
+        # Validate the same model in all processes of the distributed training.
+        if self.world_size > 1:
+            self.broadcast_model_state(buffers_only=True)
+
         # Compute the validation loss using the provided data batch.
         with torch.no_grad():
-            valid_logits, valid_loss = self.predict_evaluate_collect(self.model, self.validation_problem,
-                                                                     valid_batch, self.validation_stat_col,
-                                                                     episode, epoch)
+            valid_logits, _ = self.predict_evaluate_collect(self.model, self.validation_problem,
+                                                            valid_batch, self.validation_stat_col,
+                                                            episode, epoch)
 
         # Export  collected statistics.
         self.export_statistics(self.validation_stat_col, '[Partial Validation]')
@@ -457,7 +834,43 @@ class Trainer(Worker):
             # Show plot, if user will press Stop then a SystemExit exception will be thrown.
             self.model.plot(valid_batch, valid_logits)
 
-        return valid_loss
+        # The collected (all-reduced) loss.
+        return self.validation_stat_col['loss'][-1]
+
+    def get_cached_validation_batches(self):
+        """
+        Generator returning all validation batches, using the cache of validation batches.
+
+        The cached batches are returned first, then the missing ones are loaded (in a single pass of \
+        a DataLoader restricted to those batches) and added to the cache.
+
+        .. note::
+
+            Returning the cached batches first ensures that none of them will be evicted by the newly loaded \
+            ones before being used.
+
+        """
+        num_batches = len(self.validation_batch_indices)
+
+        # Keys of cached and missing batches.
+        cached = [i for i in range(num_batches) if i in self.validation_cache]
+        missing = [i for i in range(num_batches) if i not in self.validation_cache]
+
+        for i in cached:
+            yield self.validation_cache.get(i)
+
+        if len(missing) > 0:
+            # Build the DataLoader for the missing batches only.
+            loader = DataLoader(dataset=self.validation_problem,
+                                batch_sampler=[self.validation_batch_indices[i] for i in missing],
+                                num_workers=self.params['validation']['dataloader']['num_workers'],
+                                collate_fn=self.validation_problem.collate_fn,
+                                pin_memory=self.params['validation']['dataloader']['pin_memory'],
+                                timeout=self.params['validation']['dataloader']['timeout'],
+                                worker_init_fn=self.validation_problem.worker_init_fn)
+
+            for i, batch in zip(missing, loader):
+                yield self.validation_cache.put(i, batch)
 
     def validate_on_set(self, episode, epoch=None):
         """
@@ -468,6 +881,15 @@ class Trainer(Worker):
 
         If visualization is activated, this function will select a random batch to visualize.
 
+        If the cache of validation batches is activated (`cache` subsection of the `validation` section), \
+        the batches loaded in the first pass are reused in the next ones.
+
+        .. note::
+
+            In the distributed training, every process validates its (not padded) shard of the set, \
+            so the processes may process different numbers of batches. The statistics are hence not \
+            reduced per batch, but gathered from all processes before the aggregation.
+
         :param episode: current training episode index.
         :type episode: int
 
@@ -478,7 +900,9 @@ class Trainer(Worker):
 
         """
         # Get number of samples - depending whether using sampler or not.
-        if self.params['validation']['dataloader']['drop_last']:
+        if getattr(self.validations_sampler, 'batch_sampling', False):
+            num_samples = self.validations_sampler.num_samples
+        elif self.params['validation']['dataloader']['drop_last']:
             # if we are supposed to drop the last (incomplete) batch.
             num_samples = len(self.validation_dataloader) * \
                 self.params['validation']['problem']['batch_size']
@@ -499,21 +923,41 @@ class Trainer(Worker):
         # Reset the statistics.
         self.validation_stat_col.empty()
 
+        # Validate the same model in all processes of the distributed training.
+        if self.world_size > 1:
+            self.broadcast_model_state(buffers_only=True)
+
+        # Get the validation batches - from the cache if activated.
+        if self.validation_cache is not None:
+            valid_batches = self.get_cached_validation_batches()
+        else:
+            valid_batches = self.validation_dataloader
+
         with torch.no_grad():
-            for ep, valid_batch in enumerate(self.validation_dataloader):
-                # 1. Perform forward step, get predictions and compute loss.
-                valid_logits, _ = self.predict_evaluate_collect(self.model, self.validation_problem, valid_batch,
-                                                                self.validation_stat_col, ep, epoch)
+            for ep, valid_batch in enumerate(valid_batches):
+                # 1. Perform forward step, get predictions and compute loss (without reducing the statistics).
+                valid_logits, _ = super(Trainer, self).predict_evaluate_collect(
+                    self.model, self.validation_problem, valid_batch, self.validation_stat_col, ep, epoch)
 
                 # 2.Visualization of validation for the randomly selected batch
                 if self.app_state.visualize and ep == vis_index:
 
+                    # Work on a (shallow) copy, so the preprocessing won't affect the cached batch.
+                    valid_batch = valid_batch.__class__(dict(valid_batch))
+
                     # Allow for preprocessing
                     valid_batch, valid_logits = self.validation_problem.plot_preprocessing(valid_batch, valid_logits)
 
                     # Show plot, if user will press Stop then a SystemExit exception will be thrown.
                     self.model.plot(valid_batch, valid_logits)
 
+        if self.validation_cache is not None:
+            self.logger.info("Cache of validation batches: {}".format(self.validation_cache.get_statistics_string()))
+
+        # Aggregate the statistics of the batches of all processes.
+        if self.world_size > 1:
+            self.validation_stat_col.all_gather()
+
         # Export aggregated statistics.
         self.aggregate_and_export_statistics(self.model, self.validation_problem, 
                 self.validation_stat_col, self.validation_stat_agg, episode, '[Full Validation]')
@@ -521,6 +965,50 @@ class Trainer(Worker):
         # Return the average validation loss.
         return self.validation_stat_agg['loss']
 
+
+def run_trainer(local_rank, trainer_class):
+    """
+    Runs a single process of the training: creates the trainer, sets up the experiment and runs it.
+
+    :param local_rank: Index of the process on this node.
+    :type local_rank: int
+
+    :param trainer_class: Class of the trainer (e.g. ``OfflineTrainer``).
+
+    """
+    trainer = trainer_class()
+    trainer.local_rank = local_rank
+    try:
+        # parse args, load configuration and create all required objects.
+        trainer.setup_experiment()
+        # GO!
+        trainer.run_experiment()
+    finally:
+        trainer.finalize_distributed()
+
+
+def launch_trainer(trainer_class):
+    """
+    Launches the training, used by the entry points of the trainers.
+
+    If ``--nprocs`` is greater than 1, spawns this number of processes of the distributed training on this \
+    node (which can be one of ``--nnodes`` nodes, each running the same command with its ``--node_rank``), \
+    e.g.:
+
+        >>> mip-offline-trainer --c config.yaml --nprocs 4
+
+    Otherwise, runs the training in the current process.
+
+    :param trainer_class: Class of the trainer (e.g. ``OfflineTrainer``).
+
+    """
+    flags, _ = trainer_class().parser.parse_known_args()
+
+    if flags.nprocs > 1:
+        mp.spawn(run_trainer, args=(trainer_class,), nprocs=flags.nprocs)
+    else:
+        run_trainer(0, trainer_class)
+
 if __name__ == '__main__':
     print("The trainer.py file contains only an abstract base class. Please try to use the \
 online_trainer (mip-online-trainer) or  offline_trainer (mip-offline-trainer) instead.")
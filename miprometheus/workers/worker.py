@@ -37,7 +37,9 @@ from random import randrange
 from abc import abstractmethod
 
 from torch.utils.data import DataLoader
+from torch.utils.data.sampler import RandomSampler, SequentialSampler
 from miprometheus.utils.sampler_factory import SamplerFactory
+from miprometheus.utils.distributed_shard_sampler import DistributedShardSampler
 from miprometheus.problems.problem_factory import ProblemFactory
 
 # Import utils.
@@ -88,6 +90,10 @@ class Worker(object):
         # Initialize parameter interface/registry.
         self.params = ParamInterface()
 
+        # Rank of the process & number of processes of the distributed training (set by the trainers).
+        self.rank = 0
+        self.world_size = 1
+
         # Initialize logger using the configuration.
         self.initialize_logger()
 
@@ -274,34 +280,80 @@ class Worker(object):
         # Build the problem.
         problem = ProblemFactory.build(params['problem'])
 
+        # Build the sampler and the DataLoader.
+        sampler, loader = self.build_sampler_loader(problem, params, section_name)
+
+        # Return sampler - even if it is none :]
+        return problem, sampler, loader
+
+    def build_sampler_loader(self, problem, params, section_name):
+        """
+        Builds and returns the sampler (if required) and the DataLoader for an existing Problem.
+
+        .. note::
+
+            In the distributed training, the sampler (the default random or sequential one if not set) \
+            is wrapped by the :py:class:`miprometheus.utils.DistributedShardSampler`. Only the training \
+            samples are padded (so all processes run the same number of episodes), the other ones are \
+            returned exactly once, so the (gathered) validation statistics are not biased.
+
+        :param problem: Object derived from the ''Problem'' class.
+
+        :param params: 'ParamInterface' object, referring to one of main sections (training/validation/testing).
+        :type params: miprometheus.utils.ParamInterface
+
+        :param section_name: name of the section (training/validation/testing), used by logger for display \
+        and to pad the training samples only (distributed training).
+
+        :return: Sampler instance (may be None) & DataLoader instance.
+        """
         # Try to build the sampler.
         sampler = SamplerFactory.build(problem, params['sampler'])
 
+        # Shard the samples between the processes of the distributed training.
+        if self.world_size > 1:
+            if sampler is None:
+                sampler = RandomSampler(problem) if params['dataloader']['shuffle'] else SequentialSampler(problem)
+            sampler = DistributedShardSampler(sampler, self.world_size, self.rank,
+                                              self.params['training']['seed_numpy'],
+                                              pad=(section_name == 'training'))
+
         if sampler is not None:
             # Set shuffle to False - REQUIRED as those two are exclusive.
             params['dataloader'].add_config_params({'shuffle': False})
 
-        # build the DataLoader on top of the validation problem
-        loader = DataLoader(dataset=problem,
-                            batch_size=params['problem']['batch_size'],
-                            shuffle=params['dataloader']['shuffle'],
-                            sampler=sampler,
-                            batch_sampler=params['dataloader']['batch_sampler'],
-                            num_workers=params['dataloader']['num_workers'],
-                            collate_fn=problem.collate_fn,
-                            pin_memory=params['dataloader']['pin_memory'],
-                            drop_last=params['dataloader']['drop_last'],
-                            timeout=params['dataloader']['timeout'],
-                            worker_init_fn=problem.worker_init_fn)
+        if getattr(sampler, 'batch_sampling', False):
+            # The batch sampler forms the batches itself (batch_size, shuffle & drop_last are exclusive with it).
+            loader = DataLoader(dataset=problem,
+                                batch_sampler=sampler,
+                                num_workers=params['dataloader']['num_workers'],
+                                collate_fn=problem.collate_fn,
+                                pin_memory=params['dataloader']['pin_memory'],
+                                timeout=params['dataloader']['timeout'],
+                                worker_init_fn=problem.worker_init_fn)
+        else:
+            # build the DataLoader on top of the validation problem
+            loader = DataLoader(dataset=problem,
+                                batch_size=params['problem']['batch_size'],
+                                shuffle=params['dataloader']['shuffle'],
+                                sampler=sampler,
+                                batch_sampler=params['dataloader']['batch_sampler'],
+                                num_workers=params['dataloader']['num_workers'],
+                                collate_fn=problem.collate_fn,
+                                pin_memory=params['dataloader']['pin_memory'],
+                                drop_last=params['dataloader']['drop_last'],
+                                timeout=params['dataloader']['timeout'],
+                                worker_init_fn=problem.worker_init_fn)
 
         # Display sizes.
         self.logger.info("Problem for '{}' loaded (size: {})".format(section_name, len(problem)))
-        if (sampler is not None):
+        if getattr(sampler, 'batch_sampling', False):
+            self.logger.info("Sampler for '{}' created (size: {} samples in {} batches)".format(
+                section_name, sampler.num_samples, len(sampler)))
+        elif (sampler is not None):
             self.logger.info("Sampler for '{}' created (size: {})".format(section_name, len(sampler)))
 
-
-        # Return sampler - even if it is none :]
-        return problem, sampler, loader
+        return sampler, loader
 
 
     def get_epoch_size(self, problem, sampler, batch_size, drop_last):
@@ -332,6 +384,10 @@ class Worker(object):
         :return: Number of iterations to perform to go though the entire dataset once.
 
         """
+        # The batch sampler knows the number of batches.
+        if getattr(sampler, 'batch_sampling', False):
+            return len(sampler)
+
         # "Estimate" dataset size.
         if (sampler is not None):
             problem_size = len(sampler)
@@ -608,6 +664,9 @@ class Worker(object):
 
 
         """
+        # Process the batch in the main process (e.g. embed the questions).
+        data_dict = problem.prepare_batch(data_dict)
+
         # Convert to CUDA.
         if self.app_state.use_CUDA:
             data_dict = data_dict.cuda()
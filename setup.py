@@ -216,6 +216,7 @@ setup(
              'mip-grid-tester-cpu=miprometheus.grid_workers.grid_tester_cpu:main',
              'mip-grid-tester-gpu=miprometheus.grid_workers.grid_tester_gpu:main',
              'mip-grid-analyzer=miprometheus.grid_workers.grid_analyzer:main',
+             'mip-cell-benchmark=miprometheus.helpers.cell_benchmark:main',
              'mip-index-splitter=miprometheus.helpers.index_splitter:main',
              'mip-offline-trainer=miprometheus.workers.offline_trainer:main',
              'mip-online-trainer=miprometheus.workers.online_trainer:main',
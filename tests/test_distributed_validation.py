@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_distributed_validation.py: tests of the validation in the distributed (data-parallel) training, \
+running processes of the gloo backend.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import os
+import shutil
+import tempfile
+import unittest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from miprometheus.workers.trainer import Trainer
+from miprometheus.utils.app_state import AppState
+from miprometheus.utils.data_dict import DataDict
+from miprometheus.utils.statistics_collector import StatisticsCollector
+from miprometheus.utils.distributed_shard_sampler import DistributedShardSampler
+
+WORLD_SIZE = 2
+
+
+class LossModel(torch.nn.Module):
+    """
+    Model returning the (per sample) losses stored in the batch.
+    """
+
+    def forward(self, data_dict):
+        return data_dict['losses']
+
+    def collect_statistics(self, stat_col, data_dict, logits):
+        pass
+
+
+class LossProblem(object):
+    """
+    Problem averaging the losses returned by the model.
+    """
+
+    def prepare_batch(self, data_dict):
+        return data_dict
+
+    def evaluate_loss(self, data_dict, logits):
+        return logits.mean()
+
+    def collect_statistics(self, stat_col, data_dict, logits):
+        pass
+
+
+def create_collector():
+    """
+    Creates a statistics collector of the loss and episode.
+    """
+    stat_col = StatisticsCollector()
+    stat_col.add_statistic('loss', '{:12.10f}')
+    stat_col.add_statistic('episode', '{:06d}')
+    return stat_col
+
+
+def create_trainer(rank):
+    """
+    Creates a trainer with the attributes used by the validation on a batch only (the constructor parses \
+    the command line).
+    """
+    trainer = Trainer.__new__(Trainer)
+    trainer.rank = rank
+    trainer.world_size = WORLD_SIZE
+    trainer.app_state = AppState()
+    trainer.model = LossModel()
+    trainer.validation_problem = LossProblem()
+    trainer.validation_stat_col = create_collector()
+    trainer.export_statistics = lambda stat_obj, tag='', export_to_log=True: None
+    return trainer
+
+
+def run_process(rank, init_file, test_name):
+    """
+    Runs one of the tests (function of this module) in a process of the distributed training.
+    """
+    dist.init_process_group('gloo', init_method='file://' + init_file, rank=rank, world_size=WORLD_SIZE)
+    try:
+        globals()[test_name](rank)
+    finally:
+        dist.destroy_process_group()
+
+
+def check_loss_stop_decision(rank):
+    # The local losses are on both sides of the threshold: 0.2 (rank 0) and 1.0 (rank 1).
+    loss_stop = 0.5
+    batch = DataDict({'losses': torch.tensor([0.2 + 0.8 * rank])})
+
+    loss = create_trainer(rank).validate_on_batch(batch, 10, 0)
+
+    # All processes get the averaged loss...
+    assert abs(loss - 0.6) < 1e-6, loss
+    # ... so all of them take the same decision.
+    converged = torch.tensor([float(loss < loss_stop)])
+    dist.all_reduce(converged)
+    assert converged.item() in (0, WORLD_SIZE), converged.item()
+
+
+def check_all_gather(rank):
+    # The processes collect different numbers of values (e.g. the shards of the validation set).
+    stat_col = create_collector()
+    for episode in range(rank + 1):
+        stat_col['episode'] = episode
+        stat_col['loss'] = float(rank)
+
+    stat_col.all_gather()
+
+    assert stat_col['episode'] == [0, 0, 1], stat_col['episode']
+    assert stat_col['loss'] == [0.0, 1.0, 1.0], stat_col['loss']
+
+
+class TestDistributedValidation(unittest.TestCase):
+    """
+    Runs the checks in ``WORLD_SIZE`` processes.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def spawn(self, test_name):
+        mp.spawn(run_process, args=(os.path.join(self.tmp_dir, 'init'), test_name), nprocs=WORLD_SIZE)
+
+    def test_loss_stop_decision_is_consistent(self):
+        self.spawn('check_loss_stop_decision')
+
+    def test_all_gather_of_unequal_collectors(self):
+        self.spawn('check_all_gather')
+
+    def test_validation_shards_are_not_padded(self):
+        sampler = list(range(5))
+        shards = [list(DistributedShardSampler(sampler, WORLD_SIZE, rank, pad=False)) for rank in range(WORLD_SIZE)]
+
+        self.assertEqual(sorted(i for shard in shards for i in shard), sampler)
+        self.assertEqual([len(DistributedShardSampler(sampler, WORLD_SIZE, rank, pad=False))
+                          for rank in range(WORLD_SIZE)], [3, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
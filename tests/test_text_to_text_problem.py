@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) IBM Corporation 2018
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_text_to_text_problem.py: tests of the BLEU score statistics of the text to text problems.
+
+"""
+__author__ = "Tomasz Kornuta"
+
+import unittest
+import torch
+
+from miprometheus.utils.param_interface import ParamInterface
+from miprometheus.utils.statistics_collector import StatisticsCollector
+from miprometheus.utils.statistics_aggregator import StatisticsAggregator
+from miprometheus.problems.seq_to_seq.text_to_text.text_to_text_problem import TextToTextProblem, Lang
+
+
+class TestBLEUOnAggregation(unittest.TestCase):
+    """
+    Tests the BLEU score computed on aggregation (``bleu: on_aggregation: True``).
+    """
+
+    def setUp(self):
+        params = ParamInterface()
+        params.add_config_params({'bleu': {'on_aggregation': True}})
+        self.problem = TextToTextProblem(params)
+
+        self.problem.output_lang = Lang('output')
+        self.sentences = ['the cat sat on the mat', 'a dog ate my homework today']
+        for sentence in self.sentences:
+            self.problem.output_lang.add_sentence(sentence)
+
+        self.stat_col = StatisticsCollector()
+        self.stat_col.add_statistic('loss', '{:12.10f}')
+        self.stat_col.add_statistic('episode', '{:06d}')
+        self.problem.add_statistics(self.stat_col)
+
+        self.stat_agg = StatisticsAggregator()
+        self.problem.add_aggregators(self.stat_agg)
+
+    def batch(self, correct):
+        """
+        Returns a batch of the two sentences with correct predictions or only padding (one-hot logits).
+        """
+        data_dict = {'targets_text': self.sentences}
+        length = max(len(sentence.split()) for sentence in self.sentences)
+        num_words = self.problem.output_lang.n_words
+
+        indices = torch.zeros(len(self.sentences), length, dtype=torch.long)
+        for i, sentence in enumerate(self.sentences):
+            if correct:
+                words = [self.problem.output_lang.word2index[word] for word in sentence.split()]
+                indices[i, :len(words)] = torch.LongTensor(words)
+
+        logits = torch.zeros(len(self.sentences), length, num_words).scatter_(2, indices.unsqueeze(-1), 1.0)
+        return data_dict, logits
+
+    def collect(self, episode, correct):
+        """
+        Collects the statistics of a single (evaluation) batch, as the validation does.
+        """
+        data_dict, logits = self.batch(correct)
+        self.stat_col['episode'] = episode
+        self.stat_col['loss'] = 0.0
+        with torch.no_grad():
+            self.problem.collect_statistics(self.stat_col, data_dict, logits)
+
+    def test_partial_then_full_validation(self):
+        # Partial validation: the score is reported immediately (the batch is not aggregated).
+        self.stat_col.empty()
+        self.collect(0, correct=False)
+        self.assertEqual(len(self.stat_col['bleu_score']), 1)
+        self.assertLess(self.stat_col['bleu_score'][-1], 0.1)
+
+        # Full validation: the aggregated score covers only the batches of this pass.
+        self.stat_col.empty()
+        self.collect(1, correct=True)
+        self.collect(1, correct=True)
+        self.problem.aggregate_statistics(self.stat_col, self.stat_agg)
+
+        self.assertAlmostEqual(self.stat_agg['bleu_score'], 1.0, places=4)
+        self.assertEqual(self.problem.bleu_buffers, {})
+
+    def test_training_batches_are_deferred(self):
+        self.stat_col.empty()
+        data_dict, logits = self.batch(correct=True)
+        for episode in range(3):
+            self.stat_col['episode'] = episode
+            self.stat_col['loss'] = 0.0
+            self.problem.collect_statistics(self.stat_col, data_dict, logits)
+
+        # Not computed per batch.
+        self.assertEqual(self.stat_col['bleu_score'], [-1, -1, -1])
+        self.problem.aggregate_statistics(self.stat_col, self.stat_agg)
+        self.assertAlmostEqual(self.stat_agg['bleu_score'], 1.0, places=4)
+
+
+if __name__ == "__main__":
+    unittest.main()